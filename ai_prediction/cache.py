@@ -0,0 +1,61 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """
+    Maps (asset, timeframe, last bar, model version) to the Signal already
+    generated for it, so repeated run_prediction calls on unchanged data
+    return that Signal instead of recomputing indicators and inference.
+
+    Each asset has a generation counter that is bumped whenever its bars are
+    written or edited; it is part of the key, which invalidates every cached
+    prediction of the asset at once (including backfills that do not move
+    the last bar).
+    """
+
+    @staticmethod
+    def _symbol(asset):
+        return asset if isinstance(asset, str) else asset.symbol
+
+    @staticmethod
+    def _generation(symbol):
+        return cache.get(f"prediction:gen:{symbol}", 0)
+
+    @staticmethod
+    def key(asset, timeframe, bar_ns, model_version):
+        symbol = PredictionCache._symbol(asset)
+        generation = PredictionCache._generation(symbol)
+        return f"prediction:{symbol}:{timeframe or 'base'}:{generation}:{bar_ns}:{model_version}"
+
+    @staticmethod
+    def get(asset, timeframe, bar_ns, model_version):
+        """Returns the cached Signal, or None on a miss."""
+        from core.models import Signal
+
+        if bar_ns is None:
+            return None
+        signal_id = cache.get(PredictionCache.key(asset, timeframe, bar_ns, model_version))
+        if signal_id is None:
+            return None
+        return Signal.objects.filter(id=signal_id).select_related('asset').first()
+
+    @staticmethod
+    def set(signal, timeframe, bar_ns):
+        if bar_ns is None:
+            return
+        key = PredictionCache.key(signal.asset, timeframe, bar_ns, signal.model_version)
+        cache.set(key, signal.id, settings.PREDICTION_CACHE_TIMEOUT)
+
+    @staticmethod
+    def invalidate(asset):
+        """Drops all cached predictions of an asset (call after its bars change)."""
+        key = f"prediction:gen:{PredictionCache._symbol(asset)}"
+        try:
+            cache.add(key, 0, None)
+            cache.incr(key)
+        except Exception as e:
+            logger.warning(f"Prediction cache invalidation failed for {key}: {e}")
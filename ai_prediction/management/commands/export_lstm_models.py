@@ -0,0 +1,46 @@
+import glob
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Exports trained Keras LSTM models (+ scalers) to the NumPy inference format (.npz)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to export (default: every *_lstm.keras in AI_MODEL_DIR)')
+        parser.add_argument('--force', action='store_true', help='Re-export even if the .npz is up to date')
+
+    def handle(self, *args, **options):
+        # TensorFlow is only needed here, to read the .keras files
+        import joblib
+        import tensorflow as tf
+        from ai_prediction.registry import scaler_path_for
+        from ai_prediction.runtime import export_lstm
+
+        model_dir = str(settings.AI_MODEL_DIR)
+        if options['symbols']:
+            paths = [os.path.join(model_dir, f"{symbol}_lstm.keras") for symbol in options['symbols']]
+        else:
+            paths = sorted(glob.glob(os.path.join(model_dir, '*_lstm.keras')))
+
+        exported = 0
+        for model_path in paths:
+            base = model_path[:-len('.keras')]
+            npz_path = base + '.npz'
+            scaler_path = scaler_path_for(model_path)
+            if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+                self.stdout.write(self.style.WARNING(f"SKIP: {model_path} or its scaler is missing"))
+                continue
+            if (not options['force'] and os.path.exists(npz_path)
+                    and os.path.getmtime(npz_path) >= os.path.getmtime(model_path)):
+                self.stdout.write(f"{npz_path} is up to date")
+                continue
+            try:
+                model = tf.keras.models.load_model(model_path)
+                export_lstm(model, joblib.load(scaler_path), npz_path)
+                exported += 1
+                self.stdout.write(self.style.SUCCESS(f"Exported {npz_path}"))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"ERROR: Failed exporting {model_path}: {e}"))
+
+        self.stdout.write(self.style.SUCCESS(f"{exported} model(s) exported."))
@@ -16,18 +16,22 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("No active assets found."))
             return
 
-        for asset in assets:
-            self.stdout.write(f"Analyzing {asset.symbol}...")
-            try:
-                signal = PredictionService.run_prediction(asset.symbol)
-                if signal:
-                    self.stdout.write(self.style.SUCCESS(
-                        f"SUCCESS: Generated {signal.signal_type} for {asset.symbol} "
-                        f"(Confidence: {signal.confidence*100:.1f}%)"
-                    ))
-                else:
-                    self.stdout.write(self.style.WARNING(f"SKIP: No signal for {asset.symbol}"))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"ERROR: Failed predicting {asset.symbol}: {e}"))
+        symbols = list(assets.values_list('symbol', flat=True))
+        self.stdout.write(f"Analyzing {len(symbols)} assets...")
+        try:
+            signals = PredictionService.run_batch(symbols)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"ERROR: Batch prediction failed: {e}"))
+            return
+
+        for symbol in symbols:
+            signal = signals.get(symbol)
+            if signal:
+                self.stdout.write(self.style.SUCCESS(
+                    f"SUCCESS: Generated {signal.signal_type} for {symbol} "
+                    f"(Confidence: {signal.confidence*100:.1f}%)"
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(f"SKIP: No signal for {symbol}"))
         
         self.stdout.write(self.style.SUCCESS("AI Prediction Process Finished."))
@@ -0,0 +1,57 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Asset
+from core.services.resampler import TIMEFRAMES
+
+class Command(BaseCommand):
+    help = 'Trains LSTM models for many symbols in parallel from the local BarStore (no network)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to train (default: all active assets)')
+        parser.add_argument('--cpus', type=int, default=os.cpu_count() or 1, help='CPU budget for the whole run')
+        parser.add_argument('--threads', type=int, default=1, help='TensorFlow intra-op threads per worker')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: cpus // threads)')
+        parser.add_argument('--epochs', type=int, default=None,
+                            help='Epochs (default: 10 for a full training, 3 with --incremental)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Fine-tune the current models on the bars added since their last training')
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--look-back', type=int, default=20)
+        parser.add_argument('--days', type=int, default=730, help='History used for training (0 = all)')
+        parser.add_argument('--timeframe', choices=list(TIMEFRAMES), default=None,
+                            help='Resample the stored bars before training (default: stored bars)')
+
+    def handle(self, *args, **options):
+        from ai_prediction.training import train_many
+
+        symbols = options['symbols'] or list(Asset.objects.filter(is_active=True).values_list('symbol', flat=True))
+        if not symbols:
+            self.stdout.write(self.style.WARNING("No symbols to train."))
+            return
+
+        threads = max(1, options['threads'])
+        workers = options['workers'] or max(1, options['cpus'] // threads)
+        if workers * threads > options['cpus']:
+            raise CommandError(f"{workers} workers x {threads} threads exceeds the budget of {options['cpus']} CPUs")
+        workers = min(workers, len(symbols))
+        self.stdout.write(f"Training {len(symbols)} symbols with {workers} workers x {threads} threads...")
+
+        def report(result):
+            if result['status'] == 'trained':
+                self.stdout.write(self.style.SUCCESS(
+                    f"{result['symbol']} ({result['mode']}): {result['samples']} samples, "
+                    f"loss {result['loss']:.6f} ({result['seconds']}s)"
+                ))
+            elif result['status'] == 'skipped':
+                self.stdout.write(self.style.WARNING(f"{result['symbol']}: skipped ({result['reason']})"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{result['symbol']}: failed ({result['reason']})"))
+
+        results = train_many(
+            symbols, workers=workers, threads=threads, on_result=report,
+            look_back=options['look_back'], epochs=options['epochs'] or 10, batch_size=options['batch_size'],
+            days=options['days'], timeframe=options['timeframe'],
+            incremental=options['incremental'], incremental_epochs=options['epochs'] or 3,
+        )
+        trained = sum(1 for r in results if r['status'] == 'trained')
+        self.stdout.write(self.style.SUCCESS(f"Training finished: {trained}/{len(symbols)} models."))
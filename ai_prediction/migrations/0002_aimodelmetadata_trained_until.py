@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_prediction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aimodelmetadata',
+            name='trained_until',
+            field=models.DateTimeField(blank=True, help_text='Datetime of the last bar the model was trained on', null=True),
+        ),
+    ]
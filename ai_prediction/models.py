@@ -16,6 +16,7 @@ class AIModelMetadata(models.Model):
     
     accuracy = models.FloatField(null=True, blank=True)
     last_trained = models.DateTimeField(auto_now=True)
+    trained_until = models.DateTimeField(null=True, blank=True, help_text="Datetime of the last bar the model was trained on")
     is_active = models.BooleanField(default=True)
     
     file_path = models.CharField(max_length=255, null=True, blank=True, help_text="Path to saved model weights")
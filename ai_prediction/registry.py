@@ -0,0 +1,215 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelSpec:
+    symbol: str
+    model_path: str
+    scaler_path: str
+    version: str
+    signature: tuple
+    runtime: str = 'numpy'
+
+
+@dataclass
+class LoadedModel:
+    spec: ModelSpec
+    model: object
+    scaler: object
+    nbytes: int
+
+    @property
+    def version(self):
+        return self.spec.version
+
+
+def scaler_path_for(model_path):
+    """<dir>/<name>_lstm.<ext> -> <dir>/<name>_scaler.save (only the file name suffix is replaced)."""
+    dirname, basename = os.path.split(os.path.splitext(model_path)[0])
+    if basename.endswith('_lstm'):
+        basename = basename[:-len('_lstm')]
+    return os.path.join(dirname, basename + '_scaler.save')
+
+
+def _nbytes(obj):
+    """Approximate memory held by a Keras model (weights) or a fitted scaler (numpy attributes)."""
+    import numpy as np
+
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    if hasattr(obj, 'get_weights'):
+        return int(sum(w.nbytes for w in obj.get_weights()))
+    return int(sum(v.nbytes for v in vars(obj).values() if isinstance(v, np.ndarray)))
+
+
+class ModelRegistry:
+    """
+    Per-process cache of the LSTM models and scalers used for inference.
+
+    A model is resolved from the active AIModelMetadata row named after the
+    symbol (file_path/version), or from AI_MODEL_DIR/<symbol>_lstm.keras, or
+    from an active row shared by the asset type (AIModelMetadata.asset_type).
+    Entries are keyed by model file, so assets sharing a model share one copy.
+    The NumPy export (<name>_lstm.npz, see ai_prediction.runtime) is preferred
+    whenever it is at least as recent as the .keras file, so inference never
+    imports TensorFlow; the .keras file is only loaded as a fallback.
+    It is deserialised once and kept in an LRU bounded by
+    AI_MODEL_CACHE_MAX_MODELS entries and AI_MODEL_CACHE_MAX_BYTES of weights;
+    it is reloaded only when the metadata version or the files change.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, max_bytes=None, max_models=None):
+        self.max_bytes = max_bytes or settings.AI_MODEL_CACHE_MAX_BYTES
+        self.max_models = max_models or settings.AI_MODEL_CACHE_MAX_MODELS
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        # model path -> LoadedModel, least recently used first
+        self._models = OrderedDict()
+        self.nbytes = 0
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    # ------------------------------------------------------------------
+    # Resolution
+    # ------------------------------------------------------------------
+    @staticmethod
+    def resolve(symbol, asset_type=None):
+        """Returns the ModelSpec of the current model for `symbol`, or None if there is none on disk."""
+        from ai_prediction.models import AIModelMetadata
+
+        active = (AIModelMetadata.objects
+                  .filter(model_type=AIModelMetadata.ModelType.LSTM, is_active=True)
+                  .exclude(file_path__isnull=True).exclude(file_path='')
+                  .order_by('-last_trained'))
+        meta = active.filter(name=symbol).first()
+        model_path = os.path.join(settings.AI_MODEL_DIR, f"{symbol}_lstm.keras")
+        own_file = any(os.path.exists(os.path.splitext(model_path)[0] + ext) for ext in ('.npz', '.keras'))
+        if meta is None and asset_type and not own_file:
+            meta = active.filter(asset_type=asset_type).first()
+        if meta:
+            model_path, version = meta.file_path, meta.version
+        else:
+            version = None
+
+        base = os.path.splitext(model_path)[0]
+        npz_stat = ModelRegistry._stat(base + '.npz')
+        keras_stat = ModelRegistry._stat(base + '.keras')
+        scaler_path = scaler_path_for(model_path)
+        scaler_stat = ModelRegistry._stat(scaler_path)
+
+        if npz_stat and (keras_stat is None or npz_stat.st_mtime_ns >= keras_stat.st_mtime_ns):
+            spec = ModelSpec(symbol, base + '.npz', base + '.npz', None, (), 'numpy')
+            stats = (npz_stat,)
+        elif keras_stat and scaler_stat:
+            spec = ModelSpec(symbol, base + '.keras', scaler_path, None, (), 'keras')
+            stats = (keras_stat, scaler_stat)
+        else:
+            return None
+
+        spec.signature = (version, spec.runtime) + tuple((st.st_mtime_ns, st.st_size) for st in stats)
+        spec.version = f"lstm-{version or int(stats[0].st_mtime)}"
+        return spec
+
+    @staticmethod
+    def _stat(path):
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def version(self, symbol, asset_type=None):
+        """Version string of the model `symbol` would use, without loading it (None if no model)."""
+        spec = self.resolve(symbol, asset_type)
+        return spec.version if spec else None
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+    def get(self, symbol, asset_type=None, spec=None):
+        """
+        Returns the LoadedModel for `symbol` (loading it if needed), or None if there is no model.
+        `spec` skips the resolution when the caller already holds the current ModelSpec.
+        """
+        spec = spec or self.resolve(symbol, asset_type)
+        if spec is None:
+            return None
+
+        key = spec.model_path
+        with self._lock:
+            entry = self._models.get(key)
+            if entry and entry.spec.signature == spec.signature:
+                self._models.move_to_end(key)
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Deserialisation happens outside the registry lock, one loader per model file
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry and entry.spec.signature == spec.signature:
+                    return entry
+            entry = self._load(spec)
+            with self._lock:
+                self._put(entry)
+        return entry
+
+    def evict(self, model_path=None):
+        with self._lock:
+            if model_path is None:
+                self._models.clear()
+                self.nbytes = 0
+            elif model_path in self._models:
+                self.nbytes -= self._models.pop(model_path).nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': len(self._models),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'entries': {p: {'version': e.version, 'bytes': e.nbytes} for p, e in self._models.items()},
+            }
+
+    def _put(self, entry):
+        key = entry.spec.model_path
+        old = self._models.pop(key, None)
+        if old:
+            self.nbytes -= old.nbytes
+        self._models[key] = entry
+        self.nbytes += entry.nbytes
+        # Keep at least the entry just loaded, even if it alone exceeds the budget
+        while len(self._models) > 1 and (len(self._models) > self.max_models or self.nbytes > self.max_bytes):
+            path, evicted = self._models.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            logger.info(f"Model registry evicted {path} ({evicted.nbytes / 1e6:.1f} MB)")
+
+    @staticmethod
+    def _load(spec):
+        logger.info(f"Loading LSTM model for {spec.symbol} from {spec.model_path} ({spec.version})")
+        if spec.runtime == 'numpy':
+            from ai_prediction.runtime import load_lstm
+
+            model, scaler = load_lstm(spec.model_path)
+        else:
+            import joblib
+            import tensorflow as tf
+
+            model = tf.keras.models.load_model(spec.model_path)
+            scaler = joblib.load(spec.scaler_path)
+        return LoadedModel(spec, model, scaler, _nbytes(model) + _nbytes(scaler))
@@ -0,0 +1,149 @@
+"""
+Lightweight inference runtime for the LSTM models trained with Keras.
+
+A trained Sequential model (LSTM/Dense/Dropout layers) and its MinMaxScaler
+are exported to a single .npz file holding the weights, the layer config and
+the scaler parameters. Inference is then a pure NumPy forward pass, so web
+and prediction workers never import TensorFlow (or scikit-learn/joblib);
+TensorFlow is only needed to train and export.
+"""
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    None: lambda x: x,
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'hard_sigmoid': lambda x: np.clip(0.2 * x + 0.5, 0.0, 1.0),
+    'relu': lambda x: np.maximum(x, 0.0),
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation {name}")
+    return ACTIVATIONS[name]
+
+
+class NumpyScaler:
+    """Inference half of sklearn's MinMaxScaler (x * scale_ + min_)."""
+
+    def __init__(self, min_, scale_):
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+
+class NumpyLSTMModel:
+    """
+    Forward pass of a Keras Sequential of LSTM and Dense layers.
+    Gates follow the Keras kernel layout [input, forget, cell, output].
+    Exposes predict(X) like a Keras model; Dropout is a no-op at inference.
+    """
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    def predict(self, X, batch_size=None, verbose=0):
+        out = np.asarray(X, dtype=np.float32)
+        for layer in self.layers:
+            if layer['type'] == 'lstm':
+                out = self._lstm(out, layer)
+            else:
+                out = _activation(layer['activation'])(out @ layer['kernel'] + layer['bias'])
+        return out
+
+    @staticmethod
+    def _lstm(X, layer):
+        kernel, recurrent, bias = layer['kernel'], layer['recurrent_kernel'], layer['bias']
+        act = _activation(layer['activation'])
+        rec_act = _activation(layer['recurrent_activation'])
+        units = recurrent.shape[0]
+        n, steps, _ = X.shape
+
+        # Input projections of every time step at once, only the recurrence is sequential
+        xw = X @ kernel + bias
+        h = np.zeros((n, units), dtype=X.dtype)
+        c = np.zeros((n, units), dtype=X.dtype)
+        outputs = np.empty((n, steps, units), dtype=X.dtype) if layer['return_sequences'] else None
+        for t in range(steps):
+            z = xw[:, t] + h @ recurrent
+            i = rec_act(z[:, :units])
+            f = rec_act(z[:, units:2 * units])
+            g = act(z[:, 2 * units:3 * units])
+            o = rec_act(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * act(c)
+            if outputs is not None:
+                outputs[:, t] = h
+        return outputs if outputs is not None else h
+
+    @property
+    def nbytes(self):
+        return int(sum(v.nbytes for layer in self.layers for v in layer.values() if isinstance(v, np.ndarray)))
+
+
+def export_lstm(model, scaler, path):
+    """Writes a Keras LSTM model and its fitted MinMaxScaler to `path` (.npz)."""
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+        if kind == 'Dropout':
+            continue
+        if kind == 'LSTM':
+            kernel, recurrent, bias = layer.get_weights()
+            spec = {
+                'type': 'lstm',
+                'activation': config.get('activation', 'tanh'),
+                'recurrent_activation': config.get('recurrent_activation', 'sigmoid'),
+                'return_sequences': bool(config.get('return_sequences', False)),
+            }
+            weights = {'kernel': kernel, 'recurrent_kernel': recurrent, 'bias': bias}
+        elif kind == 'Dense':
+            kernel, bias = layer.get_weights()
+            spec = {'type': 'dense', 'activation': config.get('activation', 'linear')}
+            weights = {'kernel': kernel, 'bias': bias}
+        else:
+            raise ValueError(f"Cannot export layer {layer.name} ({kind})")
+
+        index = len(layers)
+        for name, value in weights.items():
+            arrays[f"layer{index}_{name}"] = np.asarray(value, dtype=np.float32)
+        layers.append(spec)
+
+    arrays['scaler_min'] = np.asarray(scaler.min_, dtype=np.float64)
+    arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+    arrays['config'] = np.array(json.dumps({'format': FORMAT_VERSION, 'layers': layers}))
+    np.savez(path, **arrays)
+    logger.info(f"Exported {len(layers)} layers to {path}")
+    return path
+
+
+def load_lstm(path):
+    """Returns (NumpyLSTMModel, NumpyScaler) from a file written by export_lstm."""
+    with np.load(path, allow_pickle=False) as data:
+        config = json.loads(str(data['config']))
+        if config.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model format {config.get('format')} in {path}")
+        layers = []
+        for index, spec in enumerate(config['layers']):
+            layer = dict(spec)
+            prefix = f"layer{index}_"
+            layer.update({key[len(prefix):]: data[key] for key in data.files if key.startswith(prefix)})
+            layers.append(layer)
+        scaler = NumpyScaler(data['scaler_min'], data['scaler_scale'])
+    return NumpyLSTMModel(layers), scaler
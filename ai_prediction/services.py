@@ -1,58 +1,124 @@
-import os
-import pandas as pd
-import numpy as np
 import logging
-from datetime import datetime
-from core.models import Asset, Signal, PriceHistory
-try:
-    from sklearn.preprocessing import MinMaxScaler
-    HAS_SKLEARN = True
-except ImportError:
-    HAS_SKLEARN = False
-    class MinMaxScaler:
-        def fit_transform(self, x): return x
-
-try:
-    import tensorflow as tf
-    HAS_TF = True
-except ImportError:
-    HAS_TF = False
+from core.lazy import lazy_import, is_available
+from core.models import Asset, Signal
+from core.services.bar_store import BarStore
+from core.services.aggregate_service import PriceAggregateService
+from ai_prediction.cache import PredictionCache
+from ai_prediction.registry import ModelRegistry
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+# Inference runs on the NumPy export of the models (ai_prediction.runtime);
+# TensorFlow and sklearn are only probed here, never imported, so web workers stay light.
+HAS_SKLEARN = is_available("sklearn")
+HAS_TF = is_available("tensorflow")
 
 logger = logging.getLogger(__name__)
 
 class PredictionService:
+    LOOK_BACK = 20
+
     @staticmethod
-    def run_prediction(symbol):
+    def run_prediction(symbol, timeframe=None):
         """
         Runs the full prediction pipeline for a symbol.
-        1. Load data
+        1. Load data (raw bars, or a higher `timeframe` such as '1h'/'1d')
         2. Prepare features
-        3. Predict (LSTM or Fallback)
+        3. Predict (LSTM on the base interval, Fallback otherwise)
         4. Generate results
+        Returns the existing Signal when nothing changed since it was generated
+        (same last bar and model version), see PredictionCache.
         """
         logger.info(f"Starting Prediction for {symbol}")
-        try:
-            asset = Asset.objects.get(symbol=symbol)
-        except Asset.DoesNotExist:
+        if not Asset.objects.filter(symbol=symbol).exists():
             logger.error(f"Asset {symbol} not found")
             return None
+        return PredictionService.run_batch([symbol], timeframe=timeframe).get(symbol)
+
+    @staticmethod
+    def run_batch(symbols, timeframe=None):
+        """
+        Same pipeline as run_prediction for many symbols at once: assets that
+        use the same model are scored with one forward pass and the new
+        Signals are written with a single bulk_create.
+        Returns {symbol: Signal} (cached or new) for the assets that could be scored.
+        The LSTM models are trained on the base interval, so a higher `timeframe`
+        is always scored by the fallback predictors.
+        """
+        store = BarStore.default()
+        results = {}
+        pending = []  # (asset, features, ModelSpec, model_version, bar_ns)
+
+        def cached(asset, model_version, bar_ns):
+            signal = PredictionCache.get(asset, timeframe, bar_ns, model_version)
+            if signal:
+                logger.info(f"Prediction cache hit for {asset.symbol} ({timeframe or 'base'})")
+                results[asset.symbol] = signal
+            return signal
+
+        for asset in Asset.objects.filter(symbol__in=symbols):
+            # Résolu une seule fois : la même entrée donne la version (cache) et le modèle chargé
+            spec = None if timeframe else ModelRegistry.resolve(asset.symbol, asset.asset_type)
+            bar_ns = store.last_timestamp(asset)
+            if spec and cached(asset, spec.version, bar_ns):
+                continue
+
+            # 1-2. Load data (columnar float64 segment, no ORM materialisation) and add features
+            try:
+                df = PredictionService.load_features(asset, timeframe)
+            except Exception as e:
+                logger.error(f"Feature loading failed for {asset.symbol}: {e}")
+                continue
+            if df is None:
+                logger.warning(f"Not enough data for {asset.symbol}")
+                continue
+
+            # Sans modèle, le libellé du fallback dépend des barres : la clé de cache et le signal utilisent le même
+            model_version = spec.version if spec else PredictionService.fallback_model(df)
+            if not spec and cached(asset, model_version, bar_ns):
+                continue
+            pending.append((asset, df, spec, model_version, bar_ns))
+
+        if not pending:
+            return results
+
+        # 3. Predict the next prices (one model call per model)
+        predictions = PredictionService.predict_many(
+            [(asset.symbol, asset.asset_type, df) for asset, df, _, _, _ in pending],
+            specs=[spec for _, _, spec, _, _ in pending],
+        )
+
+        # 4-5. Generate and store the Signals
+        signals = [
+            PredictionService.build_signal(asset, df, pred_price, confidence, timeframe, model_version, bar_ns, model)
+            for (asset, df, _, model_version, bar_ns), (pred_price, confidence, model) in zip(pending, predictions)
+        ]
+        signals = PredictionService.save_signals(signals)
 
-        # 1. Load Data
-        qs = PriceHistory.objects.filter(asset=asset).order_by('datetime')
-        if not qs.exists() or qs.count() < 10:
-            logger.warning(f"Not enough data for {symbol}")
+        for signal, (asset, _, _, _, bar_ns) in zip(signals, pending):
+            PredictionCache.set(signal, timeframe, bar_ns)
+            results[asset.symbol] = signal
+            logger.info(f"Generated {signal.signal_type} signal for {asset.symbol} with {signal.confidence*100:.2f}% confidence")
+        return results
+
+    @staticmethod
+    def load_features(asset, timeframe=None):
+        """Bars of `asset` with indicators, or None when there are fewer than 10 bars."""
+        if timeframe:
+            df = PriceAggregateService.fetch(asset, timeframe)[['close', 'high', 'low', 'volume']]
+        else:
+            df = BarStore.default().load_frame(asset, columns=['close', 'high', 'low', 'volume'])
+        if len(df) < 10:
             return None
+        return PredictionService.add_indicators(df)
 
-        df = pd.DataFrame(list(qs.values('datetime', 'close', 'high', 'low', 'volume')))
-        df.set_index('datetime', inplace=True)
-        
-        # 2. Add Technical Indicators (Features)
-        df = PredictionService.add_indicators(df)
-        
-        # 3. Predict the next price
-        pred_price, confidence = PredictionService.predict_next(df, symbol=symbol)
-        
-        # 4. Generate Signal logic
+    @staticmethod
+    def build_signal(asset, df, pred_price, confidence, timeframe=None, model_version="v1", bar_ns=None, model=None):
+        """
+        Unsaved Signal for a prediction made on the last row of `df`.
+        `model` labels the predictor actually used (see predict_many).
+        """
         last_price = float(df['close'].iloc[-1])
         signal_type = Signal.SignalType.NEUTRAL
         
@@ -61,8 +127,7 @@ class PredictionService:
         elif pred_price < last_price * 0.999: # 0.1% decrease expected
             signal_type = Signal.SignalType.SELL
 
-        # 5. Create Signal in DB
-        signal = Signal.objects.create(
+        return Signal(
             asset=asset,
             signal_type=signal_type,
             confidence=confidence,
@@ -70,12 +135,26 @@ class PredictionService:
             technical_indicators={
                 "rsi": float(df['rsi'].iloc[-1]) if 'rsi' in df else 50.0,
                 "current_price": last_price,
-                "model": "LSTM_v1" if HAS_TF else "Heuristic_v1"
-            }
+                "timeframe": timeframe or "base",
+                "model": model or model_version,
+            },
+            model_version=model_version,
+            timeframe=timeframe or '',
+            bar_datetime=pd.Timestamp(bar_ns, tz='UTC').to_pydatetime() if bar_ns is not None else None,
         )
-        
-        logger.info(f"Generated {signal.signal_type} signal for {symbol} with {confidence*100:.2f}% confidence")
-        return signal
+
+    @staticmethod
+    def save_signals(signals):
+        """
+        Inserts Signals in one query. bulk_create skips post_save, so it is sent
+        for each row to keep the notification/auto-trade receivers working.
+        """
+        from django.db.models.signals import post_save
+
+        signals = Signal.objects.bulk_create(signals)
+        for signal in signals:
+            post_save.send(sender=Signal, instance=signal, created=True, raw=False, using=signal._state.db, update_fields=None)
+        return signals
 
     @staticmethod
     def add_indicators(df):
@@ -100,40 +179,151 @@ class PredictionService:
     @staticmethod
     def predict_next(df, symbol=None):
         """Predicts the next closing price and confidence score."""
+        if symbol:
+            return PredictionService.predict_many([(symbol, None, df)])[0][:2]
+        return PredictionService.predict_fallback(df)
+
+    @staticmethod
+    def predict_walk_forward(df, symbol=None, asset_type=None, window_size=30, chunk_size=4096):
+        """
+        predict_next over a whole history at once: entry i of the returned
+        (pred_prices, confidences) arrays is what predict_next(df.iloc[i - window_size:i], symbol)
+        returns, NaN for i < window_size. The LSTM runs on strided windows,
+        `chunk_size` windows per forward pass; the fallbacks are plain array maths.
+        """
+        closes = df['close'].to_numpy(dtype=float)
+        n = len(closes)
+        preds = np.full(n, np.nan)
+        confidences = np.full(n, np.nan)
+        if n <= window_size:
+            return preds, confidences
+
+        last = np.full(n, np.nan)  # last close seen by the window of row i
+        last[1:] = closes[:-1]
+
+        look_back = PredictionService.LOOK_BACK
+        loaded = None
+        if symbol and window_size >= look_back:
+            try:
+                loaded = ModelRegistry.default().get(symbol, asset_type)
+            except Exception as e:
+                logger.error(f"Model loading failed for {symbol}: {e}")
+
+        done = False
+        if loaded:
+            try:
+                from ai_prediction.windowing import sliding_windows
+
+                # X[j] = closes[j:j + look_back], the window predicting row j + look_back
+                X, _ = sliding_windows(loaded.scaler.transform(closes.reshape(-1, 1)), look_back)
+                pred_scaled = np.full(len(X), np.nan)
+                for start in range(window_size - look_back, len(X), chunk_size):
+                    batch = np.ascontiguousarray(X[start:start + chunk_size], dtype=np.float32)
+                    pred_scaled[start:start + len(batch)] = np.asarray(
+                        loaded.model.predict(batch, batch_size=len(batch), verbose=0)
+                    ).reshape(-1)
+                preds[look_back:] = loaded.scaler.inverse_transform(pred_scaled.reshape(-1, 1))[:, 0]
+                confidences = 0.70 + np.minimum(np.abs(preds / last - 1) * 5, 0.25)
+                done = True
+            except Exception as e:
+                logger.error(f"LSTM Prediction Error: {e}")
+
+        if not done and HAS_TF and window_size >= 20:
+            # Momentum mock of predict_fallback: last close vs the 5th close from the end
+            prev = np.full(n, np.nan)
+            prev[5:] = closes[:-5]
+            move = last / prev - 1
+            preds = last * (1 + move * 0.5)
+            confidences = np.minimum(0.65 + np.abs(move) * 2, 0.99)
+        elif not done:
+            # predict_heuristic on the RSI of the last row of each window
+            rsi = np.full(n, 50.0)
+            if 'rsi' in df:
+                rsi[1:] = df['rsi'].to_numpy(dtype=float)[:-1]
+            oversold, overbought = rsi < 30, rsi > 70
+            preds = np.where(oversold, last * 1.005, np.where(overbought, last * 0.995, last))
+            confidences = np.where(oversold | overbought, 0.75, 0.5)
+
+        preds[:window_size] = np.nan
+        confidences[:window_size] = np.nan
+        return preds, confidences
+
+    @staticmethod
+    def predict_many(items, specs=None):
+        """
+        items: [(symbol, asset_type, df)]. Returns [(pred_price, confidence, model)]
+        in the same order, `model` being the version of the ModelRegistry entry
+        that predicted or the fallback label. Items resolving to the same LSTM
+        model are stacked into one (n, look_back, 1) batch; the others use the
+        fallback predictors. specs: the ModelSpec (or None) of each item when
+        the caller already resolved them.
+        """
+        results = [None] * len(items)
+        registry = ModelRegistry.default()
+        groups = {}  # model path -> (LoadedModel, [item indexes])
+        for i, (symbol, asset_type, df) in enumerate(items):
+            if len(df) < PredictionService.LOOK_BACK:
+                continue
+            try:
+                spec = specs[i] if specs is not None else ModelRegistry.resolve(symbol, asset_type)
+                loaded = registry.get(symbol, asset_type, spec=spec) if spec else None
+            except Exception as e:
+                logger.error(f"Model loading failed for {symbol}: {e}")
+                continue
+            if loaded:
+                groups.setdefault(loaded.spec.model_path, (loaded, []))[1].append(i)
+
+        for loaded, indexes in groups.values():
+            try:
+                preds = PredictionService.predict_lstm(loaded, [items[i][2] for i in indexes])
+            except Exception as e:
+                logger.error(f"LSTM Prediction Error: {e}")
+                continue
+            for i, pred in zip(indexes, preds):
+                results[i] = (*pred, loaded.version)
+
+        return [
+            result if result is not None
+            else (*PredictionService.predict_fallback(items[i][2]), PredictionService.fallback_model(items[i][2]))
+            for i, result in enumerate(results)
+        ]
+
+    @staticmethod
+    def predict_lstm(loaded, dfs):
+        """One forward pass of `loaded` over the last LOOK_BACK closes of every frame."""
+        look_back = PredictionService.LOOK_BACK
+        scaler = loaded.scaler
+        X = np.stack([
+            scaler.transform(df['close'].to_numpy(dtype=float)[-look_back:].reshape(-1, 1))
+            for df in dfs
+        ])
+        pred_scaled = loaded.model.predict(X, batch_size=len(X), verbose=0)
+        pred_prices = scaler.inverse_transform(np.asarray(pred_scaled).reshape(-1, 1))[:, 0]
+
+        # Confidence based on historical loss or simple volatility
+        last_prices = np.array([float(df['close'].iloc[-1]) for df in dfs])
+        move = pred_prices / last_prices - 1
+        confidence = 0.70 + np.minimum(np.abs(move) * 5, 0.25) # Mock confidence
+        return [(float(p), float(c)) for p, c in zip(pred_prices, confidence)]
+
+    @staticmethod
+    def fallback_model(df):
+        """Label of the predictor predict_fallback uses for `df`."""
+        return "Momentum_v1" if HAS_TF and len(df) >= 20 else "Heuristic_v1"
+
+    @staticmethod
+    def predict_fallback(df):
+        """Prediction without a trained model: momentum mock when TF is present, RSI heuristic otherwise."""
         if HAS_TF and len(df) >= 20:
             try:
-                # 1. Check for saved model
-                model_path = f"models/{symbol}_lstm.keras" if symbol else None
-                scaler_path = f"models/{symbol}_scaler.save" if symbol else None
-                
-                if model_path and os.path.exists(model_path):
-                    import joblib
-                    logger.info(f"Loading real LSTM model for {symbol} from {model_path}")
-                    # Real prediction logic
-                    model = tf.keras.models.load_model(model_path)
-                    scaler = joblib.load(scaler_path)
-                    
-                    data = df['close'].astype(float).values.reshape(-1, 1)
-                    scaled_input = scaler.transform(data)
-                    
-                    look_back = 20
-                    if len(scaled_input) < look_back:
-                         return PredictionService.predict_heuristic(df)
-                         
-                    X = scaled_input[-look_back:].reshape(1, look_back, 1)
-                    pred_scaled = model.predict(X, verbose=0)
-                    pred_price = float(scaler.inverse_transform(pred_scaled)[0, 0])
-                    
-                    # Confidence based on historical loss or simple volatility
-                    move = (pred_price / float(df['close'].iloc[-1])) - 1
-                    confidence = 0.70 + min(abs(move) * 5, 0.25) # Mock confidence
-                    return pred_price, confidence
-                
-                # 2. Mock fallback if no model file
+                # Mock fallback if no model file
                 # Ensure data is float for LSTM processing
                 data = df['close'].astype(float).values.reshape(-1, 1)
-                scaler = MinMaxScaler(feature_range=(0, 1))
-                scaled_data = scaler.fit_transform(data)
+                if HAS_SKLEARN:
+                    from sklearn.preprocessing import MinMaxScaler
+                    scaled_data = MinMaxScaler(feature_range=(0, 1)).fit_transform(data)
+                else:
+                    scaled_data = data
                 
                 look_back = 10
                 if len(scaled_data) <= look_back:
@@ -1,3 +1,453 @@
-from django.test import TestCase
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.models import Asset, BrokerAccount, Signal, Trade, UserPreference
+from core.services.bar_store import BarStore
+from core.services.price_writer import PriceHistoryWriter
+from ai_prediction.models import AIModelMetadata
+from ai_prediction.registry import LoadedModel, ModelRegistry, scaler_path_for
+from ai_prediction.runtime import NumpyScaler, export_lstm, load_lstm
+from ai_prediction.services import HAS_TF, PredictionService
+from ai_prediction.windowing import iter_window_batches, sliding_windows, windows_from_store
+
+
+# Couches au format Keras (nom de classe, get_config, get_weights) pour export_lstm
+class LSTM:
+    def __init__(self, kernel, recurrent_kernel, bias, return_sequences=False):
+        self.weights = [kernel, recurrent_kernel, bias]
+        self.return_sequences = return_sequences
+
+    def get_config(self):
+        return {'activation': 'tanh', 'recurrent_activation': 'sigmoid', 'return_sequences': self.return_sequences}
+
+    def get_weights(self):
+        return self.weights
+
+
+class Dense:
+    def __init__(self, kernel, bias):
+        self.weights = [kernel, bias]
+
+    def get_config(self):
+        return {'activation': 'linear'}
+
+    def get_weights(self):
+        return self.weights
+
+
+class Dropout:
+    def get_config(self):
+        return {'rate': 0.2}
+
+
+class Sequential:
+    def __init__(self, layers):
+        self.layers = layers
+
+
+def random_model(seed=0, units=(8, 4)):
+    """LSTM(return_sequences) -> Dropout -> LSTM -> Dense(1) with random weights."""
+    rng = np.random.default_rng(seed)
+    layers, inputs = [], 1
+    for k, n in enumerate(units):
+        layers.append(LSTM(rng.normal(0, 0.5, (inputs, 4 * n)).astype(np.float32),
+                           rng.normal(0, 0.5, (n, 4 * n)).astype(np.float32),
+                           rng.normal(0, 0.1, 4 * n).astype(np.float32),
+                           return_sequences=k < len(units) - 1))
+        if k == 0:
+            layers.append(Dropout())
+        inputs = n
+    layers.append(Dense(rng.normal(0, 0.5, (inputs, 1)).astype(np.float32), np.zeros(1, dtype=np.float32)))
+    return Sequential(layers)
+
+
+def reference_predict(model, x):
+    """Unbatched, step-by-step LSTM forward pass of one (steps, 1) window."""
+    sigmoid = lambda v: 1 / (1 + np.exp(-v))
+    seq = np.asarray(x, dtype=np.float64)
+    for layer in model.layers:
+        if isinstance(layer, Dropout):
+            continue
+        if isinstance(layer, Dense):
+            kernel, bias = layer.weights
+            return seq @ kernel + bias
+        kernel, recurrent, bias = layer.weights
+        n = recurrent.shape[0]
+        h, c, outputs = np.zeros(n), np.zeros(n), []
+        for x_t in seq:
+            z = x_t @ kernel + h @ recurrent + bias
+            i, f, g, o = sigmoid(z[:n]), sigmoid(z[n:2 * n]), np.tanh(z[2 * n:3 * n]), sigmoid(z[3 * n:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            outputs.append(h)
+        seq = np.array(outputs) if layer.return_sequences else h
+
+
+def scaler(lo=50.0, hi=150.0):
+    return NumpyScaler(np.array([-lo / (hi - lo)]), np.array([1 / (hi - lo)]))
+
+
+class RuntimeTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'TEST_lstm.npz'
+
+    def test_forward_pass_matches_reference(self):
+        model = random_model()
+        export_lstm(model, scaler(), self.path)
+        runtime, _ = load_lstm(self.path)
+
+        X = np.random.default_rng(1).uniform(0, 1, (16, 20, 1)).astype(np.float32)
+        expected = np.array([reference_predict(model, x) for x in X])
+        np.testing.assert_allclose(runtime.predict(X), expected, rtol=1e-4, atol=1e-5)
+        # Le résultat d'une fenêtre ne dépend pas du reste du batch
+        np.testing.assert_allclose(runtime.predict(X[3:4]), runtime.predict(X)[3:4], rtol=1e-5, atol=1e-6)
+
+    def test_scaler_roundtrip(self):
+        export_lstm(random_model(), scaler(), self.path)
+        _, loaded = load_lstm(self.path)
+        prices = np.array([[60.0], [100.0], [140.0]])
+        np.testing.assert_allclose(loaded.transform(prices), [[0.1], [0.5], [0.9]])
+        np.testing.assert_allclose(loaded.inverse_transform(loaded.transform(prices)), prices)
+
+    def test_unsupported_format(self):
+        export_lstm(random_model(), scaler(), self.path)
+        with np.load(self.path) as data:
+            arrays = dict(data)
+        arrays['config'] = np.array('{"format": 99, "layers": []}')
+        np.savez(self.path, **arrays)
+        with self.assertRaises(ValueError):
+            load_lstm(self.path)
+
+    @skipUnless(HAS_TF, "TensorFlow is not installed")
+    def test_matches_keras(self):
+        import tensorflow as tf
+
+        keras = tf.keras.Sequential([
+            tf.keras.Input((20, 1)),
+            tf.keras.layers.LSTM(8, return_sequences=True),
+            tf.keras.layers.Dropout(0.2),
+            tf.keras.layers.LSTM(4),
+            tf.keras.layers.Dense(1),
+        ])
+        export_lstm(keras, scaler(), self.path)
+        runtime, _ = load_lstm(self.path)
+        X = np.random.default_rng(2).uniform(0, 1, (8, 20, 1)).astype(np.float32)
+        np.testing.assert_allclose(runtime.predict(X), keras.predict(X, verbose=0), rtol=1e-4, atol=1e-5)
+
+
+def list_windows(features, target, look_back, horizon=1):
+    """Windows built the way train_lstm.py did before windowing.py (one copy per window)."""
+    X, y = [], []
+    for i in range(look_back, len(features) - horizon + 1):
+        X.append(features[i - look_back:i])
+        y.append(target[i + horizon - 1])
+    return np.array(X), np.array(y)
+
+
+class WindowingTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(BarStore, '_default', BarStore(Path(tmp.name) / 'bars'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data = np.random.default_rng(0).uniform(0, 1, (250, 2))
+
+    def test_matches_the_list_built_windows(self):
+        X, y = sliding_windows(self.data[:, :1], 20)
+        expected_X, expected_y = list_windows(self.data[:, :1], self.data[:, 0], 20)
+        self.assertEqual(X.shape, (230, 20, 1))
+        np.testing.assert_array_equal(X, expected_X)
+        np.testing.assert_array_equal(y, expected_y)
+
+        X, y = sliding_windows(self.data, 10, horizon=3, target=self.data[:, 1])
+        expected_X, expected_y = list_windows(self.data, self.data[:, 1], 10, horizon=3)
+        self.assertEqual(X.shape, (238, 10, 2))
+        np.testing.assert_array_equal(X, expected_X)
+        np.testing.assert_array_equal(y, expected_y)
+
+    def test_windows_are_read_only_views(self):
+        X, _ = sliding_windows(self.data, 20)
+        self.assertTrue(np.shares_memory(X, self.data))
+        self.assertFalse(X.flags.writeable)
+        with self.assertRaises(ValueError):
+            X[0, 0, 0] = 1.0
+
+    def test_too_short_history(self):
+        X, y = sliding_windows(self.data[:5], 20)
+        self.assertEqual((X.shape, y.shape), ((0, 20, 2), (0,)))
+
+    def test_batches_cover_every_window_once(self):
+        close = 100 + self.data[:, 0]
+        asset = Asset.objects.create(symbol='TEST', name='Test', asset_type=Asset.AssetType.STOCK)
+        PriceHistoryWriter.write(asset, pd.DataFrame(
+            {'open': close, 'high': close, 'low': close, 'close': close, 'volume': 1.0},
+            index=pd.date_range('2024-01-01', periods=250, freq='h', tz='UTC')))
+
+        batches = list(iter_window_batches(asset, 20, batch_size=64, chunk_rows=100))
+        # Blocs de 100 barres (+20 de recouvrement) : 100, 100 puis 30 fenêtres
+        self.assertEqual([len(X) for X, _ in batches], [64, 36, 64, 36, 30])
+        self.assertTrue(all(X.dtype == np.float32 and X.flags.c_contiguous for X, _ in batches))
+        stored = np.array(BarStore.default().load(asset).close)
+        X, y = windows_from_store(asset, 20)
+        expected_X, expected_y = list_windows(stored.reshape(-1, 1), stored, 20)
+        np.testing.assert_array_equal(X, expected_X)
+        np.testing.assert_array_equal(y, expected_y)
+        np.testing.assert_array_equal(np.concatenate([X for X, _ in batches]), expected_X.astype(np.float32))
+        np.testing.assert_array_equal(np.concatenate([y for _, y in batches]), expected_y.astype(np.float32))
+
+        shuffled = list(iter_window_batches(asset, 20, batch_size=64, chunk_rows=100, shuffle=True, seed=1))
+        self.assertEqual(sorted(X[0, 0, 0] for X, _ in shuffled), sorted(X[0, 0, 0] for X, _ in batches))
+
+
+class ScalerPathTests(SimpleTestCase):
+    def test_only_the_file_name_suffix_is_replaced(self):
+        self.assertEqual(scaler_path_for('/srv/my_lstm_models/AAPL_lstm.keras'), '/srv/my_lstm_models/AAPL_scaler.save')
+        self.assertEqual(scaler_path_for('/srv/models/BTC_lstm.npz'), '/srv/models/BTC_scaler.save')
+
+
+class RegistryTestCase(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        settings = override_settings(AI_MODEL_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def save_model(self, symbol, mtime=None):
+        """Placeholder Keras model and scaler files for `symbol`."""
+        path = self.dir / f"{symbol}_lstm.keras"
+        path.write_bytes(b'keras')
+        (self.dir / f"{symbol}_scaler.save").write_bytes(b'scaler')
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def export(self, symbol, seed=0, mtime=None):
+        """NumPy runtime export of a random model for `symbol`."""
+        path = self.dir / f"{symbol}_lstm.npz"
+        export_lstm(random_model(seed), scaler(), path)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+
+class ModelRegistryTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        # Pas de TensorFlow ici : le chargement renvoie un modèle factice
+        patcher = mock.patch.object(ModelRegistry, '_load', side_effect=lambda spec: LoadedModel(spec, object(), object(), 1))
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_resolve_from_model_dir_or_metadata(self):
+        self.assertIsNone(ModelRegistry.resolve('TEST'))
+        path = self.save_model('TEST', mtime=1_900_000_000)
+        spec = ModelRegistry.resolve('TEST')
+        self.assertEqual(spec.model_path, str(path))
+        self.assertEqual(spec.scaler_path, str(self.dir / 'TEST_scaler.save'))
+        self.assertEqual(spec.version, 'lstm-1900000000')
+
+        AIModelMetadata.objects.create(name='TEST', model_type=AIModelMetadata.ModelType.LSTM,
+                                       version='7', file_path=str(path))
+        self.assertEqual(ModelRegistry.resolve('TEST').version, 'lstm-7')
+
+    def test_resolve_prefers_an_up_to_date_export(self):
+        self.save_model('TEST', mtime=2_000_000_000)
+        self.assertEqual(ModelRegistry.resolve('TEST').runtime, 'keras')
+        self.export('TEST', mtime=1_999_999_999)  # export plus ancien que le modèle
+        self.assertEqual(ModelRegistry.resolve('TEST').runtime, 'keras')
+
+        self.export('TEST', mtime=2_000_000_001)
+        spec = ModelRegistry.resolve('TEST')
+        self.assertEqual(spec.runtime, 'numpy')
+        self.assertEqual(spec.model_path, str(self.dir / 'TEST_lstm.npz'))
+
+    def test_asset_type_model_is_shared(self):
+        path = self.save_model('CRYPTO_SHARED')
+        AIModelMetadata.objects.create(name='CRYPTO_SHARED', model_type=AIModelMetadata.ModelType.LSTM,
+                                       asset_type='CRYPTO', version='7', file_path=str(path))
+        spec = ModelRegistry.resolve('BTCUSD', 'CRYPTO')
+        self.assertEqual(spec.model_path, str(path))
+        self.assertEqual(spec.version, 'lstm-7')
+        self.assertIsNone(ModelRegistry.resolve('AAPL', 'STOCK'))
+
+        registry = ModelRegistry(max_bytes=10**9, max_models=4)
+        self.assertIs(registry.get('BTCUSD', 'CRYPTO'), registry.get('ETHUSD', 'CRYPTO'))
+        self.assertEqual(self.load.call_count, 1)
+
+    def test_get_caches_until_the_file_changes(self):
+        self.save_model('TEST', mtime=1_900_000_000)
+        registry = ModelRegistry(max_bytes=10**9, max_models=4)
+        first = registry.get('TEST')
+        self.assertIs(registry.get('TEST'), first)
+        self.assertIs(registry.get('TEST', spec=ModelRegistry.resolve('TEST')), first)
+        self.assertEqual(self.load.call_count, 1)
+
+        self.save_model('TEST', mtime=1_900_000_100)
+        second = registry.get('TEST')
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(registry.stats()['models'], 1)
+
+    def test_lru_eviction(self):
+        for symbol in ('A', 'B', 'C'):
+            self.save_model(symbol)
+        registry = ModelRegistry(max_bytes=10**9, max_models=2)
+        registry.get('A')
+        registry.get('B')
+        registry.get('A')
+        registry.get('C')
+        self.assertEqual(set(registry.stats()['entries']),
+                         {str(self.dir / 'A_lstm.keras'), str(self.dir / 'C_lstm.keras')})
+
+
+class PredictionServiceTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        patcher = mock.patch.object(BarStore, '_default', BarStore(self.dir / 'bars'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        registry = mock.patch.object(ModelRegistry, '_default', ModelRegistry())
+        registry.start()
+        self.addCleanup(registry.stop)
+
+        close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, 120))
+        self.frame = pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1.0},
+                                  index=pd.date_range('2024-01-01', periods=120, freq='h', tz='UTC'))
+        for symbol in ('AAA', 'BBB', 'CCC'):
+            asset = Asset.objects.create(symbol=symbol, name=symbol, asset_type=Asset.AssetType.STOCK)
+            PriceHistoryWriter.write(asset, self.frame)
+
+    def test_batch_scores_every_symbol(self):
+        signals = PredictionService.run_batch(['AAA', 'BBB', 'CCC', 'NOPE'])
+        self.assertEqual(sorted(signals), ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(len({signal.id for signal in signals.values()}), 3)
+
+    def test_batch_labels_and_resolves_each_model_once(self):
+        self.export('AAA')
+        self.export('BBB', seed=1)
+        with mock.patch.object(ModelRegistry, 'resolve', wraps=ModelRegistry.resolve) as resolve:
+            signals = PredictionService.run_batch(['AAA', 'BBB', 'CCC'])
+        self.assertEqual(resolve.call_count, 3)
+
+        for symbol in ('AAA', 'BBB'):
+            spec = ModelRegistry.resolve(symbol)
+            self.assertEqual(signals[symbol].model_version, spec.version)
+            self.assertEqual(signals[symbol].technical_indicators['model'], spec.version)
+        fallback = PredictionService.fallback_model(PredictionService.load_features(signals['CCC'].asset))
+        self.assertEqual(signals['CCC'].technical_indicators['model'], fallback)
+
+    def test_resampled_timeframes_do_not_use_the_base_model(self):
+        self.export('AAA')
+        signal = PredictionService.run_batch(['AAA'], timeframe='4h')['AAA']
+        df = PredictionService.load_features(signal.asset, '4h')
+        self.assertEqual(signal.technical_indicators['model'], PredictionService.fallback_model(df))
+        self.assertAlmostEqual(float(signal.predicted_price), PredictionService.predict_fallback(df)[0], places=6)
+
+    def test_lstm_prediction_matches_the_runtime(self):
+        self.export('AAA')
+        signal = PredictionService.run_batch(['AAA'])['AAA']
+        df = PredictionService.load_features(signal.asset)
+        model, scaler_ = load_lstm(self.dir / 'AAA_lstm.npz')
+        window = scaler_.transform(df['close'].to_numpy()[-PredictionService.LOOK_BACK:].reshape(1, -1, 1))
+        expected = scaler_.inverse_transform(model.predict(window).reshape(-1, 1))[0, 0]
+        self.assertAlmostEqual(float(signal.predicted_price), expected, places=4)
+
+    def test_cached_signal_is_reused(self):
+        first = PredictionService.run_batch(['AAA'])['AAA']
+        self.assertEqual(PredictionService.run_batch(['AAA'])['AAA'].id, first.id)
+        self.assertNotEqual(PredictionService.run_batch(['AAA'], timeframe='4h')['AAA'].id, first.id)
+
+        # Nouvelle barre : nouvelle prédiction
+        last = self.frame.iloc[-1:].set_axis(self.frame.index[-1:] + pd.Timedelta(hours=1))
+        PriceHistoryWriter.write(first.asset, last)
+        second = PredictionService.run_batch(['AAA'])['AAA']
+        self.assertNotEqual(second.id, first.id)
+
+        self.export('AAA')  # nouveau modèle : nouvelle prédiction
+        self.assertNotEqual(PredictionService.run_batch(['AAA'])['AAA'].id, second.id)
+
+    def test_fallback_key_and_label_agree(self):
+        short = Asset.objects.create(symbol='SHORT', name='Short', asset_type=Asset.AssetType.STOCK)
+        PriceHistoryWriter.write(short, BarStore.default().load_frame('AAA').iloc[:15])
+        # Avec TensorFlow, moins de 20 barres retombent sur l'heuristique au lieu de Momentum_v1
+        with mock.patch('ai_prediction.services.HAS_TF', True):
+            for symbol, label in (('SHORT', 'Heuristic_v1'), ('CCC', 'Momentum_v1')):
+                first = PredictionService.run_batch([symbol])[symbol]
+                self.assertEqual(first.model_version, label)
+                self.assertEqual(first.technical_indicators['model'], label)
+                self.assertEqual(PredictionService.run_batch([symbol])[symbol].id, first.id)
+
+    def test_timeframe_is_stored_and_filtered_on(self):
+        base = PredictionService.run_batch(['AAA'])['AAA']
+        resampled = PredictionService.run_batch(['AAA'], timeframe='4h')['AAA']
+        self.assertEqual(base.timeframe, '')
+        self.assertEqual(resampled.timeframe, '4h')
+
+        # Le signal 4h est le plus récent, mais chaque requête lit son propre timeframe
+        response = self.client.post('/api/v1/ai/predict/predict/', {'symbol': 'AAA'}, content_type='application/json')
+        self.assertEqual(response.json()['id'], base.id)
+        response = self.client.post('/api/v1/ai/predict/predict/', {'symbol': 'AAA', 'timeframe': '4h'},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['id'], resampled.id)
+        self.assertEqual([row['id'] for row in self.client.get('/api/v1/ai/predict/batch/').json()], [base.id])
+        self.assertEqual([row['id'] for row in self.client.get('/api/v1/ai/predict/batch/?timeframe=4h').json()],
+                         [resampled.id])
+
+    def test_only_base_signals_auto_trade(self):
+        user = User.objects.create_user('trader')
+        UserPreference.objects.create(user=user, auto_trade=True, min_confidence=0.0)
+        BrokerAccount.objects.create(user=user, name='Demo', broker_type=BrokerAccount.BrokerType.DERIV,
+                                     account_id='1', api_key='key')
+        with mock.patch('core.signals.execute_trade_task'):
+            for timeframe in (None, '1h', '4h'):
+                PredictionService.run_batch(['AAA'], timeframe=timeframe)
+        self.assertEqual(Signal.objects.filter(asset__symbol='AAA').count(), 3)
+        self.assertEqual(list(Trade.objects.values_list('signal__timeframe', flat=True)), [''])
+
+
+class WalkForwardTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        registry = mock.patch.object(ModelRegistry, '_default', ModelRegistry())
+        registry.start()
+        self.addCleanup(registry.stop)
+        close = 100 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.02, 150)))
+        self.df = PredictionService.add_indicators(pd.DataFrame(
+            {'close': close, 'high': close * 1.01, 'low': close * 0.99, 'volume': 1.0},
+            index=pd.date_range('2024-01-01', periods=150, freq='h', tz='UTC')))
+
+    def assert_matches_predict_next(self, symbol=None, window_size=30, **tolerance):
+        preds, confidences = PredictionService.predict_walk_forward(self.df, symbol, window_size=window_size)
+        self.assertTrue(np.isnan(preds[:window_size]).all())
+        expected = np.array([PredictionService.predict_next(self.df.iloc[i - window_size:i], symbol)
+                             for i in range(window_size, len(self.df))])
+        np.testing.assert_allclose(preds[window_size:], expected[:, 0], **tolerance)
+        np.testing.assert_allclose(confidences[window_size:], expected[:, 1], **tolerance)
+        return confidences[window_size:]
+
+    def test_fallbacks_match_predict_next(self):
+        confidences = self.assert_matches_predict_next()
+        self.assertEqual(set(confidences), {0.5, 0.75})  # RSI neutre et extrême
+        with mock.patch('ai_prediction.services.HAS_TF', True):
+            self.assert_matches_predict_next()
+
+    def test_lstm_matches_predict_next(self):
+        self.export('AAA')
+        confidences = self.assert_matches_predict_next('AAA', rtol=1e-5)
+        self.assertGreaterEqual(confidences.min(), 0.70)  # LSTM, pas l'heuristique
+        # Fenêtres plus courtes que LOOK_BACK : predict_next retombe sur les fallbacks
+        self.assert_matches_predict_next('AAA', window_size=15, rtol=1e-5)
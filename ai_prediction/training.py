@@ -0,0 +1,248 @@
+"""
+LSTM training on the locally stored bars (BarStore), for one symbol or for a
+whole universe in a process pool.
+
+Each pool worker is a fresh (spawned) interpreter with its own TensorFlow
+runtime limited to `threads` intra-op threads, so `workers * threads` bounds
+the CPU used by a training run. Workers only read the BarStore and write the
+model files; AIModelMetadata is updated by the parent process.
+"""
+import os
+import time
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.lazy import lazy_import
+from ai_prediction.registry import scaler_path_for
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+LOOK_BACK = 20
+
+
+def build_lstm(look_back=LOOK_BACK, n_features=1):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Input, LSTM, Dense, Dropout
+
+    model = Sequential([
+        Input(shape=(look_back, n_features)),
+        LSTM(units=50, return_sequences=True),
+        Dropout(0.2),
+        LSTM(units=50, return_sequences=False),
+        Dropout(0.2),
+        Dense(units=25),
+        Dense(units=1)
+    ])
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+def model_paths(symbol, model_dir=None):
+    model_dir = str(model_dir or settings.AI_MODEL_DIR)
+    base = os.path.join(model_dir, symbol)
+    return {
+        'keras': f"{base}_lstm.keras",
+        'npz': f"{base}_lstm.npz",
+        'scaler': f"{base}_scaler.save",
+    }
+
+
+def save_trained_model(symbol, model, scaler, model_dir=None):
+    """Writes the .keras model, the joblib scaler and the NumPy inference export."""
+    import joblib
+    from ai_prediction.runtime import export_lstm
+
+    paths = model_paths(symbol, model_dir)
+    os.makedirs(os.path.dirname(paths['keras']), exist_ok=True)
+    model.save(paths['keras'])
+    joblib.dump(scaler, paths['scaler'])
+    # Exported last: the registry prefers the .npz once it is newer than the .keras file
+    export_lstm(model, scaler, paths['npz'])
+    return paths
+
+
+def register_model(symbol, model_path, accuracy=None, trained_until=None):
+    """Records a newly trained model so prediction workers reload it."""
+    from ai_prediction.models import AIModelMetadata
+
+    meta, _ = AIModelMetadata.objects.update_or_create(
+        name=symbol,
+        model_type=AIModelMetadata.ModelType.LSTM,
+        defaults={
+            'file_path': os.path.abspath(model_path),
+            'version': timezone.now().strftime("%Y%m%d%H%M%S"),
+            'accuracy': accuracy,
+            'trained_until': trained_until,
+            'is_active': True,
+        }
+    )
+    return meta
+
+
+def _bar_datetime(ns):
+    from datetime import datetime, timezone as dt_timezone
+    return datetime.fromtimestamp(int(ns) / 1e9, tz=dt_timezone.utc)
+
+
+def train_symbol(symbol, look_back=LOOK_BACK, epochs=10, batch_size=32, days=730, timeframe=None,
+                 min_samples=100, model_dir=None, incremental=False, incremental_epochs=3):
+    """
+    Trains the LSTM of `symbol` on its stored closes over the last `days`.
+    With `incremental`, fine-tunes the current model on the new bars instead
+    (see finetune_symbol) and only falls back to a full training when that
+    is not possible.
+    Returns a result dict (status 'trained' or 'skipped').
+    """
+    from ai_prediction.windowing import load_bars, sliding_windows
+
+    if incremental:
+        result = finetune_symbol(symbol, look_back, incremental_epochs, batch_size, timeframe, model_dir)
+        if result is not None:
+            return result
+        logger.info(f"{symbol}: no usable model to fine-tune, full training")
+
+    started = time.monotonic()
+    bars = load_bars(symbol, timeframe, start=timezone.now() - timedelta(days=days) if days else None)
+    if len(bars) < min_samples:
+        return {'symbol': symbol, 'status': 'skipped', 'reason': f"{len(bars)} bars"}
+
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled = scaler.fit_transform(bars.close.reshape(-1, 1))
+    X, y = sliding_windows(scaled, look_back)
+
+    model = build_lstm(look_back)
+    history = model.fit(X, y, batch_size=batch_size, epochs=epochs, verbose=0)
+    paths = save_trained_model(symbol, model, scaler, model_dir)
+
+    return {
+        'symbol': symbol,
+        'status': 'trained',
+        'mode': 'full',
+        'samples': int(len(X)),
+        'loss': float(history.history['loss'][-1]),
+        'model_path': paths['keras'],
+        'trained_until': _bar_datetime(bars.datetime[-1]),
+        'seconds': round(time.monotonic() - started, 1),
+    }
+
+
+def finetune_symbol(symbol, look_back=LOOK_BACK, epochs=3, batch_size=32, timeframe=None, model_dir=None,
+                    max_drift=0.2):
+    """
+    Warm-start retrain: loads the current model and scaler of `symbol` and
+    fits them for a few epochs on the bars stored after
+    AIModelMetadata.trained_until (or last_trained), plus the look_back bars
+    needed by the first new window. The scaler is reused unchanged so the
+    model keeps seeing the same input scale.
+
+    Returns None when a full training is needed instead: no registered
+    model/scaler on disk, or new prices leaving the scaler range by more than
+    `max_drift` of its width.
+    """
+    from ai_prediction.models import AIModelMetadata
+    from ai_prediction.windowing import load_bars, sliding_windows
+    from core.services.bar_store import _dt_to_ns
+
+    meta = (AIModelMetadata.objects
+            .filter(name=symbol, model_type=AIModelMetadata.ModelType.LSTM, is_active=True)
+            .exclude(file_path__isnull=True).exclude(file_path='')
+            .order_by('-last_trained').first())
+    if meta is None:
+        return None
+    model_path = meta.file_path
+    scaler_path = scaler_path_for(model_path)
+    if not (model_path.endswith('.keras') and os.path.exists(model_path) and os.path.exists(scaler_path)):
+        return None
+
+    import joblib
+    import tensorflow as tf
+
+    started = time.monotonic()
+    bars = load_bars(symbol, timeframe)
+    since = meta.trained_until or meta.last_trained
+    first_new = int(np.searchsorted(bars.datetime, _dt_to_ns(since), 'right'))
+    if first_new >= len(bars):
+        return {'symbol': symbol, 'status': 'skipped', 'reason': 'no new bars since last training'}
+
+    closes = bars.close[max(first_new - look_back, 0):].reshape(-1, 1)
+    scaler = joblib.load(scaler_path)
+    low, high = float(scaler.data_min_[0]), float(scaler.data_max_[0])
+    margin = max_drift * (high - low)
+    if closes.min() < low - margin or closes.max() > high + margin:
+        logger.info(f"{symbol}: prices left the scaler range [{low}, {high}], full retrain needed")
+        return None
+
+    X, y = sliding_windows(scaler.transform(closes), look_back)
+    if len(X) == 0:
+        return {'symbol': symbol, 'status': 'skipped', 'reason': f"{len(bars) - first_new} new bars < look_back"}
+
+    model = tf.keras.models.load_model(model_path)
+    history = model.fit(X, y, batch_size=batch_size, epochs=epochs, verbose=0)
+    paths = save_trained_model(symbol, model, scaler, model_dir)
+
+    return {
+        'symbol': symbol,
+        'status': 'trained',
+        'mode': 'incremental',
+        'samples': int(len(X)),
+        'loss': float(history.history['loss'][-1]),
+        'model_path': paths['keras'],
+        'trained_until': _bar_datetime(bars.datetime[-1]),
+        'seconds': round(time.monotonic() - started, 1),
+    }
+
+
+def _init_worker(threads):
+    """Pool initializer: Django + a TensorFlow runtime capped at `threads` threads."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+    import django
+    django.setup()
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _train_in_worker(symbol, kwargs):
+    try:
+        return train_symbol(symbol, **kwargs)
+    except Exception as e:
+        return {'symbol': symbol, 'status': 'failed', 'reason': str(e)}
+
+
+def train_many(symbols, workers=None, threads=1, on_result=None, **kwargs):
+    """
+    Trains `symbols` in a pool of `workers` processes with `threads` TF threads
+    each, registering every trained model in AIModelMetadata as it finishes.
+    Returns the list of result dicts.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    results = []
+
+    # spawn: TensorFlow is not fork-safe, and each worker gets its own thread pools
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(_train_in_worker, symbol, kwargs): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            result = future.result()
+            if result['status'] == 'trained':
+                register_model(result['symbol'], result['model_path'], trained_until=result.get('trained_until'))
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
@@ -5,6 +5,7 @@ from .services import PredictionService
 from core.serializers import SignalSerializer
 from core.models import Asset, Signal
 from core.tasks import analyze_market_trends
+from core.services.resampler import TIMEFRAMES
 
 class AIViewSet(viewsets.ViewSet):
     permission_classes = [permissions.AllowAny]
@@ -13,13 +14,16 @@ class AIViewSet(viewsets.ViewSet):
     def predict(self, request):
         """
         Get or trigger AI prediction for a specific symbol.
-        POST /api/v1/ai/predict/ {"symbol": "BTCUSD", "refresh": false}
+        POST /api/v1/ai/predict/ {"symbol": "BTCUSD", "refresh": false, "timeframe": "1h"}
         """
         symbol = request.data.get('symbol')
         refresh = request.data.get('refresh', False)
+        timeframe = request.data.get('timeframe')
         
         if not symbol:
             return Response({"error": "Symbol is required"}, status=400)
+        if timeframe and timeframe not in TIMEFRAMES:
+            return Response({"error": f"Unsupported timeframe {timeframe}"}, status=400)
         
         try:
             asset = Asset.objects.get(symbol=symbol)
@@ -27,17 +31,17 @@ class AIViewSet(viewsets.ViewSet):
             return Response({"error": f"Asset {symbol} not found"}, status=404)
 
         if refresh:
-            signal = PredictionService.run_prediction(symbol)
+            signal = PredictionService.run_prediction(symbol, timeframe=timeframe)
             if signal:
                 return Response(SignalSerializer(signal).data)
         else:
-            # Return latest cached signal
-            signal = Signal.objects.filter(asset=asset).order_by('-generated_at').first()
+            # Return latest cached signal of the requested timeframe
+            signal = Signal.objects.filter(asset=asset, timeframe=timeframe or '').order_by('-generated_at').first()
             if signal:
                 return Response(SignalSerializer(signal).data)
             
             # If no signal exists, generate one now
-            signal = PredictionService.run_prediction(symbol)
+            signal = PredictionService.run_prediction(symbol, timeframe=timeframe)
             if signal:
                 return Response(SignalSerializer(signal).data)
         
@@ -47,12 +51,16 @@ class AIViewSet(viewsets.ViewSet):
     def batch_predict(self, request):
         """
         Return latest cached predictions for all active assets.
-        GET /api/v1/ai/batch/
+        GET /api/v1/ai/batch/?timeframe=1h (base interval when omitted)
         """
+        timeframe = request.query_params.get('timeframe')
+        if timeframe and timeframe not in TIMEFRAMES:
+            return Response({"error": f"Unsupported timeframe {timeframe}"}, status=400)
+
         assets = Asset.objects.filter(is_active=True)
         results = []
         for asset in assets:
-            latest_signal = Signal.objects.filter(asset=asset).order_by('-generated_at').first()
+            latest_signal = Signal.objects.filter(asset=asset, timeframe=timeframe or '').order_by('-generated_at').first()
             if latest_signal:
                 results.append(SignalSerializer(latest_signal).data)
         
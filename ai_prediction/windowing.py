@@ -0,0 +1,119 @@
+"""
+Supervised (X, y) windows for sequence models, built from strided views.
+
+X[i] = features[i : i + look_back] and y[i] = target[i + look_back + horizon - 1],
+so horizon=1 predicts the bar right after the window. X is a read-only view
+on the input array (no per-window copy); histories that do not fit in memory
+are streamed in batches straight from the BarStore segment.
+"""
+import logging
+
+from core.lazy import lazy_import
+from core.services.bar_store import BarStore
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+
+def _as_2d(values):
+    values = np.asarray(values)
+    return values.reshape(-1, 1) if values.ndim == 1 else values
+
+
+def window_count(n_rows, look_back, horizon=1):
+    return max(n_rows - look_back - horizon + 1, 0)
+
+
+def sliding_windows(features, look_back, horizon=1, target=None):
+    """
+    features: (n,) or (n, f) array; target: (n,) array (defaults to the first feature column).
+    Returns X of shape (m, look_back, f) as a view on `features` and y of shape (m,).
+    """
+    features = _as_2d(features)
+    target = features[:, 0] if target is None else np.asarray(target)
+    m = window_count(len(features), look_back, horizon)
+    if m == 0:
+        return (np.empty((0, look_back, features.shape[1]), dtype=features.dtype),
+                np.empty(0, dtype=target.dtype))
+
+    # (n - look_back + 1, f, look_back) view -> (m, look_back, f), still no copy
+    X = np.lib.stride_tricks.sliding_window_view(features, look_back, axis=0)[:m].transpose(0, 2, 1)
+    y = target[look_back + horizon - 1:look_back + horizon - 1 + m]
+    return X, y
+
+
+def _columns(bars, features, target):
+    features = np.column_stack([getattr(bars, col) for col in features])
+    return features, getattr(bars, target)
+
+
+def load_bars(asset, timeframe=None, start=None, end=None):
+    """Stored Bars of `asset`, resampled to `timeframe` when given."""
+    if timeframe:
+        from core.services.resampler import BarResampler
+        return BarResampler.default().load(asset, timeframe, start=start, end=end)
+    return BarStore.default().load(asset, start=start, end=end)
+
+
+def windows_from_store(asset, look_back, horizon=1, features=('close',), target='close',
+                       scaler=None, timeframe=None, start=None, end=None):
+    """
+    (X, y) for `asset` from the stored bars (optionally resampled to `timeframe`).
+    `scaler` (fitted, with transform()) is applied to the feature matrix and,
+    for single-feature windows on the target column, to y as well.
+    """
+    features_arr, target_arr = _columns(load_bars(asset, timeframe, start, end), features, target)
+    if scaler is not None:
+        features_arr = scaler.transform(features_arr)
+        if tuple(features) == (target,):
+            target_arr = features_arr[:, 0]
+    return sliding_windows(features_arr, look_back, horizon, target_arr)
+
+
+def iter_window_batches(asset, look_back, horizon=1, batch_size=1024, features=('close',), target='close',
+                        scaler=None, timeframe=None, start=None, end=None, chunk_rows=1_000_000, shuffle=False, seed=None):
+    """
+    Yields (X, y) batches over the whole history without materialising it:
+    the memory-mapped segment is read `chunk_rows` bars at a time (chunks
+    overlap by look_back + horizon - 1 rows so no window is lost) and each
+    batch is a contiguous float32 copy of `batch_size` windows.
+    `shuffle` permutes the batches of each chunk.
+    """
+    bars = load_bars(asset, timeframe, start, end)
+    n = len(bars)
+    overlap = look_back + horizon - 1
+    rng = np.random.default_rng(seed) if shuffle else None
+
+    chunk_start = 0
+    while chunk_start + overlap < n:
+        chunk_end = min(chunk_start + chunk_rows + overlap, n)
+        sl = slice(chunk_start, chunk_end)
+        features_arr = np.column_stack([getattr(bars, col)[sl] for col in features])
+        target_arr = getattr(bars, target)[sl]
+        if scaler is not None:
+            features_arr = scaler.transform(features_arr)
+            if tuple(features) == (target,):
+                target_arr = features_arr[:, 0]
+
+        X, y = sliding_windows(features_arr, look_back, horizon, target_arr)
+        starts = np.arange(0, len(X), batch_size)
+        if rng is not None:
+            rng.shuffle(starts)
+        for i in starts:
+            yield (np.ascontiguousarray(X[i:i + batch_size], dtype=np.float32),
+                   np.ascontiguousarray(y[i:i + batch_size], dtype=np.float32))
+        chunk_start = chunk_end - overlap
+
+
+def as_tf_dataset(asset, look_back, horizon=1, batch_size=1024, features=('close',), **kwargs):
+    """tf.data.Dataset over iter_window_batches (TensorFlow is imported here only)."""
+    import tensorflow as tf
+
+    return tf.data.Dataset.from_generator(
+        lambda: iter_window_batches(asset, look_back, horizon, batch_size, features, **kwargs),
+        output_signature=(
+            tf.TensorSpec(shape=(None, look_back, len(features)), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32),
+        ),
+    ).prefetch(tf.data.AUTOTUNE)
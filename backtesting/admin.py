@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import BacktestRun
+
+@admin.register(BacktestRun)
+class BacktestRunAdmin(admin.ModelAdmin):
+    list_display = ('strategy', 'symbols', 'status', 'total_trades', 'user', 'created_at')
+    list_filter = ('strategy', 'status')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('metrics', 'artifact')
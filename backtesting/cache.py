@@ -0,0 +1,142 @@
+"""
+Content-addressed disk cache of backtest outputs (metrics, equity curve,
+trade list), one NPZ file per key, least recently used entries evicted
+beyond BACKTEST_CACHE_MAX_BYTES / BACKTEST_CACHE_MAX_ENTRIES.
+
+Keys are sha256 hashes of canonical JSON: the same strategy config, symbol
+set and data versions give the same key whatever the order of the keys or
+the spelling of the numbers (50 == 50.0), so an unchanged backtest is never
+recomputed.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from core.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return str(value)
+
+
+def canonical_json(value):
+    """Deterministic JSON of `value`: sorted keys, no whitespace, every number as a float."""
+    return json.dumps(_normalize(value), sort_keys=True, separators=(',', ':'))
+
+
+def content_key(value):
+    return hashlib.sha256(canonical_json(value).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    <root>/<key>.npz, written atomically. A hit refreshes the file's mtime,
+    which orders the LRU eviction done after every put(). Eviction only
+    scans the files directly under root, never its subdirectories;
+    bounded=False gives a store that never evicts.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, root=None, max_bytes=None, max_entries=None, bounded=True):
+        root = root or getattr(settings, 'BACKTEST_RESULTS_DIR', None) or Path(settings.BASE_DIR) / 'data' / 'backtests'
+        self.root = Path(root)
+        self.max_bytes = self.max_entries = None
+        if bounded:
+            self.max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'BACKTEST_CACHE_MAX_BYTES', None)
+            self.max_entries = (max_entries if max_entries is not None
+                                else getattr(settings, 'BACKTEST_CACHE_MAX_ENTRIES', None))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        """Process-wide cache rooted at settings.BACKTEST_RESULTS_DIR."""
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    def path(self, key):
+        return self.root / f"{key}.npz"
+
+    def contains(self, key):
+        return self.path(key).exists()
+
+    def get(self, key):
+        """{name: array} of the entry, or None on a miss."""
+        path = self.path(key)
+        try:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # évincée entre-temps : les tableaux sont déjà lus
+        return arrays
+
+    def put(self, key, arrays):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        tmp = self.root / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, path)
+        self.evict(keep=key)
+        return path
+
+    def delete(self, key):
+        self.path(key).unlink(missing_ok=True)
+
+    def evict(self, keep=None):
+        """Removes the least recently used entries beyond the limits. Returns the number removed."""
+        if self.max_bytes is None and self.max_entries is None:
+            return 0
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.root):
+                if entry.name.endswith('.npz'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.name))
+            keep_name = f"{keep}.npz"
+            # Plus récentes d'abord, l'entrée qui vient d'être écrite en tête
+            entries.sort(key=lambda e: (e[2] == keep_name, e[0]), reverse=True)
+
+            kept, total, removed = 0, 0, 0
+            full = False
+            for _, size, name in entries:
+                if name != keep_name:
+                    # LRU strict : une fois la limite atteinte, toutes les entrées plus anciennes partent
+                    full = full or ((self.max_bytes is not None and total + size > self.max_bytes)
+                                    or (self.max_entries is not None and kept >= self.max_entries))
+                    if full:
+                        (self.root / name).unlink(missing_ok=True)
+                        removed += 1
+                        continue
+                kept += 1
+                total += size
+            if removed:
+                logger.info(f"Backtest cache: evicted {removed} entries ({total / 1e6:.1f} MB kept)")
+            return removed
@@ -0,0 +1,32 @@
+"""
+Bar loading for the backtests: one OHLCV DataFrame per asset, straight from
+the BarStore (float64 columns, sorted UTC DatetimeIndex).
+"""
+import logging
+
+from core.services.bar_store import BarStore
+
+logger = logging.getLogger(__name__)
+
+
+def load_frame(symbol, timeframe=None, start=None, end=None):
+    """
+    Returns (asset, frame) for `symbol`, resampled to `timeframe` when given.
+    Raises ValueError when the asset is unknown or has no stored bars.
+    """
+    from core.models import Asset
+
+    try:
+        asset = Asset.objects.get(symbol=symbol)
+    except Asset.DoesNotExist:
+        raise ValueError(f"Asset {symbol} non trouvé.")
+
+    if timeframe:
+        from core.services.resampler import BarResampler
+        frame = BarResampler.default().load_frame(asset, timeframe, start=start, end=end)
+    else:
+        frame = BarStore.default().load_frame(asset, start=start, end=end)
+
+    if frame.empty:
+        raise ValueError(f"No historical data for {symbol}")
+    return asset, frame
@@ -0,0 +1,295 @@
+"""
+Backtest engine shared by every strategy script.
+
+A SignalSource gives per-bar entry/exit arrays; the engine simulates one
+position at a time over the OHLC arrays:
+
+    - position open: SL then TP are checked against the bar's low/high
+      (exit at the level), then the exit signal (exit at the close);
+    - flat: an entry signal opens a position at the bar's close, sized on
+      the current capital (risk-based when RiskRules.risk_per_trade is set,
+      all-in otherwise);
+    - the equity curve is marked to market at every close.
+
+Two implementations of these rules:
+    - "numpy" (default): event-driven, jumps from one entry signal to the
+      next and finds each exit with vectorized scans, so only trades cost
+      Python time;
+    - "numba": the plain bar loop (_bar_loop) compiled with numba when it
+      is installed ("python" runs the same loop interpreted, as reference).
+"""
+import logging
+import math
+from dataclasses import dataclass
+
+from core.lazy import lazy_import, is_available
+from backtesting.metrics import Metrics, PERIODS_PER_YEAR
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+HAS_NUMBA = is_available("numba")
+
+logger = logging.getLogger(__name__)
+
+EXIT_OPEN, EXIT_SL, EXIT_TP, EXIT_SIGNAL = 0, 1, 2, 3
+EXIT_REASONS = {EXIT_OPEN: "OPEN", EXIT_SL: "SL", EXIT_TP: "TP", EXIT_SIGNAL: "SIGNAL"}
+
+# Colonnes du tableau des trades (float64, une ligne par trade)
+TRADE_FIELDS = ('entry_index', 'exit_index', 'side', 'entry_price', 'exit_price', 'quantity', 'pnl', 'reason')
+ENTRY, EXIT, SIDE, ENTRY_PRICE, EXIT_PRICE, QUANTITY, PNL, REASON = range(len(TRADE_FIELDS))
+
+
+@dataclass(frozen=True)
+class RiskRules:
+    """
+    stop_loss / take_profit: distance of the levels from the entry price, as a
+    fraction (None = no level). risk_per_trade: fraction of the capital lost
+    when the stop-loss is hit, used to size positions (None = all-in).
+    """
+    stop_loss: float = None
+    take_profit: float = None
+    risk_per_trade: float = None
+
+
+@dataclass
+class BacktestResult:
+    equity_curve: object  # (n_bars - start + 1,) float64, equity_curve[0] = initial capital
+    trades: object  # (n_trades, len(TRADE_FIELDS)) float64; reason EXIT_OPEN = still open at the end
+    index: object  # DatetimeIndex of the simulated frame
+    start: int
+    initial_capital: float
+    confidence: object = None
+
+    @property
+    def closed_trades(self):
+        return self.trades[self.trades[:, REASON] != EXIT_OPEN]
+
+    @property
+    def open_position(self):
+        if len(self.trades) and self.trades[-1, REASON] == EXIT_OPEN:
+            return self.trades[-1]
+        return None
+
+    @property
+    def final_capital(self):
+        return self.initial_capital + float(self.closed_trades[:, PNL].sum())
+
+    def metrics(self, periods_per_year=PERIODS_PER_YEAR):
+        return Metrics(self.equity_curve, self.initial_capital, self.closed_trades[:, PNL], periods_per_year)
+
+    def trades_frame(self):
+        """Trade log as a DataFrame (one row per trade, open position included)."""
+        t = self.trades
+        entry_idx = t[:, ENTRY].astype(np.int64)
+        exit_idx = t[:, EXIT].astype(np.int64)
+        closed = t[:, REASON] != EXIT_OPEN
+        frame = pd.DataFrame({
+            'Entry Date': self.index[entry_idx],
+            'Exit Date': pd.Series(self.index[np.maximum(exit_idx, 0)]).where(closed).to_numpy(),
+            'Side': np.where(t[:, SIDE] > 0, "BUY", "SELL"),
+            'Entry Price': t[:, ENTRY_PRICE],
+            'Exit Price': np.where(closed, t[:, EXIT_PRICE], np.nan),
+            'Quantity': t[:, QUANTITY],
+            'PnL': t[:, PNL],
+            'PnL %': np.where(closed, (t[:, EXIT_PRICE] / t[:, ENTRY_PRICE] - 1) * 100 * t[:, SIDE], np.nan),
+            'Reason': [EXIT_REASONS[int(r)] for r in t[:, REASON]],
+        })
+        if self.confidence is not None:
+            frame['Confidence'] = np.asarray(self.confidence)[entry_idx]
+        return frame
+
+
+def _bar_loop(close, high, low, entries, exits, start, stop_loss, take_profit, risk_per_trade, capital,
+              equity, trades):
+    """
+    Reference bar loop, numba-compatible (no Python objects, and no lazy `np`
+    global, which numba cannot resolve: NaN comes from math). Rules are
+    disabled with values <= 0. Fills equity[1:] and trades, returns the
+    number of trade rows.
+    """
+    n_trades = 0
+    side = 0
+    entry = quantity = 0.0
+    sl = tp = math.nan
+    for i in range(start, len(close)):
+        if side != 0:
+            reason = 0
+            exit_price = 0.0
+            if side > 0:
+                if low[i] <= sl:
+                    reason, exit_price = 1, sl
+                elif high[i] >= tp:
+                    reason, exit_price = 2, tp
+            else:
+                if high[i] >= sl:
+                    reason, exit_price = 1, sl
+                elif low[i] <= tp:
+                    reason, exit_price = 2, tp
+            if reason == 0 and exits[i]:
+                reason, exit_price = 3, close[i]
+            if reason != 0:
+                pnl = (exit_price - entry) * quantity * side
+                capital += pnl
+                trades[n_trades - 1, 1] = i
+                trades[n_trades - 1, 4] = exit_price
+                trades[n_trades - 1, 6] = pnl
+                trades[n_trades - 1, 7] = reason
+                side = 0
+
+        if side == 0 and entries[i] != 0:
+            entry = close[i]
+            sl_price = entry * (1 - stop_loss) if entries[i] > 0 else entry * (1 + stop_loss)
+            quantity = capital / entry
+            if risk_per_trade > 0 and stop_loss > 0:
+                quantity = capital * risk_per_trade / abs(entry - sl_price)
+                if quantity * entry > capital:
+                    quantity = capital / entry
+            if quantity > 0:
+                side = entries[i]
+                sl = sl_price if stop_loss > 0 else math.nan
+                tp = (entry * (1 + take_profit) if side > 0 else entry * (1 - take_profit)) if take_profit > 0 else math.nan
+                trades[n_trades, 0] = i
+                trades[n_trades, 1] = -1
+                trades[n_trades, 2] = side
+                trades[n_trades, 3] = entry
+                trades[n_trades, 4] = math.nan
+                trades[n_trades, 5] = quantity
+                trades[n_trades, 6] = 0.0
+                trades[n_trades, 7] = 0
+                n_trades += 1
+
+        if side != 0:
+            equity[i - start + 1] = capital + (close[i] - entry) * quantity * side
+        else:
+            equity[i - start + 1] = capital
+    return n_trades
+
+
+_numba_loop = None
+
+
+def _compiled_loop():
+    global _numba_loop
+    if _numba_loop is None:
+        from numba import njit
+        _numba_loop = njit(cache=True, nogil=True)(_bar_loop)
+    return _numba_loop
+
+
+def _find_exit(j, side, sl, tp, close, high, low, exits):
+    """First bar >= j closing the position: (bar, reason, price), or (-1, 0, 0.0)."""
+    n = len(close)
+    step = 64
+    while j < n:
+        k = min(j + step, n)
+        if side > 0:
+            sl_hit, tp_hit = low[j:k] <= sl, high[j:k] >= tp
+        else:
+            sl_hit, tp_hit = high[j:k] >= sl, low[j:k] <= tp
+        hits = np.flatnonzero(sl_hit | tp_hit | exits[j:k])
+        if hits.size:
+            h = hits[0]
+            if sl_hit[h]:
+                return j + h, EXIT_SL, sl
+            if tp_hit[h]:
+                return j + h, EXIT_TP, tp
+            return j + h, EXIT_SIGNAL, close[j + h]
+        j = k
+        step = min(step * 2, 1 << 16)  # positions longues : fenêtres de recherche croissantes
+    return -1, EXIT_OPEN, 0.0
+
+
+def _event_loop(close, high, low, entries, exits, start, stop_loss, take_profit, risk_per_trade, capital,
+                equity, trades):
+    """Same rules as _bar_loop, visiting only entry and exit bars."""
+    n = len(close)
+    entry_bars = np.flatnonzero(entries[start:]) + start
+    n_trades = 0
+    i = start  # première barre dont l'équité n'est pas encore écrite
+    while i < n:
+        k = np.searchsorted(entry_bars, i)
+        if k == len(entry_bars):
+            break
+        e = int(entry_bars[k])
+        equity[i - start + 1:e - start + 1] = capital
+
+        side = int(entries[e])
+        entry = float(close[e])
+        sl_price = entry * (1 - stop_loss) if side > 0 else entry * (1 + stop_loss)
+        quantity = capital / entry
+        if risk_per_trade > 0 and stop_loss > 0:
+            quantity = capital * risk_per_trade / abs(entry - sl_price)
+            if quantity * entry > capital:
+                quantity = capital / entry
+        if not quantity > 0:
+            equity[e - start + 1] = capital
+            i = e + 1
+            continue
+
+        sl = sl_price if stop_loss > 0 else np.nan
+        tp = (entry * (1 + take_profit) if side > 0 else entry * (1 - take_profit)) if take_profit > 0 else np.nan
+        trades[n_trades] = (e, -1, side, entry, np.nan, quantity, 0.0, EXIT_OPEN)
+        n_trades += 1
+
+        x, reason, exit_price = _find_exit(e + 1, side, sl, tp, close, high, low, exits)
+        end = n if x < 0 else x
+        equity[e - start + 1:end - start + 1] = capital + (close[e:end] - entry) * quantity * side
+        if x < 0:
+            return n_trades
+
+        pnl = (exit_price - entry) * quantity * side
+        capital += pnl
+        trades[n_trades - 1, EXIT] = x
+        trades[n_trades - 1, EXIT_PRICE] = exit_price
+        trades[n_trades - 1, PNL] = pnl
+        trades[n_trades - 1, REASON] = reason
+        i = x  # l'équité de la barre de sortie est écrite au tour suivant (réentrée possible)
+
+    equity[i - start + 1:] = capital
+    return n_trades
+
+
+def simulate(close, high, low, entries, exits=None, start=0, rules=RiskRules(), initial_capital=10000.0,
+             engine="auto"):
+    """
+    Runs the position/SL/TP rules over the bar arrays.
+    engine: "auto" (numba if installed, else numpy), "numpy", "numba" or "python".
+    Returns (equity_curve, trades) as described on BacktestResult.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    entries = np.ascontiguousarray(entries, dtype=np.int8)
+    n = len(close)
+    exits = np.zeros(n, dtype=np.bool_) if exits is None else np.ascontiguousarray(exits, dtype=np.bool_)
+    start = min(max(int(start), 0), n)
+
+    equity = np.empty(n - start + 1)
+    equity[0] = initial_capital
+    trades = np.empty((int(np.count_nonzero(entries[start:])), len(TRADE_FIELDS)))
+
+    if engine == "auto":
+        engine = "numba" if HAS_NUMBA else "numpy"
+    loop = {"numpy": _event_loop, "python": _bar_loop}.get(engine)
+    if loop is None:
+        loop = _compiled_loop()
+    n_trades = loop(close, high, low, entries, exits, start,
+                    float(rules.stop_loss or 0.0), float(rules.take_profit or 0.0),
+                    float(rules.risk_per_trade or 0.0), float(initial_capital), equity, trades)
+    return equity, trades[:n_trades]
+
+
+def run_backtest(data, source, rules=RiskRules(), initial_capital=10000.0, engine="auto"):
+    """
+    Backtests `source` on an OHLCV DataFrame (see backtesting.data.load_frame)
+    or a mapping of column arrays (no index then: trades_frame() needs a DataFrame).
+    """
+    signals = source.signals(data)
+    close = data['close']
+    equity, trades = simulate(
+        close, data['high'], data['low'],
+        signals.entries, signals.exits, signals.start, rules, initial_capital, engine,
+    )
+    return BacktestResult(equity, trades, getattr(data, 'index', None), min(signals.start, len(close)),
+                          float(initial_capital), signals.confidence)
@@ -0,0 +1,79 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+# Stratégies et constantes de risque des trois scripts de backtest
+STRATEGIES = {
+    'ma_crossover': {},
+    'ai_predictions': {'stop_loss': 0.015, 'take_profit': 0.03, 'risk_per_trade': 0.02},
+    'ma_confidence': {'stop_loss': 0.02, 'take_profit': 0.04, 'risk_per_trade': 0.01},
+}
+
+class Command(BaseCommand):
+    help = 'Monte Carlo robustness report (return, drawdown, ruin) of a strategy on one symbol'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbol')
+        parser.add_argument('--strategy', choices=list(STRATEGIES), default='ma_confidence')
+        parser.add_argument('--paths', type=int, default=10000, help='Resampled trade sequences')
+        parser.add_argument('--method', choices=['bootstrap', 'shuffle'], default='bootstrap')
+        parser.add_argument('--confidence-paths', type=int, default=500,
+                            help='Backtests with new confidence draws (ma_confidence only)')
+        parser.add_argument('--ruin', type=float, default=0.5, help='Ruin when equity <= this fraction of the capital')
+        parser.add_argument('--fast', type=int, default=50)
+        parser.add_argument('--slow', type=int, default=200)
+        parser.add_argument('--capital', type=float, default=10000.0)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        from backtesting.data import load_frame
+        from backtesting.engine import RiskRules, run_backtest
+        from backtesting.montecarlo import resample_trades, resample_confidence, trade_returns
+        from backtesting.sources import AIPredictions, FilteredMACrossover, MACrossover
+
+        strategy = options['strategy']
+        try:
+            asset, frame = load_frame(options['symbol'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        risk = STRATEGIES[strategy]
+        if strategy == 'ma_crossover':
+            source = MACrossover(options['fast'], options['slow'])
+        elif strategy == 'ai_predictions':
+            source = AIPredictions(asset.symbol, asset.asset_type)
+        else:
+            source = FilteredMACrossover(options['fast'], options['slow'], seed=options['seed'])
+
+        started = time.monotonic()
+        result = run_backtest(frame, source, RiskRules(**risk), initial_capital=options['capital'])
+        self.stdout.write(f"Backtest {asset.symbol} ({strategy}): {len(result.closed_trades)} trades")
+        for key, value in result.metrics().calculate_key_stats().items():
+            self.stdout.write(f"  {key:28}: {value}")
+
+        trades = resample_trades(trade_returns(result), options['paths'], options['method'], options['ruin'],
+                                 seed=options['seed'], workers=options['workers'])
+        self.report(f"Trade sequence ({options['method']}, {trades.n_paths} paths)", trades.summary())
+
+        if strategy == 'ma_confidence' and options['confidence_paths']:
+            params = {'fast_period': options['fast'], 'slow_period': options['slow'], **risk}
+            data = {column: frame[column].to_numpy(dtype=float) for column in ('close', 'high', 'low')}
+            draws = resample_confidence(data, params, options['confidence_paths'], options['ruin'],
+                                        seed=options['seed'], workers=options['workers'],
+                                        initial_capital=options['capital'])
+            self.report(f"Confidence draws ({draws.n_paths} backtests)", draws.summary())
+
+        self.stdout.write(self.style.SUCCESS(f"Monte Carlo finished in {time.monotonic() - started:.1f}s"))
+
+    def report(self, title, summary):
+        self.stdout.write(f"\n{title}")
+        for name in ('total_return', 'max_drawdown'):
+            stats = summary[name]
+            if not stats:
+                continue
+            self.stdout.write(
+                f"  {name:13}: mean {stats['mean']:8.2f} %  "
+                + "  ".join(f"{key} {value:8.2f}" for key, value in stats.items() if key.startswith('p'))
+            )
+        self.stdout.write(f"  Probabilité de ruine : {summary['ruin_probability'] * 100:.2f} %")
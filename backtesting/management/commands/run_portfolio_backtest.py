@@ -0,0 +1,76 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Asset, RiskConfig, UserPreference
+from core.services.resampler import TIMEFRAMES
+
+class Command(BaseCommand):
+    help = 'Backtests a strategy on many assets at once against one shared capital (auto-trading replay)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols (default: all active assets)')
+        parser.add_argument('--strategy', choices=['ai_predictions', 'ma_crossover'], default='ai_predictions')
+        parser.add_argument('--user', default=None,
+                            help='Username whose RiskConfig and auto-trade preferences are used (default: first user)')
+        parser.add_argument('--capital', type=float, default=10000.0)
+        parser.add_argument('--max-positions', type=int, default=None, help='Concurrent positions limit')
+        parser.add_argument('--threshold', type=float, default=0.001,
+                            help='Predicted move needed for a BUY/SELL signal (ai_predictions)')
+        parser.add_argument('--fast', type=int, default=50)
+        parser.add_argument('--slow', type=int, default=200)
+        parser.add_argument('--timeframe', choices=list(TIMEFRAMES), default=None)
+        parser.add_argument('--save', action='store_true', help='Persist the run as a BacktestRun')
+
+    def handle(self, *args, **options):
+        from django.contrib.auth.models import User
+        from backtesting.data import load_frame
+        from backtesting.portfolio import PortfolioLimits, run_portfolio
+        from backtesting.sources import AIPredictions, MACrossover
+
+        # Même utilisateur que l'auto-trading de run_system_update
+        user = User.objects.filter(username=options['user']).first() if options['user'] else User.objects.first()
+        if options['user'] and user is None:
+            raise CommandError(f"Unknown user {options['user']}")
+        risk_config = RiskConfig.objects.filter(user=user).first() if user else None
+        prefs = UserPreference.objects.filter(user=user).first() if user else None
+        limits = PortfolioLimits.from_risk_config(risk_config or RiskConfig(), options['max_positions'])
+        min_confidence = prefs.min_confidence if prefs else UserPreference._meta.get_field('min_confidence').default
+
+        symbols = options['symbols'] or list(Asset.objects.filter(is_active=True).values_list('symbol', flat=True))
+        frames, sources = {}, {}
+        for symbol in symbols:
+            try:
+                asset, frames[symbol] = load_frame(symbol, options['timeframe'])
+            except ValueError as e:
+                self.stdout.write(self.style.WARNING(f"SKIP: {e}"))
+                continue
+            if options['strategy'] == 'ai_predictions':
+                sources[symbol] = AIPredictions(symbol, asset.asset_type, min_confidence=min_confidence,
+                                                threshold=options['threshold'])
+            else:
+                sources[symbol] = MACrossover(options['fast'], options['slow'])
+        if not frames:
+            raise CommandError("No symbol with stored bars.")
+
+        self.stdout.write(f"Portfolio backtest: {len(frames)} assets, {options['strategy']}, {limits}")
+        started = time.monotonic()
+        result = run_portfolio(frames, sources, limits, initial_capital=options['capital'])
+
+        for key, value in result.metrics().calculate_key_stats().items():
+            self.stdout.write(f"  {key:28}: {value}")
+        self.stdout.write(f"  {'Entrées bloquées (risque)':28}: {result.blocked_entries}")
+        for symbol, stats in sorted(result.by_asset().items(), key=lambda item: -item[1]['pnl']):
+            self.stdout.write(f"  {symbol:10} {stats['trades']:6} trades  PnL {stats['pnl']:12,.2f} $  "
+                              f"win rate {stats['win_rate']:.1f} %")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result.index)} time steps in {time.monotonic() - started:.1f}s"
+        ))
+
+        if options['save']:
+            from dataclasses import asdict
+            from backtesting.storage import save_run
+
+            config = {key: options[key] for key in ('threshold', 'fast', 'slow')}
+            config.update(asdict(limits), min_confidence=min_confidence)
+            run = save_run(result, options['strategy'], result.symbols, config, user=user,
+                           timeframe=options['timeframe'])
+            self.stdout.write(f"Saved as backtest run #{run.id}")
@@ -0,0 +1,91 @@
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Asset
+from core.services.resampler import TIMEFRAMES
+
+# Grilles par défaut : MA de backtester.py, constantes de risque de ai_backtester.py
+DEFAULT_GRIDS = {
+    'ma_crossover': {
+        'fast_period': [5, 10, 20, 50],
+        'slow_period': [50, 100, 150, 200],
+    },
+    'ai_predictions': {
+        'min_confidence': [0.55, 0.60, 0.65, 0.70, 0.75],
+        'threshold': [0.001, 0.002, 0.005],
+        'risk_per_trade': [0.01, 0.02],
+        'stop_loss': [0.01, 0.015, 0.02],
+        'take_profit': [0.02, 0.03, 0.04],
+    },
+    # risk_managed_backtester.py
+    'ma_confidence': {
+        'fast_period': [20, 50],
+        'slow_period': [100, 200],
+        'target': [0.90, 0.95, 0.97],
+        'risk_per_trade': [0.01],
+        'stop_loss': [0.02],
+        'take_profit': [0.04],
+        'seed': [0],
+    },
+}
+
+class Command(BaseCommand):
+    help = 'Backtests every combination of a parameter grid on many symbols in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to backtest (default: all active assets)')
+        parser.add_argument('--strategy', choices=list(DEFAULT_GRIDS), default='ma_crossover')
+        parser.add_argument('--grid', default=None,
+                            help='JSON {"param": [values, ...]} (default: built-in grid of the strategy)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (1 = in-process)')
+        parser.add_argument('--chunk-size', type=int, default=64, help='Combinations per pool task')
+        parser.add_argument('--capital', type=float, default=10000.0)
+        parser.add_argument('--window-size', type=int, default=30, help='AI prediction window (ai_predictions)')
+        parser.add_argument('--timeframe', choices=list(TIMEFRAMES), default=None)
+        parser.add_argument('--output', default='sweep_results.csv', help='Ranked results table (CSV)')
+        parser.add_argument('--top', type=int, default=10, help='Best rows to print')
+
+    def handle(self, *args, **options):
+        from backtesting.sweep import param_grid, sweep, load_sweep_data
+
+        strategy = options['strategy']
+        try:
+            grid = json.loads(options['grid']) if options['grid'] else dict(DEFAULT_GRIDS[strategy])
+        except json.JSONDecodeError as e:
+            raise CommandError(f"Invalid --grid: {e}")
+        if strategy == 'ai_predictions':
+            grid['window_size'] = [options['window_size']]  # les prédictions sont calculées pour cette fenêtre
+
+        where = None
+        if strategy in ('ma_crossover', 'ma_confidence'):
+            where = lambda p: p.get('fast_period', 50) < p.get('slow_period', 200)
+        combos = param_grid(grid, where)
+        if not combos:
+            raise CommandError("The grid has no valid combination.")
+
+        symbols = options['symbols'] or list(Asset.objects.filter(is_active=True).values_list('symbol', flat=True))
+        started = time.monotonic()
+        frames = load_sweep_data(strategy, symbols, options['window_size'], options['timeframe'])
+        if not frames:
+            self.stdout.write(self.style.WARNING("No symbol with stored bars."))
+            return
+        self.stdout.write(
+            f"Sweeping {len(combos)} combinations x {len(frames)} symbols ({strategy}) "
+            f"with {options['workers']} workers..."
+        )
+
+        step = max(1, len(combos) * len(frames) // 20)
+
+        def progress(done, total):
+            if done % step < options['chunk_size'] or done == total:
+                self.stdout.write(f"  {done}/{total} backtests")
+
+        table = sweep(strategy, frames, combos, workers=options['workers'], chunk_size=options['chunk_size'],
+                      initial_capital=options['capital'], on_progress=progress)
+        table.to_csv(options['output'], index=False)
+
+        self.stdout.write(table.head(options['top']).to_string(index=False))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(table)} backtests in {time.monotonic() - started:.1f}s, results written to {options['output']}"
+        ))
@@ -0,0 +1,90 @@
+"""
+Indicateurs de performance (KPIs) d'un backtest, calculés en NumPy à partir
+de la courbe d'équité et des PnL des trades.
+
+Remplace les trois classes Metrics de backtester.py, ai_backtester.py et
+risk_managed_backtester.py.
+"""
+import numpy as np
+
+PERIODS_PER_YEAR = 252  # Barres journalières
+
+
+class Metrics:
+    """
+    equity_curve: equity after each simulated bar (first point = initial capital).
+    trades_log: PnL array, list of trade dicts with a 'PnL' key or DataFrame with a 'PnL' column.
+    """
+
+    def __init__(self, equity_curve, initial_capital, trades_log=None, periods_per_year=PERIODS_PER_YEAR):
+        self.equity_curve = np.asarray(equity_curve, dtype=float)
+        self.initial_capital = float(initial_capital)
+        self.pnl = self._pnl(trades_log)
+        self.periods_per_year = periods_per_year
+
+    @staticmethod
+    def _pnl(trades_log):
+        if trades_log is None:
+            return np.empty(0)
+        if hasattr(trades_log, 'columns'):
+            return trades_log['PnL'].to_numpy(dtype=float) if 'PnL' in trades_log.columns else np.empty(0)
+        if len(trades_log) and isinstance(trades_log[0], dict):
+            return np.array([t['PnL'] for t in trades_log], dtype=float)
+        return np.asarray(trades_log, dtype=float)
+
+    @property
+    def final_capital(self):
+        return float(self.equity_curve[-1]) if len(self.equity_curve) else self.initial_capital
+
+    def calculate_total_return(self):
+        """ Rendement total, en pourcentage. """
+        return (self.final_capital - self.initial_capital) / self.initial_capital * 100
+
+    def calculate_drawdown(self):
+        """ Drawdown maximal (MDD), en pourcentage (valeur négative). """
+        if len(self.equity_curve) == 0:
+            return 0.0
+        peak = np.maximum.accumulate(self.equity_curve)
+        return float(((self.equity_curve - peak) / peak).min() * 100)
+
+    def calculate_sharpe_ratio(self, risk_free_rate=0.0):
+        """ Ratio de Sharpe annualisé des rendements par barre (0 si non défini). """
+        if len(self.equity_curve) < 3:
+            return 0.0
+        returns = np.diff(self.equity_curve) / self.equity_curve[:-1]
+        annual_std = returns.std(ddof=1) * np.sqrt(self.periods_per_year)
+        if annual_std == 0 or not np.isfinite(annual_std):
+            return 0.0
+        return float((returns.mean() * self.periods_per_year - risk_free_rate) / annual_std)
+
+    def calculate_win_rate(self):
+        """ Part des trades gagnants, en pourcentage. """
+        if len(self.pnl) == 0:
+            return 0.0
+        return float((self.pnl > 0).mean() * 100)
+
+    def summary(self):
+        """ KPIs bruts (floats), pour les tris et la sérialisation. """
+        return {
+            'initial_capital': self.initial_capital,
+            'final_capital': self.final_capital,
+            'min_equity': float(self.equity_curve.min()) if len(self.equity_curve) else self.initial_capital,
+            'total_return': self.calculate_total_return(),
+            'max_drawdown': self.calculate_drawdown(),
+            'sharpe_ratio': self.calculate_sharpe_ratio(),
+            'total_trades': int(len(self.pnl)),
+            'win_rate': self.calculate_win_rate(),
+        }
+
+    def calculate_key_stats(self):
+        """ KPIs formatés pour l'affichage des scripts. """
+        stats = self.summary()
+        return {
+            "Capital Initial": f"{stats['initial_capital']:,.2f} $",
+            "Capital Final": f"{stats['final_capital']:,.2f} $",
+            "Rendement Total": f"{stats['total_return']:.2f} %",
+            "Maximum Drawdown (MDD)": f"{stats['max_drawdown']:.2f} %",
+            "Ratio de Sharpe": f"{stats['sharpe_ratio']:.2f}",
+            "Nombre de Trades": stats['total_trades'],
+            "Taux de Réussite (Win Rate)": f"{stats['win_rate']:.2f} %"
+        }
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BacktestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('strategy', models.CharField(max_length=50)),
+                ('symbols', models.JSONField(default=list)),
+                ('timeframe', models.CharField(blank=True, default='', max_length=10)),
+                ('config', models.JSONField(default=dict, help_text='Signal source parameters and risk rules')),
+                ('initial_capital', models.FloatField(default=10000.0)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('metrics', models.JSONField(blank=True, default=dict, help_text='Metrics.summary() of the run')),
+                ('total_trades', models.IntegerField(default=0)),
+                ('artifact', models.CharField(blank=True, default='', help_text='NPZ file (trades, equity curve) relative to BACKTEST_RESULTS_DIR', max_length=255)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='backtest_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
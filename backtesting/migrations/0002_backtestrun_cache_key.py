@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backtesting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backtestrun',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
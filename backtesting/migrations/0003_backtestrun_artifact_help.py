@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backtesting', '0002_backtestrun_cache_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backtestrun',
+            name='artifact',
+            field=models.CharField(blank=True, default='', help_text='NPZ file (metrics, trades, equity curve) in BACKTEST_RESULTS_DIR', max_length=255),
+        ),
+    ]
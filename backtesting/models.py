@@ -0,0 +1,41 @@
+from django.db import models
+from django.contrib.auth.models import User
+from django.utils.translation import gettext_lazy as _
+
+
+class BacktestRun(models.Model):
+    """
+    One backtest, kept apart from the live Trade table. The row holds the
+    configuration and the KPIs; the trades and the equity curve are written
+    to one NPZ artifact in the result cache (see backtesting.storage).
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        COMPLETED = 'COMPLETED', _('Completed')
+        FAILED = 'FAILED', _('Failed')
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='backtest_runs', null=True, blank=True)
+    strategy = models.CharField(max_length=50)
+    symbols = models.JSONField(default=list)
+    timeframe = models.CharField(max_length=10, blank=True, default='')
+    config = models.JSONField(default=dict, help_text="Signal source parameters and risk rules")
+    initial_capital = models.FloatField(default=10000.0)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    metrics = models.JSONField(default=dict, blank=True, help_text="Metrics.summary() of the run")
+    total_trades = models.IntegerField(default=0)
+    artifact = models.CharField(max_length=255, blank=True, default='',
+                                help_text="NPZ file (metrics, trades, equity curve) in BACKTEST_RESULTS_DIR")
+    error = models.TextField(blank=True, default='')
+    # Config + symboles + versions des données (backtesting.runner.cache_key), nom de l'artefact
+    cache_key = models.CharField(max_length=64, blank=True, default='', db_index=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.strategy} {','.join(self.symbols)} ({self.status})"
@@ -0,0 +1,134 @@
+"""
+Monte Carlo robustness of backtest results.
+
+Two sources of randomness are resampled:
+    - the trade sequence: per-trade returns of a backtest are bootstrapped
+      (drawn with replacement) or shuffled, thousands of equity paths at a
+      time as (n_paths, n_trades) NumPy matrices;
+    - the simulated AI confidence draws (ConfidenceFilter): the whole
+      backtest is re-run with one seed per path, on the sweep process pool.
+
+Both report the distribution of total return and max drawdown (percentiles)
+and the probability of ruin (equity falling to `ruin_level` of the initial
+capital or below).
+"""
+import logging
+import os
+from dataclasses import dataclass
+
+from core.lazy import lazy_import
+from backtesting.engine import PNL
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+@dataclass
+class MonteCarloResult:
+    total_return: object  # (n_paths,) %, like Metrics
+    max_drawdown: object  # (n_paths,) %, <= 0
+    ruined: object  # (n_paths,) bool
+
+    @property
+    def n_paths(self):
+        return len(self.total_return)
+
+    @property
+    def ruin_probability(self):
+        return float(np.mean(self.ruined)) if self.n_paths else 0.0
+
+    @staticmethod
+    def _distribution(values, percentiles):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return {}
+        stats = {'mean': float(values.mean()), 'std': float(values.std())}
+        stats.update({f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))})
+        return stats
+
+    def summary(self, percentiles=PERCENTILES):
+        return {
+            'n_paths': self.n_paths,
+            'total_return': self._distribution(self.total_return, percentiles),
+            'max_drawdown': self._distribution(self.max_drawdown, percentiles),
+            'ruin_probability': self.ruin_probability,
+        }
+
+
+def trade_returns(result):
+    """Return of each closed trade of a BacktestResult, relative to the capital when it was opened."""
+    pnl = result.closed_trades[:, PNL]
+    capital_before = result.initial_capital + np.concatenate(([0.0], np.cumsum(pnl)[:-1]))
+    return pnl / capital_before
+
+
+def _path_chunk(returns, n_paths, method, seed, ruin_level):
+    """(total_return %, max_drawdown %, ruined) of `n_paths` resampled trade sequences."""
+    rng = np.random.default_rng(seed)
+    k = len(returns)
+    if method == "shuffle":
+        draws = returns[rng.permuted(np.tile(np.arange(k), (n_paths, 1)), axis=1)]
+    else:
+        draws = returns[rng.integers(0, k, size=(n_paths, k))]
+
+    # Équité relative (capital initial = 1), colonne 0 = avant le premier trade
+    equity = np.ones((n_paths, k + 1))
+    np.cumprod(1 + draws, axis=1, out=equity[:, 1:])
+    peak = np.maximum.accumulate(equity, axis=1)
+    drawdown = ((equity - peak) / peak).min(axis=1) * 100
+    return (equity[:, -1] - 1) * 100, drawdown, equity.min(axis=1) <= ruin_level
+
+
+def resample_trades(returns, n_paths=10000, method="bootstrap", ruin_level=0.5, seed=None, workers=1,
+                    chunk_size=2000):
+    """
+    Monte Carlo over the trade sequence. method="bootstrap" draws trades
+    with replacement; "shuffle" permutes them (same final return for every
+    path, only the drawdowns change). Paths are generated `chunk_size` at a
+    time, in a spawn process pool when workers > 1.
+    """
+    returns = np.asarray(returns, dtype=float)
+    if not len(returns):
+        empty = np.empty(0)
+        return MonteCarloResult(empty, empty, empty.astype(bool))
+
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    # Graines indépendantes par chunk : résultat identique quel que soit le nombre de workers
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(sizes) == 1:
+        chunks = [_path_chunk(returns, n, method, s, ruin_level) for n, s in zip(sizes, seeds)]
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes)),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            chunks = list(pool.map(_path_chunk, [returns] * len(sizes), sizes, [method] * len(sizes),
+                                   seeds, [ruin_level] * len(sizes)))
+
+    return MonteCarloResult(*(np.concatenate(parts) for parts in zip(*chunks)))
+
+
+def resample_confidence(data, params, n_paths=1000, ruin_level=0.5, seed=0, workers=None,
+                        initial_capital=10000.0):
+    """
+    Monte Carlo over the simulated AI confidence draws: the 'ma_confidence'
+    strategy (FilteredMACrossover + RiskRules `params`) is backtested once per
+    seed on the sweep process pool, with the bars in shared memory.
+    Ruin is read on the bar-level equity curve of each run.
+    """
+    from backtesting.sweep import sweep
+
+    combos = [{**params, 'seed': seed + i} for i in range(n_paths)]
+    table = sweep('ma_confidence', {'_': data}, combos, workers=workers, initial_capital=initial_capital)
+    return MonteCarloResult(
+        table['total_return'].to_numpy(dtype=float),
+        table['max_drawdown'].to_numpy(dtype=float),
+        table['min_equity'].to_numpy(dtype=float) <= initial_capital * ruin_level,
+    )
@@ -0,0 +1,269 @@
+"""
+Multi-asset backtest against one shared capital, like the auto-trading of
+run_system_update: the bars of every asset are aligned on one time index
+(T x N matrices, NaN where an asset has no bar) and all positions are
+simulated together, one vectorized step over the N assets per timestamp.
+
+Per step:
+    - SL/TP (then exit signals) close positions, as in backtesting.engine;
+    - circuit breakers (PortfolioLimits, from a user's RiskConfig) block new
+      entries once the day's loss or the drawdown from the equity peak
+      reaches its limit;
+    - entry signals open positions at the close, most confident first,
+      risk-sized on the shared capital and capped by the capital not
+      already committed to open positions (no leverage);
+    - the equity is marked to market with the last known close of each asset.
+
+Steps without open positions jump straight to the next entry signal.
+"""
+import logging
+from dataclasses import dataclass
+
+from core.lazy import lazy_import
+from backtesting.engine import (
+    TRADE_FIELDS, ENTRY, EXIT, SIDE, ENTRY_PRICE, EXIT_PRICE, QUANTITY, PNL, REASON,
+    EXIT_OPEN, EXIT_SL, EXIT_TP, EXIT_SIGNAL, EXIT_REASONS,
+)
+from backtesting.metrics import Metrics, PERIODS_PER_YEAR
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Colonnes des trades du portefeuille : celles du moteur + l'indice de l'actif
+PORTFOLIO_TRADE_FIELDS = TRADE_FIELDS + ('asset',)
+ASSET = len(TRADE_FIELDS)
+
+@dataclass(frozen=True)
+class PortfolioLimits:
+    """
+    Fractions, not percents. daily_max_loss is a fraction of the equity at
+    the start of the (UTC) day when daily_max_loss_is_percent, an amount
+    otherwise. None disables a limit.
+    """
+    risk_per_trade: float = 0.02
+    stop_loss: float = 0.05
+    take_profit: float = 0.10
+    daily_max_loss: float = None
+    daily_max_loss_is_percent: bool = True
+    drawdown_threshold: float = None
+    max_positions: int = None
+
+    @classmethod
+    def from_risk_config(cls, config, max_positions=None):
+        """Limits of a core.models.RiskConfig (percent fields converted to fractions)."""
+        daily = float(config.daily_max_loss_amount)
+        return cls(
+            risk_per_trade=float(config.risk_per_trade_percent) / 100,
+            stop_loss=float(config.default_stop_loss_percent) / 100,
+            take_profit=float(config.default_take_profit_percent) / 100,
+            daily_max_loss=daily / 100 if config.daily_max_loss_is_percent else daily,
+            daily_max_loss_is_percent=config.daily_max_loss_is_percent,
+            drawdown_threshold=float(config.drawdown_threshold_percent) / 100,
+            max_positions=max_positions,
+        )
+
+    def daily_loss_limit(self, day_start_equity):
+        if self.daily_max_loss is None:
+            return np.inf
+        if self.daily_max_loss_is_percent:
+            return day_start_equity * self.daily_max_loss
+        return self.daily_max_loss
+
+
+@dataclass
+class PortfolioResult:
+    equity_curve: object  # (T + 1,) float64, equity_curve[0] = initial capital
+    trades: object  # (n_trades, len(PORTFOLIO_TRADE_FIELDS)) float64
+    index: object  # DatetimeIndex of the aligned bars
+    symbols: list
+    initial_capital: float
+    blocked_entries: int = 0  # entry signals refused by the circuit breakers
+
+    @property
+    def closed_trades(self):
+        return self.trades[self.trades[:, REASON] != EXIT_OPEN]
+
+    def metrics(self, periods_per_year=PERIODS_PER_YEAR):
+        return Metrics(self.equity_curve, self.initial_capital, self.closed_trades[:, PNL], periods_per_year)
+
+    def by_asset(self):
+        """{symbol: {'trades', 'pnl', 'win_rate'}} over the closed trades."""
+        closed = self.closed_trades
+        stats = {}
+        for j, symbol in enumerate(self.symbols):
+            pnl = closed[closed[:, ASSET] == j, PNL]
+            stats[symbol] = {
+                'trades': int(len(pnl)),
+                'pnl': float(pnl.sum()),
+                'win_rate': float((pnl > 0).mean() * 100) if len(pnl) else 0.0,
+            }
+        return stats
+
+    def trades_frame(self):
+        t = self.trades
+        closed = t[:, REASON] != EXIT_OPEN
+        return pd.DataFrame({
+            'Symbol': [self.symbols[int(j)] for j in t[:, ASSET]],
+            'Entry Date': self.index[t[:, ENTRY].astype(np.int64)],
+            'Exit Date': pd.Series(self.index[np.maximum(t[:, EXIT].astype(np.int64), 0)]).where(closed).to_numpy(),
+            'Side': np.where(t[:, SIDE] > 0, "BUY", "SELL"),
+            'Entry Price': t[:, ENTRY_PRICE],
+            'Exit Price': np.where(closed, t[:, EXIT_PRICE], np.nan),
+            'Quantity': t[:, QUANTITY],
+            'PnL': t[:, PNL],
+            'Reason': [EXIT_REASONS[int(r)] for r in t[:, REASON]],
+        })
+
+
+def align(frames, columns=('close', 'high', 'low')):
+    """
+    frames {symbol: DataFrame} -> (index, {column: (T, N) matrix}, {symbol: row of each bar}).
+    T is the union of all timestamps; cells without a bar are NaN.
+    """
+    # datetime64 UTC (l'unité de l'index dépend de la source des barres)
+    stamps = np.unique(np.concatenate([frame.index.values for frame in frames.values()]))
+    index = pd.DatetimeIndex(stamps).tz_localize('UTC')
+    matrices = {column: np.full((len(stamps), len(frames)), np.nan) for column in columns}
+    rows = {}
+    for j, (symbol, frame) in enumerate(frames.items()):
+        rows[symbol] = np.searchsorted(stamps, frame.index.values)
+        for column in columns:
+            matrices[column][rows[symbol], j] = frame[column].to_numpy(dtype=float)
+    return index, matrices, rows
+
+
+def _forward_fill(matrix):
+    """Last non-NaN value of each column at every row (NaN before the first one)."""
+    valid = ~np.isnan(matrix)
+    last = np.where(valid, np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    return matrix[last, np.arange(matrix.shape[1])]
+
+
+def run_portfolio(frames, sources, limits=PortfolioLimits(), initial_capital=10000.0):
+    """
+    frames: {symbol: OHLCV DataFrame}; sources: {symbol: SignalSource} (or one
+    SignalSource for every asset). Returns a PortfolioResult.
+    """
+    symbols = list(frames)
+    index, m, rows = align(frames)
+    close, high, low = m['close'], m['high'], m['low']
+    T, N = close.shape
+
+    entries = np.zeros((T, N), dtype=np.int8)
+    exits = np.zeros((T, N), dtype=np.bool_)
+    confidence = np.full((T, N), np.nan)
+    for j, symbol in enumerate(symbols):
+        source = sources[symbol] if isinstance(sources, dict) else sources
+        signals = source.signals(frames[symbol])
+        r = rows[symbol][signals.start:]
+        entries[r, j] = signals.entries[signals.start:]
+        if signals.exits is not None:
+            exits[r, j] = signals.exits[signals.start:]
+        if signals.confidence is not None:
+            confidence[r, j] = signals.confidence[signals.start:]
+
+    mark = _forward_fill(close)
+    days = index.values.astype('datetime64[D]').astype(np.int64)
+    entry_steps = np.flatnonzero((entries != 0).any(axis=1))
+
+    side = np.zeros(N, dtype=np.int8)
+    entry = np.zeros(N)
+    qty = np.zeros(N)
+    sl = np.full(N, np.nan)
+    tp = np.full(N, np.nan)
+    trade_row = np.full(N, -1)
+    trades = []
+
+    capital = float(initial_capital)
+    equity = np.empty(T + 1)
+    equity[0] = capital
+    peak = capital
+    current_day, day_start_equity = None, capital
+    blocked = 0
+
+    t = 0
+    while t < T:
+        if not side.any():
+            # À plat : l'équité ne bouge pas jusqu'au prochain signal d'entrée
+            k = np.searchsorted(entry_steps, t)
+            nxt = int(entry_steps[k]) if k < len(entry_steps) else T
+            equity[t + 1:nxt + 1] = capital
+            t = nxt
+            if t >= T:
+                break
+        if days[t] != current_day:
+            current_day, day_start_equity = days[t], equity[t]
+
+        # 1. Sorties (SL, puis TP, puis signal), actifs sans barre ignorés (comparaisons NaN)
+        if side.any():
+            is_long = side > 0
+            sl_hit = np.where(is_long, low[t] <= sl, high[t] >= sl)
+            tp_hit = ~sl_hit & np.where(is_long, high[t] >= tp, low[t] <= tp)
+            signal_hit = ~sl_hit & ~tp_hit & exits[t] & (side != 0)
+            closing = np.flatnonzero(sl_hit | tp_hit | signal_hit)
+            if closing.size:
+                price = np.where(sl_hit, sl, np.where(tp_hit, tp, close[t]))[closing]
+                reason = np.where(sl_hit, EXIT_SL, np.where(tp_hit, EXIT_TP, EXIT_SIGNAL))[closing]
+                pnl = (price - entry[closing]) * qty[closing] * side[closing]
+                for j, p, r, gain in zip(closing, price, reason, pnl):
+                    row = trades[trade_row[j]]
+                    row[EXIT], row[EXIT_PRICE], row[PNL], row[REASON] = t, p, gain, r
+                capital += float(pnl.sum())
+                side[closing] = 0
+                qty[closing] = 0.0
+                sl[closing] = tp[closing] = np.nan
+
+        # 2. Disjoncteurs sur l'équité courante
+        is_open = side != 0
+        equity_now = capital + float(((mark[t] - entry) * qty * side)[is_open].sum())
+        halted = (
+            day_start_equity - equity_now >= limits.daily_loss_limit(day_start_equity)
+            or (limits.drawdown_threshold is not None and peak > 0
+                and (peak - equity_now) / peak >= limits.drawdown_threshold)
+        )
+
+        # 3. Entrées : les plus confiantes d'abord, dans la limite du capital non engagé
+        candidates = np.flatnonzero(~is_open & (entries[t] != 0))
+        if candidates.size and halted:
+            blocked += int(candidates.size)
+        elif candidates.size:
+            order = np.argsort(-np.nan_to_num(confidence[t, candidates], nan=-np.inf), kind='stable')
+            candidates = candidates[order]
+            if limits.max_positions is not None:
+                candidates = candidates[:max(limits.max_positions - int(is_open.sum()), 0)]
+
+            price = close[t, candidates]
+            s = entries[t, candidates]
+            stop_loss = limits.stop_loss or 0.0
+            sl_price = np.where(s > 0, price * (1 - stop_loss), price * (1 + stop_loss))
+            quantity = capital / price
+            if limits.risk_per_trade and limits.stop_loss:
+                quantity = np.minimum(capital * limits.risk_per_trade / np.abs(price - sl_price), capital / price)
+            available = capital - float((entry * qty)[is_open].sum())
+            # Tolérance relative : capital / prix * prix peut dépasser le capital d'un ulp
+            take = (quantity > 0) & (np.cumsum(quantity * price) <= available * (1 + 1e-9))
+            for j, p, q, sd, slp in zip(candidates[take], price[take], quantity[take], s[take], sl_price[take]):
+                side[j], entry[j], qty[j] = sd, p, q
+                sl[j] = slp if limits.stop_loss else np.nan
+                if limits.take_profit:
+                    tp[j] = p * (1 + limits.take_profit) if sd > 0 else p * (1 - limits.take_profit)
+                trade_row[j] = len(trades)
+                trades.append([t, -1, sd, p, np.nan, q, 0.0, EXIT_OPEN, j])
+
+        # 4. Équité marquée au dernier cours connu
+        is_open = side != 0
+        equity[t + 1] = capital + float(((mark[t] - entry) * qty * side)[is_open].sum())
+        peak = max(peak, equity[t + 1])
+        t += 1
+
+    return PortfolioResult(
+        equity_curve=equity,
+        trades=np.array(trades, dtype=float).reshape(-1, len(PORTFOLIO_TRADE_FIELDS)),
+        index=index,
+        symbols=symbols,
+        initial_capital=float(initial_capital),
+        blocked_entries=blocked,
+    )
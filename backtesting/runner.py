@@ -0,0 +1,214 @@
+"""
+Backtests requested through the API (/api/v1/backtests/): one strategy with
+its parameters on one symbol (engine) or several symbols (shared-capital
+portfolio), run by the `backtesting` Celery queue.
+
+Progress is reported through `on_progress(done, total, equity)` while the
+signals are computed: both the walk-forward predictions and the engine are
+causal, so the AI predictions are computed in slices of bars and the bars
+done so far are simulated again after each slice, giving the exact equity
+curve up to that point.
+"""
+import dataclasses
+import inspect
+import logging
+
+from core.lazy import lazy_import
+from backtesting.cache import content_key
+from backtesting.engine import RiskRules, run_backtest
+from backtesting.sources import AIPredictions, FilteredMACrossover, MACrossover, PrecomputedPredictions
+from backtesting.sweep import RULE_PARAMS
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = {
+    'ma_crossover': MACrossover,
+    'ma_confidence': FilteredMACrossover,
+    'ai_predictions': AIPredictions,
+}
+PROGRESS_STEPS = 20  # tranches de barres (donc messages de progression) par actif, au plus
+MIN_SLICE_BARS = 2048
+EQUITY_POINTS = 500  # points de la courbe d'équité envoyés au client
+
+
+def split_params(strategy, params):
+    """(RiskRules kwargs, signal source kwargs) of an API params dict. Raises ValueError on unknown params."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}")
+    rules = {k: v for k, v in params.items() if k in RULE_PARAMS}
+    source_params = {k: v for k, v in params.items() if k not in RULE_PARAMS}
+    try:
+        # Validation des noms de paramètres (symbol/asset_type fournis par le runner)
+        if strategy == 'ai_predictions':
+            STRATEGIES[strategy](None, **source_params)
+        else:
+            STRATEGIES[strategy](**source_params)
+        RiskRules(**rules)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for {strategy}: {e}")
+    return rules, source_params
+
+
+def strategy_config(strategy, params):
+    """
+    Complete configuration of a request: `params` over the defaults of the
+    signal source and of RiskRules, so {} and the explicit defaults share a cache key.
+    """
+    signature = inspect.signature(STRATEGIES[strategy].__init__)
+    defaults = {
+        name: p.default for name, p in signature.parameters.items()
+        if p.default is not inspect.Parameter.empty and name not in ('symbol', 'asset_type')
+    }
+    defaults.update({field.name: field.default for field in dataclasses.fields(RiskRules)})
+    return {**defaults, **params}
+
+
+def cache_key(strategy, params, symbols, timeframe=None, initial_capital=10000.0):
+    """
+    Content key of a request (backtesting.cache): strategy config, symbol
+    set and BarStore data version (content digest) of every symbol's bars,
+    plus the resolved model of every symbol for the AI predictions.
+    Raises ValueError for an unknown symbol or one without bars.
+    """
+    from core.models import Asset
+    from core.services.bar_store import BarStore
+
+    assets = {asset.symbol: asset for asset in Asset.objects.filter(symbol__in=symbols)}
+    missing = sorted(set(symbols) - set(assets))
+    if missing:
+        raise ValueError(f"Asset {', '.join(missing)} non trouvé.")
+    store = BarStore.default()
+    versions = {}
+    for symbol in symbols:
+        meta = store.meta(assets[symbol])
+        if meta is None:
+            # Segment construit maintenant (et non par le job) : la version hachée est celle que le job lira
+            store.load(assets[symbol])
+            meta = store.meta(assets[symbol])
+        if not meta or not meta['rows']:
+            raise ValueError(f"No historical data for {symbol}")
+        versions[symbol] = store.data_version(assets[symbol])
+    payload = {
+        'strategy': strategy,
+        'config': strategy_config(strategy, params),
+        'symbols': sorted(symbols),
+        'timeframe': timeframe or None,
+        'initial_capital': initial_capital,
+        'data': versions,
+    }
+    if strategy == 'ai_predictions':
+        payload['models'] = {symbol: model_version(assets[symbol]) for symbol in symbols}
+    return content_key(payload)
+
+
+def model_version(asset):
+    """
+    Model file and version the ModelRegistry resolves for an asset (None
+    when the fallbacks predict): a retrained or re-exported model changes it.
+    """
+    from ai_prediction.registry import ModelRegistry
+
+    spec = ModelRegistry.resolve(asset.symbol, asset.asset_type)
+    if spec is None:
+        return None
+    return {'path': spec.model_path, 'signature': list(spec.signature)}
+
+
+def equity_points(equity_curve, index=None, start=0, points=EQUITY_POINTS):
+    """
+    Evenly downsampled equity curve (last point kept) as [[timestamp ms | bar, equity], ...].
+    equity_curve[k] is the equity after bar start + k - 1 (k = 0: initial capital).
+    """
+    equity_curve = np.asarray(equity_curve, dtype=float)
+    if not len(equity_curve):
+        return []
+    take = np.unique(np.linspace(0, len(equity_curve) - 1, min(points, len(equity_curve))).round().astype(np.int64))
+    bars = np.maximum(start + take - 1, 0)
+    if index is not None and len(index):
+        stamps = index.values[np.minimum(bars, len(index) - 1)].astype('datetime64[ms]').astype(np.int64)
+    else:
+        stamps = bars
+    return [[int(t), round(float(v), 2)] for t, v in zip(stamps, equity_curve[take])]
+
+
+def _slices(n, window_size):
+    size = max(-(-n // PROGRESS_STEPS), MIN_SLICE_BARS, window_size)
+    return [(s, min(s + size, n)) for s in range(0, n, size)]
+
+
+def _ai_columns(source, frame, on_slice=None):
+    """
+    Walk-forward predictions of an AIPredictions source, slice by slice.
+    Returns the column mapping used by PrecomputedPredictions.
+    """
+    from ai_prediction.services import PredictionService
+
+    data = PredictionService.add_indicators(frame.copy())
+    n, w = len(data), source.window_size
+    columns = {column: data[column].to_numpy(dtype=float) for column in ('close', 'high', 'low')}
+    columns['prediction'] = np.full(n, np.nan)
+    columns['confidence'] = np.full(n, np.nan)
+    for s, e in _slices(n, w):
+        # Chaque ligne i ne dépend que des w barres précédentes : tranche = [s - w, e)
+        lo = max(s - w, 0)
+        preds, confidences = source.predictions(data.iloc[lo:e])
+        columns['prediction'][s:e] = preds[s - lo:]
+        columns['confidence'][s:e] = confidences[s - lo:]
+        if on_slice:
+            on_slice(e, {column: values[:e] for column, values in columns.items()})
+    return columns
+
+
+def execute(strategy, params, symbols, timeframe=None, initial_capital=10000.0, on_progress=None):
+    """
+    Runs a backtest request. One symbol: BacktestResult of the engine;
+    several: PortfolioResult (shared capital). on_progress(done, total, equity)
+    receives bar counts and, for one symbol, the partial equity_points().
+    """
+    from backtesting.data import load_frame
+
+    rules, source_params = split_params(strategy, params)
+    frames, sources = {}, {}
+    for symbol in symbols:
+        asset, frames[symbol] = load_frame(symbol, timeframe)
+        if strategy == 'ai_predictions':
+            sources[symbol] = AIPredictions(symbol, asset.asset_type, **source_params)
+        else:
+            sources[symbol] = STRATEGIES[strategy](**source_params)
+
+    total = sum(len(frame) for frame in frames.values())
+    done = 0
+    data = dict(frames)
+    if strategy == 'ai_predictions':
+        single = len(symbols) == 1
+        for symbol, source in sources.items():
+            precomputed = PrecomputedPredictions(source.window_size, source.min_confidence, source.threshold)
+
+            def on_slice(end, columns, offset=done):
+                equity = None
+                if single:
+                    partial = run_backtest(columns, precomputed, RiskRules(**rules), initial_capital)
+                    equity = equity_points(partial.equity_curve, frames[symbol].index, partial.start)
+                if on_progress:
+                    on_progress(offset + end, total, equity)
+
+            data[symbol] = _ai_columns(source, frames[symbol], on_slice)
+            sources[symbol] = precomputed
+            done += len(frames[symbol])
+
+    if len(symbols) == 1:
+        symbol = symbols[0]
+        result = run_backtest(data[symbol], sources[symbol], RiskRules(**rules), initial_capital)
+        # Colonnes précalculées : l'index (dates des trades) vient du DataFrame
+        result.index = frames[symbol].index
+        return result
+
+    from backtesting.portfolio import PortfolioLimits, run_portfolio
+
+    if strategy == 'ai_predictions':
+        frames = {symbol: pd.DataFrame(data[symbol], index=frames[symbol].index) for symbol in symbols}
+    limits = PortfolioLimits(**{k: rules.get(k) for k in RULE_PARAMS})
+    return run_portfolio(frames, sources, limits, initial_capital)
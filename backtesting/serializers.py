@@ -0,0 +1,63 @@
+from rest_framework import serializers
+from core.services.resampler import TIMEFRAMES
+from .models import BacktestRun
+from .runner import STRATEGIES, split_params, strategy_config
+
+class BacktestRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BacktestRun
+        fields = ['id', 'strategy', 'symbols', 'timeframe', 'config', 'initial_capital', 'status', 'metrics',
+                  'total_trades', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
+
+# Type et bornes de chaque paramètre des sources de signaux et de RiskRules
+PARAM_FIELDS = {
+    'fast_period': lambda: serializers.IntegerField(min_value=1, max_value=10000),
+    'slow_period': lambda: serializers.IntegerField(min_value=1, max_value=10000),
+    'exit_on_cross': lambda: serializers.BooleanField(),
+    'target': lambda: serializers.FloatField(min_value=0.5, max_value=0.99),
+    'hit_rate': lambda: serializers.FloatField(min_value=0.0, max_value=1.0),
+    'seed': lambda: serializers.IntegerField(min_value=0, allow_null=True),
+    'window_size': lambda: serializers.IntegerField(min_value=2, max_value=5000),
+    'min_confidence': lambda: serializers.FloatField(min_value=0.0, max_value=1.0),
+    'threshold': lambda: serializers.FloatField(min_value=0.0, max_value=1.0),
+    'walk_forward': lambda: serializers.BooleanField(),
+    'stop_loss': lambda: serializers.FloatField(min_value=0.0001, max_value=0.99, allow_null=True),
+    'take_profit': lambda: serializers.FloatField(min_value=0.0001, max_value=10.0, allow_null=True),
+    'risk_per_trade': lambda: serializers.FloatField(min_value=0.0001, max_value=1.0, allow_null=True),
+}
+
+class BacktestRequestSerializer(serializers.Serializer):
+    strategy = serializers.ChoiceField(choices=list(STRATEGIES))
+    symbols = serializers.ListField(child=serializers.CharField(max_length=20), min_length=1, max_length=50)
+    params = serializers.DictField(required=False, default=dict)
+    timeframe = serializers.ChoiceField(choices=list(TIMEFRAMES), required=False, allow_null=True, default=None)
+    initial_capital = serializers.FloatField(min_value=1.0, default=10000.0)
+    strategy_profile = serializers.IntegerField(required=False, help_text="StrategyProfile whose min_confidence is used")
+    refresh = serializers.BooleanField(default=False, help_text="Ignore a cached result")
+
+    def validate(self, attrs):
+        attrs['symbols'] = list(dict.fromkeys(attrs['symbols']))
+        params = dict(attrs['params'])
+        if attrs['strategy'] == 'ma_confidence':
+            # Tirages de confiance reproductibles : sinon le résultat ne peut pas être mis en cache
+            params.setdefault('seed', 0)
+        try:
+            split_params(attrs['strategy'], params)
+        except ValueError as e:
+            raise serializers.ValidationError({'params': str(e)})
+
+        errors = {}
+        for name, value in params.items():
+            try:
+                params[name] = PARAM_FIELDS[name]().run_validation(value)
+            except serializers.ValidationError as e:
+                errors[name] = e.detail
+        if errors:
+            raise serializers.ValidationError({'params': errors})
+
+        config = strategy_config(attrs['strategy'], params)
+        if 'fast_period' in config and config['fast_period'] >= config['slow_period']:
+            raise serializers.ValidationError({'params': {'fast_period': "Must be lower than slow_period."}})
+        attrs['params'] = params
+        return attrs
@@ -0,0 +1,178 @@
+"""
+Signal sources: turn an OHLCV frame into per-bar entry/exit arrays for the
+backtest engine. A strategy is a SignalSource; the engine never looks at
+indicators or predictions, only at the arrays below.
+"""
+import logging
+from dataclasses import dataclass
+
+from core.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Signals:
+    entries: object  # int8 par barre : 1 = BUY, -1 = SELL, 0 = rien (ouvre à la clôture si pas de position)
+    exits: object = None  # bool par barre : ferme la position ouverte à la clôture
+    start: int = 0  # première barre simulée (chauffe des indicateurs)
+    confidence: object = None  # score par barre, reporté dans le journal des trades
+
+
+class SignalSource:
+    """
+    Base class: signals(data) returns the Signals of an OHLCV DataFrame (or of
+    any mapping of column name -> array, e.g. the shared arrays of a sweep).
+    """
+    name = "base"
+
+    def signals(self, data):
+        raise NotImplementedError
+
+    def params(self):
+        """JSON-serialisable parameters identifying the strategy."""
+        return {'name': self.name, **{k: v for k, v in vars(self).items() if not k.startswith('_')}}
+
+
+def sma(values, period):
+    """Simple moving average, NaN for the first period - 1 values (like talib.SMA)."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = np.lib.stride_tricks.sliding_window_view(values, period).mean(axis=1)
+    return out
+
+
+class MACrossover(SignalSource):
+    """
+    Long while the fast SMA is above the slow one. With `exit_on_cross`, the
+    position is closed when the fast SMA goes back below (otherwise only SL/TP exit).
+    """
+    name = "ma_crossover"
+
+    def __init__(self, fast_period=50, slow_period=200, exit_on_cross=True):
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.exit_on_cross = exit_on_cross
+
+    def signals(self, data):
+        close = np.asarray(data['close'], dtype=float)
+        fast, slow = sma(close, self.fast_period), sma(close, self.slow_period)
+        return Signals(
+            entries=(fast > slow).astype(np.int8),
+            exits=(fast < slow) if self.exit_on_cross else None,
+            start=min(max(self.fast_period, self.slow_period) - 1, len(close)),
+        )
+
+
+class ConfidenceFilter(SignalSource):
+    """
+    Keeps the entries of `source` whose simulated AI confidence reaches `target`.
+    Scores are drawn for every bar at once: with probability `hit_rate` in
+    [target, 0.99), otherwise in [0.50, target). `seed` makes a run reproducible.
+    """
+    name = "confidence_filter"
+
+    def __init__(self, source, target=0.97, hit_rate=0.20, seed=None):
+        self.source = source
+        self.target = target
+        self.hit_rate = hit_rate
+        self.seed = seed
+
+    def params(self):
+        return {'name': self.name, 'source': self.source.params(),
+                'target': self.target, 'hit_rate': self.hit_rate, 'seed': self.seed}
+
+    def scores(self, n):
+        rng = np.random.default_rng(self.seed)
+        high = rng.uniform(size=n) < self.hit_rate
+        return np.where(high, rng.uniform(self.target, 0.99, n), rng.uniform(0.50, self.target, n))
+
+    def signals(self, data):
+        base = self.source.signals(data)
+        confidence = self.scores(len(base.entries))
+        entries = np.where(confidence >= self.target, base.entries, 0).astype(np.int8)
+        return Signals(entries, base.exits, base.start, confidence)
+
+
+class FilteredMACrossover(ConfidenceFilter):
+    """MACrossover (SL/TP exits only) behind a simulated ConfidenceFilter, as in risk_managed_backtester.py."""
+    name = "ma_confidence"
+
+    def __init__(self, fast_period=50, slow_period=200, target=0.97, hit_rate=0.20, seed=None):
+        super().__init__(MACrossover(fast_period, slow_period, exit_on_cross=False), target, hit_rate, seed)
+
+
+def prediction_entries(close, preds, confidences, min_confidence, threshold):
+    """BUY (1) / SELL (-1) where the prediction moves more than `threshold` from the close with enough confidence."""
+    close = np.asarray(close, dtype=float)
+    confident = np.asarray(confidences) >= min_confidence
+    entries = np.zeros(len(close), dtype=np.int8)
+    entries[confident & (preds > close * (1 + threshold))] = 1
+    entries[confident & (preds < close * (1 - threshold))] = -1
+    return entries
+
+
+class AIPredictions(SignalSource):
+    """
+    BUY/SELL when the predicted next close moves more than `threshold` from
+    the current close with at least `min_confidence`, from the model resolved
+    for `symbol` (or the PredictionService fallbacks).
+    `walk_forward` predicts every bar in one batched pass; otherwise
+    predict_next runs on each candle (reference mode, slow).
+    """
+    name = "ai_predictions"
+
+    def __init__(self, symbol, asset_type=None, window_size=30, min_confidence=0.60, threshold=0.002,
+                 walk_forward=True):
+        self.symbol = symbol
+        self.asset_type = asset_type
+        self.window_size = window_size
+        self.min_confidence = min_confidence
+        self.threshold = threshold
+        self.walk_forward = walk_forward
+
+    def predictions(self, data):
+        from ai_prediction.services import PredictionService
+
+        if self.walk_forward:
+            return PredictionService.predict_walk_forward(data, self.symbol, self.asset_type, self.window_size)
+
+        preds = np.full(len(data), np.nan)
+        confidences = np.full(len(data), np.nan)
+        for i in range(self.window_size, len(data)):
+            preds[i], confidences[i] = PredictionService.predict_next(data.iloc[i - self.window_size:i], self.symbol)
+        return preds, confidences
+
+    def signals(self, data):
+        from ai_prediction.services import PredictionService
+
+        # Indicateurs calculés une seule fois sur toute la série
+        data = PredictionService.add_indicators(data.copy())
+        close = data['close'].to_numpy(dtype=float)
+        preds, confidences = self.predictions(data)
+        entries = prediction_entries(close, preds, confidences, self.min_confidence, self.threshold)
+        return Signals(entries, None, min(self.window_size, len(close)), confidences)
+
+
+class PrecomputedPredictions(SignalSource):
+    """
+    AIPredictions rules on 'prediction' / 'confidence' columns computed once
+    beforehand (AIPredictions.predictions), so sweeps over the thresholds and
+    risk rules do not run the model again.
+    """
+    name = "ai_predictions"
+
+    def __init__(self, window_size=30, min_confidence=0.60, threshold=0.002):
+        self.window_size = window_size
+        self.min_confidence = min_confidence
+        self.threshold = threshold
+
+    def signals(self, data):
+        close = np.asarray(data['close'], dtype=float)
+        confidences = np.asarray(data['confidence'], dtype=float)
+        entries = prediction_entries(close, np.asarray(data['prediction'], dtype=float), confidences,
+                                     self.min_confidence, self.threshold)
+        return Signals(entries, None, min(self.window_size, len(close)), confidences)
@@ -0,0 +1,178 @@
+"""
+Persistence of backtest results, outside of the live Trade table.
+
+A run is one BacktestRun row (configuration + Metrics.summary()) and one
+compressed NPZ artifact holding the result arrays as the engine produced
+them (trades matrix, equity curve, bar timestamps): saving a run costs a
+single INSERT whatever its number of trades.
+
+Runs queued through the API name their artifact after their cache_key, in
+the ResultCache (backtesting.cache): identical runs share one file, and
+evicted artifacts are recomputed on the next identical request. Other saved
+runs (scripts, commands) get their own file under SAVED_RUNS_DIR, which is
+never evicted.
+"""
+import json
+import logging
+import uuid
+from pathlib import Path
+
+from core.lazy import lazy_import
+from backtesting.cache import ResultCache
+from backtesting.engine import BacktestResult
+from backtesting.portfolio import PortfolioResult
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+SAVED_RUNS_DIR = 'runs'  # sous-dossier de BACKTEST_RESULTS_DIR, hors éviction LRU
+
+
+def result_arrays(result, metrics=None):
+    """NPZ arrays of a BacktestResult / PortfolioResult (+ its metrics summary as JSON)."""
+    arrays = {
+        'equity_curve': np.asarray(result.equity_curve, dtype=float),
+        'trades': np.asarray(result.trades, dtype=float),
+        'metrics': np.array(json.dumps(metrics if metrics is not None else result.metrics().summary())),
+    }
+    if result.index is not None:
+        arrays['index'] = np.asarray(result.index.tz_localize(None) if result.index.tz else result.index,
+                                     dtype='datetime64[ns]')
+        arrays['utc'] = np.bool_(result.index.tz is not None)
+    if isinstance(result, PortfolioResult):
+        arrays['symbols'] = np.array(result.symbols, dtype=str)
+        arrays['blocked_entries'] = np.int64(result.blocked_entries)
+    else:
+        arrays['start'] = np.int64(result.start)
+        if result.confidence is not None:
+            arrays['confidence'] = np.asarray(result.confidence, dtype=float)
+    return arrays
+
+
+def saved_runs():
+    """Non-evicting store of the artifacts of runs without a cache key."""
+    return ResultCache(ResultCache.default().root / SAVED_RUNS_DIR, bounded=False)
+
+
+def _store(artifact):
+    """(store, key) of an artifact name as saved on BacktestRun.artifact."""
+    path = Path(artifact)
+    if path.parent.name == SAVED_RUNS_DIR:
+        return saved_runs(), path.stem
+    return ResultCache.default(), path.stem
+
+
+def write_artifact(result, key=None, metrics=None):
+    """
+    Writes a result and returns its artifact name: <key>.npz in the
+    (evicting) ResultCache for a cache key, runs/<uuid>.npz otherwise.
+    """
+    arrays = result_arrays(result, metrics)
+    if key:
+        ResultCache.default().put(key, arrays)
+        return f"{key}.npz"
+    name = uuid.uuid4().hex
+    saved_runs().put(name, arrays)
+    return f"{SAVED_RUNS_DIR}/{name}.npz"
+
+
+def save_run(result, strategy, symbols, config=None, user=None, timeframe=None, run=None):
+    """
+    Persists a finished backtest: artifact first, then one BacktestRun row
+    (or one UPDATE of `run`, a run queued through the API). Returns the BacktestRun.
+    """
+    from django.utils import timezone
+    from backtesting.models import BacktestRun
+
+    summary = result.metrics().summary()
+    artifact = write_artifact(result, run.cache_key if run is not None else None, summary)
+    fields = dict(
+        strategy=strategy,
+        symbols=list(symbols),
+        timeframe=timeframe or '',
+        config=config or {},
+        initial_capital=result.initial_capital,
+        status=BacktestRun.Status.COMPLETED,
+        metrics=summary,
+        total_trades=summary['total_trades'],
+        artifact=artifact,
+        error='',
+        finished_at=timezone.now(),
+    )
+    if run is None:
+        run = BacktestRun.objects.create(user=user, **fields)
+    else:
+        for name, value in fields.items():
+            setattr(run, name, value)
+        run.save(update_fields=list(fields))
+    logger.info(f"Backtest run {run.id} saved ({len(result.trades)} trades, {artifact})")
+    return run
+
+
+def cached_run(key, user=None):
+    """Newest completed run of `key` (of `user` when given) whose artifact is still cached, or None."""
+    from backtesting.models import BacktestRun
+
+    runs = BacktestRun.objects.filter(cache_key=key, status=BacktestRun.Status.COMPLETED)
+    if user is not None:
+        runs = runs.filter(user=user)
+    for run in runs:
+        if run.artifact:
+            store, name = _store(run.artifact)
+            if store.contains(name):
+                return run
+    return None
+
+
+def share_run(run, user):
+    """
+    Completed copy of another user's run for `user`: one INSERT pointing at the
+    same artifact (delete_run keeps an artifact while a run still uses it).
+    """
+    from backtesting.models import BacktestRun
+
+    fields = ('strategy', 'symbols', 'timeframe', 'config', 'initial_capital', 'status', 'metrics',
+              'total_trades', 'artifact', 'cache_key', 'finished_at')
+    return BacktestRun.objects.create(user=user, **{name: getattr(run, name) for name in fields})
+
+
+def load_result(run):
+    """
+    Rebuilds the BacktestResult / PortfolioResult of a saved run from its artifact.
+    Raises ValueError when the artifact is missing or was evicted from the cache.
+    """
+    arrays = None
+    if run.artifact:
+        store, name = _store(run.artifact)
+        arrays = store.get(name)
+    if arrays is None:
+        raise ValueError(f"Results of backtest run {run.id} are no longer available")
+
+    index = None
+    if 'index' in arrays:
+        index = pd.DatetimeIndex(arrays['index'])
+        if bool(arrays['utc']):
+            index = index.tz_localize('UTC')
+    if 'symbols' in arrays:
+        return PortfolioResult(
+            equity_curve=arrays['equity_curve'],
+            trades=arrays['trades'],
+            index=index,
+            symbols=arrays['symbols'].tolist(),
+            initial_capital=run.initial_capital,
+            blocked_entries=int(arrays['blocked_entries']),
+        )
+    return BacktestResult(arrays['equity_curve'], arrays['trades'], index, int(arrays['start']),
+                          run.initial_capital, arrays.get('confidence'))
+
+
+def delete_run(run):
+    """Deletes a run, and its artifact unless another run shares it."""
+    from backtesting.models import BacktestRun
+
+    if run.artifact and not BacktestRun.objects.filter(artifact=run.artifact).exclude(id=run.id).exists():
+        store, name = _store(run.artifact)
+        store.delete(name)
+    run.delete()
@@ -0,0 +1,185 @@
+"""
+Parameter sweeps: every combination of a parameter grid backtested on every
+symbol, in a process pool, ranked by Sharpe ratio then max drawdown.
+
+The bar arrays of each symbol (plus precomputed columns such as the AI
+predictions) are copied once into shared memory; pool workers attach to
+them at start-up, so tasks only carry parameter dicts.
+"""
+import itertools
+import logging
+import os
+from multiprocessing import shared_memory
+
+from core.lazy import lazy_import
+from backtesting.engine import RiskRules, run_backtest
+from backtesting.sources import FilteredMACrossover, MACrossover, PrecomputedPredictions
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Paramètres appliqués au moteur (RiskRules), les autres vont à la source de signaux
+RULE_PARAMS = ('stop_loss', 'take_profit', 'risk_per_trade')
+STRATEGIES = {
+    'ma_crossover': MACrossover,
+    'ai_predictions': PrecomputedPredictions,
+    'ma_confidence': FilteredMACrossover,
+}
+STRATEGY_COLUMNS = {
+    'ma_crossover': ('close', 'high', 'low'),
+    'ai_predictions': ('close', 'high', 'low', 'prediction', 'confidence'),
+    'ma_confidence': ('close', 'high', 'low'),
+}
+RANK_BY = ('sharpe_ratio', 'max_drawdown')
+
+
+def param_grid(grid, where=None):
+    """All combinations of {param: [values]} as dicts, filtered by `where(params)`."""
+    keys = list(grid)
+    combos = (dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys)))
+    return [params for params in combos if where is None or where(params)]
+
+
+def evaluate(strategy, params, data, initial_capital=10000.0):
+    """Metrics summary of one parameter combination on one symbol's columns."""
+    rules = RiskRules(**{k: params[k] for k in RULE_PARAMS if k in params})
+    source = STRATEGIES[strategy](**{k: v for k, v in params.items() if k not in RULE_PARAMS})
+    return run_backtest(data, source, rules, initial_capital).metrics().summary()
+
+
+class SharedBars:
+    """
+    float64 columns of several symbols in shared memory, one (n_columns, n_bars)
+    block per symbol. The parent creates it from arrays; workers attach() to
+    the picklable `descriptor`.
+    """
+
+    def __init__(self, frames, columns):
+        self.blocks = {}
+        self.descriptor = {}
+        for symbol, data in frames.items():
+            n = len(data['close'])
+            shm = shared_memory.SharedMemory(create=True, size=max(len(columns) * n * 8, 1))
+            matrix = np.ndarray((len(columns), n), dtype=np.float64, buffer=shm.buf)
+            for row, column in enumerate(columns):
+                matrix[row] = np.asarray(data[column], dtype=np.float64)
+            self.blocks[symbol] = shm
+            self.descriptor[symbol] = (shm.name, tuple(columns), n)
+
+    @staticmethod
+    def attach(descriptor):
+        """Returns ({symbol: SharedMemory}, {symbol: {column: read-only array view}})."""
+        handles, arrays = {}, {}
+        for symbol, (name, columns, n) in descriptor.items():
+            shm = shared_memory.SharedMemory(name=name)
+            matrix = np.ndarray((len(columns), n), dtype=np.float64, buffer=shm.buf)
+            matrix.flags.writeable = False
+            handles[symbol] = shm
+            arrays[symbol] = {column: matrix[row] for row, column in enumerate(columns)}
+        return handles, arrays
+
+    def release(self):
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks = {}
+
+
+_worker_state = {}
+
+
+def _init_worker(descriptor):
+    # Les handles restent référencés tant que le worker vit (sinon le mapping est fermé)
+    _worker_state['handles'], _worker_state['arrays'] = SharedBars.attach(descriptor)
+
+
+def _run_chunk(strategy, symbol, combos, initial_capital):
+    data = _worker_state['arrays'][symbol]
+    rows = []
+    for params in combos:
+        try:
+            stats = evaluate(strategy, params, data, initial_capital)
+        except Exception as e:
+            stats = {'error': str(e)}
+        rows.append({'symbol': symbol, **params, **stats})
+    return rows
+
+
+def rank(rows, by=RANK_BY):
+    """Results table, best first: highest Sharpe, then shallowest drawdown."""
+    table = pd.DataFrame(rows)
+    by = [column for column in by if column in table.columns]
+    if not by:
+        return table
+    return table.sort_values(by, ascending=False, na_position='last', kind='mergesort').reset_index(drop=True)
+
+
+def sweep(strategy, frames, combos, workers=None, chunk_size=64, initial_capital=10000.0, on_progress=None):
+    """
+    Backtests every params dict of `combos` on every symbol of `frames`
+    ({symbol: DataFrame or column mapping with STRATEGY_COLUMNS[strategy]}).
+    workers=1 runs in-process. Returns the ranked results table.
+    """
+    total = len(frames) * len(combos)
+    rows = []
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for symbol, data in frames.items():
+            data = {column: np.asarray(data[column], dtype=float) for column in STRATEGY_COLUMNS[strategy]}
+            for start in range(0, len(combos), chunk_size):
+                _worker_state['arrays'] = {symbol: data}
+                rows.extend(_run_chunk(strategy, symbol, combos[start:start + chunk_size], initial_capital))
+                if on_progress:
+                    on_progress(len(rows), total)
+        _worker_state.clear()
+        return rank(rows)
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    shared = SharedBars(frames, STRATEGY_COLUMNS[strategy])
+    try:
+        # spawn : les workers n'héritent ni de Django ni des connexions DB du parent
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(shared.descriptor,)) as pool:
+            futures = [
+                pool.submit(_run_chunk, strategy, symbol, combos[start:start + chunk_size], initial_capital)
+                for symbol in frames
+                for start in range(0, len(combos), chunk_size)
+            ]
+            for future in as_completed(futures):
+                rows.extend(future.result())
+                if on_progress:
+                    on_progress(len(rows), total)
+    finally:
+        shared.release()
+    return rank(rows)
+
+
+def load_sweep_data(strategy, symbols, window_size=30, timeframe=None):
+    """
+    {symbol: {column: array}} for a sweep. For 'ai_predictions' the model runs
+    here, once per symbol (AIPredictions walk-forward).
+    Symbols without data are skipped.
+    """
+    from backtesting.data import load_frame
+    from backtesting.sources import AIPredictions
+
+    frames = {}
+    for symbol in symbols:
+        try:
+            asset, frame = load_frame(symbol, timeframe)
+        except ValueError as e:
+            logger.warning(f"Sweep: {e}")
+            continue
+        data = {column: frame[column].to_numpy(dtype=float) for column in ('close', 'high', 'low')}
+        if strategy == 'ai_predictions':
+            from ai_prediction.services import PredictionService
+
+            source = AIPredictions(symbol, asset.asset_type, window_size=window_size)
+            data['prediction'], data['confidence'] = source.predictions(PredictionService.add_indicators(frame.copy()))
+        frames[symbol] = data
+    return frames
@@ -0,0 +1,80 @@
+import logging
+import time
+from celery import shared_task
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from core.consumers import user_group_name
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 0.5  # secondes minimum entre deux messages de progression
+
+
+def publish(run, message):
+    """Sends a backtest event to the dashboard WebSocket group of the run's owner."""
+    if run.user_id is None:
+        return
+    channel_layer = get_channel_layer()
+    try:
+        async_to_sync(channel_layer.group_send)(
+            user_group_name(run.user_id),
+            {
+                "type": "dashboard_message",
+                "message": message
+            }
+        )
+    except Exception as e:
+        logger.warning(f"Could not send backtest update: {e}")
+
+
+@shared_task(queue='backtesting')
+def run_backtest_job(run_id):
+    """
+    Runs a queued BacktestRun (POST /api/v1/backtests/) and streams its
+    progress and partial equity curve to its owner's dashboard group.
+    """
+    from django.utils import timezone
+    from backtesting.models import BacktestRun
+    from backtesting.runner import execute, equity_points
+    from backtesting.storage import save_run
+
+    run = BacktestRun.objects.filter(id=run_id).first()
+    if run is None or run.status not in (BacktestRun.Status.PENDING, BacktestRun.Status.FAILED):
+        return
+    run.status = BacktestRun.Status.RUNNING
+    run.save(update_fields=['status'])
+    publish(run, {"type": "BACKTEST_STARTED", "run_id": run.id, "strategy": run.strategy, "symbols": run.symbols})
+
+    last_sent = [0.0]
+
+    def on_progress(done, total, equity):
+        now = time.monotonic()
+        if done < total and now - last_sent[0] < PROGRESS_INTERVAL:
+            return
+        last_sent[0] = now
+        message = {"type": "BACKTEST_PROGRESS", "run_id": run.id, "progress": round(done / total, 4)}
+        if equity is not None:
+            message["equity"] = equity
+        publish(run, message)
+
+    started = time.monotonic()
+    try:
+        result = execute(run.strategy, run.config, run.symbols, run.timeframe or None, run.initial_capital,
+                         on_progress=on_progress)
+        save_run(result, run.strategy, run.symbols, run.config, timeframe=run.timeframe, run=run)
+    except Exception as e:
+        logger.error(f"Backtest run {run.id} failed: {e}")
+        run.status = BacktestRun.Status.FAILED
+        run.error = str(e)
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'error', 'finished_at'])
+        publish(run, {"type": "BACKTEST_FAILED", "run_id": run.id, "error": run.error})
+        return
+
+    logger.info(f"Backtest run {run.id} done in {time.monotonic() - started:.1f}s")
+    publish(run, {
+        "type": "BACKTEST_COMPLETED",
+        "run_id": run.id,
+        "metrics": run.metrics,
+        "equity": equity_points(result.equity_curve, result.index, getattr(result, 'start', 0)),
+    })
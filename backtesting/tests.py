@@ -0,0 +1,458 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock, skipUnless
+
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.models import Asset, PriceHistory, Trade
+from core.services.bar_store import BarStore
+from core.services.price_writer import PriceHistoryWriter
+
+from backtesting.cache import ResultCache, canonical_json, content_key
+from backtesting.engine import (ENTRY, ENTRY_PRICE, EXIT, PNL, QUANTITY, TRADE_FIELDS, HAS_NUMBA, RiskRules,
+                               run_backtest, simulate)
+from backtesting.models import BacktestRun
+from backtesting.montecarlo import resample_trades, trade_returns
+from backtesting.portfolio import PortfolioLimits, run_portfolio
+from backtesting.runner import cache_key
+from backtesting.sources import MACrossover
+from backtesting.storage import delete_run, load_result, save_run
+from backtesting.sweep import evaluate, param_grid, sweep
+
+
+def make_frame(n=800, seed=0, start='2024-01-01'):
+    """Random-walk hourly OHLCV bars."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = rng.uniform(0, 0.01, n)
+    return pd.DataFrame({
+        'open': close,
+        'high': close * (1 + spread),
+        'low': close * (1 - spread),
+        'close': close,
+        'volume': np.full(n, 10.0),
+    }, index=pd.date_range(start, periods=n, freq='h', tz='UTC'))
+
+
+class StoreTestMixin:
+    """Process-wide BarStore and ResultCache rooted in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        for cls, root in ((BarStore, self.tmp / 'bars'), (ResultCache, self.tmp / 'backtests')):
+            patcher = mock.patch.object(cls, '_default', cls(root))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+RULES = [
+    RiskRules(),
+    RiskRules(stop_loss=0.01),
+    RiskRules(take_profit=0.02),
+    RiskRules(stop_loss=0.01, take_profit=0.02, risk_per_trade=0.005),
+]
+
+
+class EngineParityTests(SimpleTestCase):
+    """The event-driven numpy engine reproduces the reference bar loop."""
+
+    def assertSameRun(self, a, b):
+        np.testing.assert_allclose(a[0], b[0], rtol=1e-12)
+        np.testing.assert_allclose(a[1], b[1], rtol=1e-12, equal_nan=True)
+
+    def test_random_signals(self):
+        frame = make_frame()
+        rng = np.random.default_rng(1)
+        for rules in RULES:
+            for trial in range(5):
+                entries = rng.choice([-1, 0, 0, 0, 0, 1], size=len(frame)).astype(np.int8)
+                exits = rng.random(len(frame)) < 0.05
+                args = (frame['close'], frame['high'], frame['low'], entries, exits, 10, rules, 10000.0)
+                with self.subTest(rules=rules, trial=trial):
+                    self.assertSameRun(simulate(*args, engine='numpy'), simulate(*args, engine='python'))
+
+    def test_ma_crossover(self):
+        frame = make_frame(seed=2)
+        for rules in RULES:
+            with self.subTest(rules=rules):
+                numpy = run_backtest(frame, MACrossover(10, 30), rules, engine='numpy')
+                python = run_backtest(frame, MACrossover(10, 30), rules, engine='python')
+                self.assertSameRun((numpy.equity_curve, numpy.trades), (python.equity_curve, python.trades))
+                self.assertGreater(len(numpy.trades), 0)
+
+    def test_no_entries(self):
+        frame = make_frame(n=50)
+        equity, trades = simulate(frame['close'], frame['high'], frame['low'], np.zeros(50), engine='numpy')
+        self.assertEqual(len(trades), 0)
+        np.testing.assert_array_equal(equity, 10000.0)
+
+    @skipUnless(HAS_NUMBA, "numba is not installed")
+    def test_numba(self):
+        frame = make_frame(seed=3)
+        for rules in RULES:
+            with self.subTest(rules=rules):
+                numba = run_backtest(frame, MACrossover(10, 30), rules, engine='numba')
+                python = run_backtest(frame, MACrossover(10, 30), rules, engine='python')
+                self.assertSameRun((numba.equity_curve, numba.trades), (python.equity_curve, python.trades))
+
+
+class SweepTests(SimpleTestCase):
+    def test_sweep_ranks_every_combination(self):
+        frame = make_frame(seed=4)
+        combos = param_grid({'fast_period': [5, 10, 20], 'slow_period': [20, 40]},
+                            where=lambda p: p['fast_period'] < p['slow_period'])
+        table = sweep('ma_crossover', {'A': frame}, combos, workers=1)
+        self.assertEqual(len(table), len(combos))
+        sharpe = table['sharpe_ratio'].to_numpy()
+        self.assertTrue(np.all(sharpe[:-1] >= sharpe[1:]))
+
+        best = table.iloc[0]
+        params = {'fast_period': int(best['fast_period']), 'slow_period': int(best['slow_period'])}
+        self.assertAlmostEqual(evaluate('ma_crossover', params, frame)['total_return'], best['total_return'])
+
+    def test_worker_pool_matches_a_single_process(self):
+        frames = {'A': make_frame(seed=4), 'B': make_frame(seed=5)}
+        combos = param_grid({'fast_period': [5, 10], 'slow_period': [20, 40]})
+        serial = sweep('ma_crossover', frames, combos, workers=1)
+        pooled = sweep('ma_crossover', frames, combos, workers=2, chunk_size=1)
+        key = ['symbol', 'fast_period', 'slow_period']
+        pd.testing.assert_frame_equal(pooled.sort_values(key).reset_index(drop=True),
+                                      serial.sort_values(key).reset_index(drop=True))
+
+
+class PortfolioTests(SimpleTestCase):
+    def setUp(self):
+        self.frames = {symbol: make_frame(seed=seed) for seed, symbol in enumerate(('A', 'B', 'C'), start=10)}
+
+    @staticmethod
+    def open_counts(result):
+        """Positions open after the entries of every step."""
+        trades = result.trades
+        exits = np.where(trades[:, EXIT] < 0, len(result.index), trades[:, EXIT])
+        steps = np.arange(len(result.index))[:, None]
+        return ((trades[:, ENTRY] <= steps) & (steps < exits)).sum(axis=1)
+
+    @staticmethod
+    def capital_at_entries(result):
+        """Realised capital (trades closed up to the step included) at the entry of each trade."""
+        trades = result.trades
+        closed_by = (trades[:, EXIT][None, :] >= 0) & (trades[:, EXIT][None, :] <= trades[:, ENTRY][:, None])
+        return result.initial_capital + closed_by.astype(float) @ trades[:, PNL]
+
+    def test_single_asset_matches_run_backtest(self):
+        frame = self.frames['A']
+        for sl, tp, risk in ((0.05, 0.10, 0.02), (0.01, 0.02, 0.005), (None, None, None)):
+            with self.subTest(stop_loss=sl, take_profit=tp, risk_per_trade=risk):
+                single = run_backtest(frame, MACrossover(10, 30), RiskRules(sl, tp, risk), engine='python')
+                portfolio = run_portfolio({'A': frame}, MACrossover(10, 30),
+                                          PortfolioLimits(risk_per_trade=risk, stop_loss=sl, take_profit=tp))
+                self.assertGreater(len(single.trades), 0)
+                np.testing.assert_allclose(portfolio.trades[:, :len(TRADE_FIELDS)], single.trades,
+                                           rtol=1e-12, equal_nan=True)
+                np.testing.assert_allclose(portfolio.equity_curve[single.start:], single.equity_curve, rtol=1e-12)
+
+    def test_max_positions(self):
+        # 0,5 % de risque pour un stop à 5 % : 10 % du capital par position, le capital ne limite pas
+        limits = PortfolioLimits(risk_per_trade=0.005)
+        self.assertEqual(self.open_counts(run_portfolio(self.frames, MACrossover(10, 30), limits)).max(), 3)
+        limited = run_portfolio(self.frames, MACrossover(10, 30), PortfolioLimits(risk_per_trade=0.005, max_positions=2))
+        self.assertEqual(self.open_counts(limited).max(), 2)
+
+    def test_positions_share_the_capital(self):
+        # 2 % de risque pour un stop à 3 % : 2/3 du capital par position, une seule tient à la fois
+        result = run_portfolio(self.frames, MACrossover(10, 30), PortfolioLimits(risk_per_trade=0.02, stop_loss=0.03))
+        self.assertEqual(self.open_counts(result).max(), 1)
+
+        result = run_portfolio(self.frames, MACrossover(10, 30))
+        trades = result.trades
+        capital = self.capital_at_entries(result)
+        for k, t in enumerate(trades[:, ENTRY]):
+            open_at_entry = (trades[:, ENTRY] <= t) & ((trades[:, EXIT] > t) | (trades[:, EXIT] < 0))
+            committed = (trades[open_at_entry, ENTRY_PRICE] * trades[open_at_entry, QUANTITY]).sum()
+            self.assertLessEqual(committed, capital[k] * (1 + 1e-9))
+
+    def test_risk_per_trade_is_sized_on_the_shared_capital(self):
+        result = run_portfolio(self.frames, MACrossover(10, 30), PortfolioLimits(risk_per_trade=0.02, stop_loss=0.05))
+        trades = result.trades
+        self.assertGreater(self.open_counts(result).max(), 1)
+        # Perte au stop = 2 % du capital réalisé au moment de l'entrée, quel que soit l'actif
+        np.testing.assert_allclose(trades[:, QUANTITY] * trades[:, ENTRY_PRICE] * 0.05,
+                                   0.02 * self.capital_at_entries(result), rtol=1e-9)
+
+
+class MonteCarloTests(SimpleTestCase):
+    def test_resample_trades(self):
+        result = run_backtest(make_frame(seed=5), MACrossover(5, 20))
+        returns = trade_returns(result)
+        self.assertGreater(len(returns), 2)
+
+        shuffled = resample_trades(returns, n_paths=200, method='shuffle', seed=0)
+        np.testing.assert_allclose(shuffled.total_return, shuffled.total_return[0])
+        self.assertTrue(np.all(shuffled.max_drawdown <= 0))
+
+        a = resample_trades(returns, n_paths=500, seed=7, chunk_size=100)
+        b = resample_trades(returns, n_paths=500, seed=7, chunk_size=100)
+        np.testing.assert_array_equal(a.total_return, b.total_return)
+        self.assertEqual(a.summary()['n_paths'], 500)
+
+    def test_resample_no_trades(self):
+        self.assertEqual(resample_trades([], n_paths=10).n_paths, 0)
+
+
+class ResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+
+    def put(self, cache, key, age, size=10):
+        cache.put(key, {'values': np.zeros(size)})
+        stamp = 1_700_000_000 - age
+        os.utime(cache.path(key), (stamp, stamp))
+
+    def test_content_key_is_canonical(self):
+        self.assertEqual(content_key({'a': 50, 'b': [1, 2]}), content_key({'b': [1.0, 2.0], 'a': 50.0}))
+        self.assertNotEqual(content_key({'a': 50}), content_key({'a': 51}))
+        self.assertEqual(canonical_json({'b': True, 'a': None}), '{"a":null,"b":true}')
+
+    def test_roundtrip(self):
+        cache = ResultCache(self.root)
+        cache.put('k', {'values': np.arange(3.0)})
+        np.testing.assert_array_equal(cache.get('k')['values'], [0.0, 1.0, 2.0])
+        self.assertIsNone(cache.get('missing'))
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = ResultCache(self.root, max_entries=2)
+        self.put(cache, 'old', age=30)
+        self.put(cache, 'mid', age=20)
+        cache.get('old')  # une lecture rafraîchit l'entrée
+        self.put(cache, 'new', age=0)
+        self.assertTrue(cache.contains('old'))
+        self.assertFalse(cache.contains('mid'))
+
+    def test_new_entry_is_kept_over_the_byte_budget(self):
+        cache = ResultCache(self.root, max_bytes=1)
+        cache.put('a', {'values': np.zeros(1000)})
+        cache.put('b', {'values': np.zeros(1000)})
+        self.assertFalse(cache.contains('a'))
+        self.assertTrue(cache.contains('b'))
+
+    def test_unbounded_store_never_evicts(self):
+        with override_settings(BACKTEST_CACHE_MAX_ENTRIES=1):
+            cache = ResultCache(self.root, bounded=False)
+            for key in 'abc':
+                cache.put(key, {'values': np.zeros(1)})
+        self.assertEqual(sum(cache.contains(key) for key in 'abc'), 3)
+
+
+class StorageTests(StoreTestMixin, TestCase):
+    def assertSameResult(self, loaded, result):
+        np.testing.assert_array_equal(loaded.equity_curve, result.equity_curve)
+        np.testing.assert_array_equal(loaded.trades, result.trades)
+        pd.testing.assert_index_equal(loaded.index, result.index.as_unit('ns'))  # l'artefact stocke des ns
+        self.assertEqual(loaded.initial_capital, result.initial_capital)
+        self.assertEqual(loaded.metrics().summary(), result.metrics().summary())
+
+    def test_single_asset_roundtrip(self):
+        result = run_backtest(make_frame(), MACrossover(10, 30), RiskRules(0.01, 0.02, 0.005))
+        trades = Trade.objects.count()
+        run = save_run(result, 'ma_crossover', ['A'], config={'fast_period': 10, 'slow_period': 30})
+        self.assertEqual(Trade.objects.count(), trades)  # aucun trade backtesté dans la table live
+
+        run = BacktestRun.objects.get(id=run.id)
+        self.assertEqual(run.total_trades, len(result.closed_trades))
+        self.assertEqual(run.metrics, result.metrics().summary())
+        loaded = load_result(run)
+        self.assertSameResult(loaded, result)
+        self.assertEqual(loaded.start, result.start)
+        pd.testing.assert_frame_equal(loaded.trades_frame(), result.trades_frame(), check_dtype=False)
+
+        delete_run(run)
+        with self.assertRaises(ValueError):
+            load_result(run)
+
+    def test_portfolio_roundtrip(self):
+        frames = {'A': make_frame(seed=1), 'B': make_frame(seed=2)}
+        result = run_portfolio(frames, MACrossover(10, 30))
+        trades = Trade.objects.count()
+        run = save_run(result, 'ma_crossover', list(frames))
+        self.assertEqual(Trade.objects.count(), trades)
+
+        loaded = load_result(BacktestRun.objects.get(id=run.id))
+        self.assertSameResult(loaded, result)
+        self.assertEqual(loaded.symbols, ['A', 'B'])
+        self.assertEqual(loaded.by_asset(), result.by_asset())
+
+
+class CacheKeyTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.asset = Asset.objects.create(symbol='TEST', name='Test', asset_type=Asset.AssetType.STOCK)
+        PriceHistoryWriter.write(self.asset, make_frame(n=200))
+
+    def key(self, strategy='ma_crossover', params=None, **kwargs):
+        return cache_key(strategy, params or {}, ['TEST'], **kwargs)
+
+    def test_defaults_and_number_spelling_share_a_key(self):
+        self.assertEqual(self.key(), self.key(params={'fast_period': 50, 'slow_period': 200.0}))
+        self.assertEqual(self.key(), self.key(params={'stop_loss': None, 'exit_on_cross': True}))
+
+    def test_config_changes_the_key(self):
+        self.assertNotEqual(self.key(), self.key(params={'fast_period': 10}))
+        self.assertNotEqual(self.key(), self.key(timeframe='1d'))
+        self.assertNotEqual(self.key(), self.key(initial_capital=5000.0))
+
+    def test_new_bars_change_the_key(self):
+        before = self.key()
+        PriceHistoryWriter.write(self.asset, make_frame(n=10, start='2025-01-01'))
+        self.assertNotEqual(before, self.key())
+
+    def test_edited_bars_change_the_key(self):
+        before = self.key()
+        bar = PriceHistory.objects.filter(asset=self.asset).order_by('datetime').first()
+        bar.close += 1
+        bar.save()  # post_save -> BarStore.drop()
+        self.assertNotEqual(before, self.key())
+
+    def test_wiped_segment_keeps_content_keys(self):
+        before = self.key()
+        shutil.rmtree(BarStore.default().segment_dir(self.asset))
+        self.assertEqual(before, self.key())
+
+        # Un segment effacé puis reconstruit sur d'autres barres ne retrouve pas l'ancienne clé
+        PriceHistory.objects.filter(asset=self.asset, datetime__lt='2024-01-02').update(close=1)
+        shutil.rmtree(BarStore.default().segment_dir(self.asset))
+        self.assertNotEqual(before, self.key())
+
+    def test_cold_segment_is_built_before_keying(self):
+        BarStore.default().drop(self.asset)
+        before = self.key()
+        BarStore.default().load(self.asset)  # ce que fait le job
+        self.assertEqual(before, self.key())
+
+    def test_model_change_changes_ai_keys_only(self):
+        models = self.tmp / 'models'
+        models.mkdir()
+        with override_settings(AI_MODEL_DIR=models):
+            ai, ma = self.key('ai_predictions'), self.key()
+            (models / 'TEST_lstm.npz').write_bytes(b'model')
+            self.assertNotEqual(ai, self.key('ai_predictions'))
+            self.assertEqual(ma, self.key())
+
+    def test_unknown_symbol(self):
+        with self.assertRaises(ValueError):
+            cache_key('ma_crossover', {}, ['NOPE'])
+
+
+@mock.patch('backtesting.tasks.publish')
+class BacktestAPITests(StoreTestMixin, TestCase):
+    url = '/api/v1/backtests/'
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user('trader')
+        asset = Asset.objects.create(symbol='TEST', name='Test', asset_type=Asset.AssetType.STOCK)
+        PriceHistoryWriter.write(asset, make_frame(n=300))
+        self.client = APIClient()
+
+    def post(self, **data):
+        return self.client.post(self.url, {'strategy': 'ma_crossover', 'symbols': ['TEST'], **data}, format='json')
+
+    def assertInvalidParam(self, params, name):
+        response = self.post(params=params)
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn(name, response.data['params'])
+
+    def test_invalid_params(self, publish):
+        self.assertInvalidParam({'fast_period': 'abc'}, 'fast_period')
+        self.assertInvalidParam({'fast_period': 0}, 'fast_period')
+        self.assertInvalidParam({'stop_loss': -0.1}, 'stop_loss')
+        self.assertInvalidParam({'risk_per_trade': 2}, 'risk_per_trade')
+        self.assertInvalidParam({'fast_period': 60, 'slow_period': 50}, 'fast_period')
+        self.assertEqual(self.post(params={'bogus': 1}).status_code, 400)
+        self.assertFalse(BacktestRun.objects.exists())
+
+    def test_invalid_request(self, publish):
+        self.assertEqual(self.post(strategy='nope').status_code, 400)
+        self.assertEqual(self.post(symbols=[]).status_code, 400)
+        self.assertEqual(self.post(timeframe='7m').status_code, 400)
+        self.assertEqual(self.post(symbols=['NOPE']).status_code, 404)
+
+    def test_run_then_cached(self, publish):
+        with mock.patch('backtesting.views.run_backtest_job.delay') as delay:
+            response = self.post(params={'fast_period': 10, 'slow_period': 30})
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertFalse(response.data['cached'])
+        delay.assert_called_once_with(response.data['id'])
+
+        from backtesting.tasks import run_backtest_job
+        run_backtest_job(response.data['id'])
+        run = BacktestRun.objects.get(id=response.data['id'])
+        self.assertEqual(run.status, BacktestRun.Status.COMPLETED, run.error)
+        self.assertEqual(publish.call_args[0][1]['type'], 'BACKTEST_COMPLETED')
+
+        response = self.post(params={'slow_period': 30.0, 'fast_period': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['cached'])
+        self.assertEqual(response.data['id'], run.id)
+
+        equity = self.client.get(f"{self.url}{run.id}/equity/?points=50").data['equity']
+        self.assertLessEqual(len(equity), 50)
+        self.assertEqual(self.client.get(f"{self.url}{run.id}/trades/").status_code, 200)
+
+    def test_runs_are_scoped_to_their_user(self, publish):
+        with mock.patch('backtesting.views.run_backtest_job.delay'):
+            response = self.post()
+        from backtesting.tasks import run_backtest_job
+        run_backtest_job(response.data['id'])
+        run = BacktestRun.objects.get(id=response.data['id'])
+        self.assertEqual(run.user.username, 'trader')
+
+        self.client.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+        self.assertEqual(self.client.get(f"{self.url}{run.id}/").status_code, 404)
+        self.assertEqual(self.client.get(f"{self.url}{run.id}/trades/").status_code, 404)
+
+        # Même requête : le résultat en cache est partagé via une copie du run à son nom
+        response = self.post()
+        self.assertTrue(response.data['cached'])
+        shared = BacktestRun.objects.get(id=response.data['id'])
+        self.assertNotEqual(shared.id, run.id)
+        self.assertEqual((shared.user.username, shared.artifact), ('other', run.artifact))
+        self.assertEqual(self.client.get(f"{self.url}{shared.id}/equity/").status_code, 200)
+        self.assertEqual(self.post().data['id'], shared.id)
+
+
+class PublishTests(TestCase):
+    async def test_events_reach_only_the_owner(self):
+        from channels.testing import WebsocketCommunicator
+        from core.consumers import DashboardConsumer
+        from backtesting.tasks import publish
+
+        owner = await User.objects.acreate(username='owner')
+        other = await User.objects.acreate(username='other')
+        run = await BacktestRun.objects.acreate(user=owner, strategy='ma_crossover', symbols=['TEST'])
+
+        sockets = {}
+        for user in (owner, other):
+            sockets[user.username] = WebsocketCommunicator(DashboardConsumer.as_asgi(), '/ws/dashboard/')
+            sockets[user.username].scope['user'] = user
+            connected, _ = await sockets[user.username].connect()
+            self.assertTrue(connected)
+
+        await sync_to_async(publish)(run, {'type': 'BACKTEST_STARTED', 'run_id': run.id})
+        event = await sockets['owner'].receive_json_from()
+        self.assertEqual(event['data'], {'type': 'BACKTEST_STARTED', 'run_id': run.id})
+        self.assertTrue(await sockets['other'].receive_nothing())
+        for socket in sockets.values():
+            await socket.disconnect()
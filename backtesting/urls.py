@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+from .views import BacktestViewSet
+
+router = SimpleRouter()
+router.register(r'backtests', BacktestViewSet, basename='backtests')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
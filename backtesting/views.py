@@ -0,0 +1,119 @@
+import json
+from rest_framework import viewsets, mixins, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from core.models import StrategyProfile
+from .models import BacktestRun
+from .serializers import BacktestRunSerializer, BacktestRequestSerializer
+from .runner import cache_key, equity_points, EQUITY_POINTS
+from .storage import cached_run, load_result, share_run
+from .tasks import run_backtest_job
+
+class BacktestViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Backtests run in the background (Celery queue "backtesting").
+    Progress and the partial equity curve are pushed on ws/dashboard/ to the
+    owner of the run only (BACKTEST_STARTED / BACKTEST_PROGRESS / BACKTEST_COMPLETED / BACKTEST_FAILED).
+    """
+    serializer_class = BacktestRunSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def get_user(self, request):
+        if request.user.is_authenticated: return request.user
+        from django.contrib.auth.models import User
+        return User.objects.first()
+
+    def get_queryset(self):
+        return BacktestRun.objects.filter(user=self.get_user(self.request))
+
+    def create(self, request):
+        """
+        Queue a backtest, or return the cached run of an identical request on unchanged data.
+        POST /api/v1/backtests/ {"strategy": "ma_crossover", "symbols": ["AAPL"], "params": {"fast_period": 20}}
+        """
+        serializer = BacktestRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        data = serializer.validated_data
+        user = self.get_user(request)
+        params = data['params']
+
+        if data.get('strategy_profile') is not None:
+            profile = StrategyProfile.objects.filter(id=data['strategy_profile'], user=user).first()
+            if profile is None:
+                return Response({"error": f"Strategy profile {data['strategy_profile']} not found"}, status=404)
+            if data['strategy'] == 'ai_predictions':
+                params.setdefault('min_confidence', profile.min_confidence)
+
+        try:
+            key = cache_key(data['strategy'], params, data['symbols'], data['timeframe'], data['initial_capital'])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=404)
+
+        if not data['refresh']:
+            run = cached_run(key, user) or cached_run(key)
+            if run:
+                # Résultat d'un autre utilisateur : copie à son nom, même artefact
+                if run.user_id != user.id:
+                    run = share_run(run, user)
+                return Response({**BacktestRunSerializer(run).data, "cached": True})
+            run = BacktestRun.objects.filter(
+                user=user, cache_key=key, status__in=[BacktestRun.Status.PENDING, BacktestRun.Status.RUNNING]
+            ).first()
+            if run:
+                return Response({**BacktestRunSerializer(run).data, "cached": False}, status=202)
+
+        run = BacktestRun.objects.create(
+            user=user,
+            strategy=data['strategy'],
+            symbols=data['symbols'],
+            timeframe=data['timeframe'] or '',
+            config=params,
+            initial_capital=data['initial_capital'],
+            cache_key=key,
+        )
+        run_backtest_job.delay(run.id)
+        return Response({**BacktestRunSerializer(run).data, "cached": False}, status=202)
+
+    def _result(self, run):
+        if run.status != BacktestRun.Status.COMPLETED:
+            return None, Response({"error": f"Backtest run {run.id} is {run.status}"}, status=409)
+        try:
+            return load_result(run), None
+        except ValueError as e:
+            return None, Response({"error": str(e)}, status=404)
+
+    @action(detail=True, methods=['get'])
+    def equity(self, request, pk=None):
+        """
+        Downsampled equity curve: [[timestamp ms, equity], ...].
+        GET /api/v1/backtests/{id}/equity/?points=500
+        """
+        run = self.get_object()
+        result, error = self._result(run)
+        if error:
+            return error
+        try:
+            points = min(max(int(request.query_params.get('points', EQUITY_POINTS)), 2), 10000)
+        except ValueError:
+            return Response({"error": "points must be an integer"}, status=400)
+        return Response({
+            "run_id": run.id,
+            "equity": equity_points(result.equity_curve, result.index, getattr(result, 'start', 0), points),
+        })
+
+    @action(detail=True, methods=['get'])
+    def trades(self, request, pk=None):
+        """
+        Trade list of a completed run (paginated).
+        GET /api/v1/backtests/{id}/trades/
+        """
+        run = self.get_object()
+        result, error = self._result(run)
+        if error:
+            return error
+        records = json.loads(result.trades_frame().to_json(orient='records', date_format='iso'))
+        page = self.paginate_queryset(records)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(records)
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     # Local apps (to be created)
     'core',
     'ai_prediction',
+    'backtesting',
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -123,6 +124,54 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Bar Store (per-asset columnar OHLCV segments, see core/services/bar_store.py)
+BAR_STORE_DIR = Path(os.getenv('BAR_STORE_DIR', BASE_DIR / 'data' / 'bars'))
+
+# Market data ingestion (core/services/ingestion_service.py)
+# Provider request budgets in requests/minute (Polygon free tier: 5)
+MARKET_DATA_RATE_LIMITS = {
+    'polygon': int(os.getenv('POLYGON_RATE_LIMIT', '5')),
+}
+MARKET_DATA_MAX_CONNECTIONS = int(os.getenv('MARKET_DATA_MAX_CONNECTIONS', '20'))
+MARKET_DATA_HTTP_TIMEOUT = float(os.getenv('MARKET_DATA_HTTP_TIMEOUT', '30'))
+# Symbols per refresh_universe task dispatched by run_system_update
+INGESTION_BATCH_SIZE = int(os.getenv('INGESTION_BATCH_SIZE', '100'))
+
+# Trained models (train_lstm.py) and the per-worker registry that keeps them loaded
+AI_MODEL_DIR = Path(os.getenv('AI_MODEL_DIR', BASE_DIR / 'models'))
+AI_MODEL_CACHE_MAX_MODELS = int(os.getenv('AI_MODEL_CACHE_MAX_MODELS', '32'))
+AI_MODEL_CACHE_MAX_BYTES = int(os.getenv('AI_MODEL_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Backtest artifacts (metrics, trades, equity curve): API results are content-addressed
+# and the least recently used are evicted beyond these limits (backtesting/cache.py);
+# runs saved by scripts/commands go to the runs/ subdirectory and are never evicted
+BACKTEST_RESULTS_DIR = Path(os.getenv('BACKTEST_RESULTS_DIR', BASE_DIR / 'data' / 'backtests'))
+BACKTEST_CACHE_MAX_BYTES = int(os.getenv('BACKTEST_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+BACKTEST_CACHE_MAX_ENTRIES = int(os.getenv('BACKTEST_CACHE_MAX_ENTRIES', '5000'))
+
+# Cold start budget checked by `manage.py check_startup` (seconds per probe)
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '5'))
+
+# Extra timeframes (resampled from stored bars) scored by analyze_market_trends, e.g. "1h,1d"
+AI_TIMEFRAMES = [tf for tf in os.getenv('AI_TIMEFRAMES', '').split(',') if tf]
+
+# Cache (prediction cache, see ai_prediction/cache.py). Shared through Redis
+# when REDIS_URL is set so every worker sees the same entries.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+PREDICTION_CACHE_TIMEOUT = int(os.getenv('PREDICTION_CACHE_TIMEOUT', str(24 * 3600)))
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://redis:6379/0')
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    Asset, PriceHistory, Trade, Signal, UserWallet, WalletTransaction, 
+    Asset, PriceHistory, IngestionCursor, Trade, Signal, UserWallet, WalletTransaction, 
     UserProfile, StrategyProfile, RiskConfig, Challenge, Badge, 
     UserChallenge, UserBadge
 )
@@ -17,6 +17,11 @@ class PriceHistoryAdmin(admin.ModelAdmin):
     list_filter = ('asset',)
     date_hierarchy = 'datetime'
 
+@admin.register(IngestionCursor)
+class IngestionCursorAdmin(admin.ModelAdmin):
+    list_display = ('asset', 'multiplier', 'timespan', 'last_bar_at', 'updated_at')
+    list_filter = ('timespan',)
+
 @admin.register(Trade)
 class TradeAdmin(admin.ModelAdmin):
     list_display = ('side', 'asset', 'entry_price', 'status', 'pnl', 'confidence_score', 'opened_at')
@@ -1,22 +1,44 @@
 import json
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+
+def user_group_name(user_id):
+    """Dashboard group of one user's private events (e.g. their backtest runs)."""
+    return f"dashboard_user_{user_id}"
+
+
 class DashboardConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.group_name = "dashboard_updates"
-        
-        # Add to group
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
+        self.group_names = [self.group_name]
+        user_id = await self.get_user_id()
+        if user_id is not None:
+            self.group_names.append(user_group_name(user_id))
+
+        # Add to groups
+        for group_name in self.group_names:
+            await self.channel_layer.group_add(
+                group_name,
+                self.channel_name
+            )
         await self.accept()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.group_name,
-            self.channel_name
-        )
+        for group_name in getattr(self, 'group_names', []):
+            await self.channel_layer.group_discard(
+                group_name,
+                self.channel_name
+            )
+
+    @database_sync_to_async
+    def get_user_id(self):
+        # Même utilisateur que les vues de l'API pour une connexion anonyme (utilisateur de démo)
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return user.id
+        from django.contrib.auth.models import User
+        return User.objects.order_by('id').values_list('id', flat=True).first()
 
     # Receive message from group
     async def dashboard_message(self, event):
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Libraries that must stay out of web/worker startup (imported lazily, see core/lazy.py)
+HEAVY_MODULES = ('tensorflow', 'keras', 'sklearn', 'joblib', 'xgboost', 'talib', 'pandas')
+
+ASGI_PROBE = """
+import sys
+import config.asgi
+from django.urls import get_resolver
+get_resolver().url_patterns  # force the URLconf import, like the first request does
+print(','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+class Command(BaseCommand):
+    help = 'Measures cold start (manage.py check, ASGI app + URLconf) in fresh interpreters against a time budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, default=None,
+                            help='Seconds allowed per probe (default: settings.STARTUP_BUDGET_SECONDS)')
+        parser.add_argument('--runs', type=int, default=3, help='Runs per probe, the fastest one is kept')
+
+    def handle(self, *args, **options):
+        budget = options['budget'] or settings.STARTUP_BUDGET_SECONDS
+        probes = {
+            'manage.py check': [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'check'],
+            'asgi application': [sys.executable, '-c', ASGI_PROBE.format(heavy=HEAVY_MODULES)],
+        }
+
+        failures = []
+        for name, cmd in probes.items():
+            best, output = None, ''
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                result = subprocess.run(cmd, cwd=settings.BASE_DIR, capture_output=True, text=True)
+                elapsed = time.perf_counter() - start
+                if result.returncode != 0:
+                    raise CommandError(f"{name} failed:\n{result.stderr}")
+                best = elapsed if best is None else min(best, elapsed)
+                output = result.stdout.strip()
+
+            ok = best <= budget
+            style = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(style(f"{name}: {best:.2f}s (budget {budget:.2f}s)"))
+            if not ok:
+                failures.append(f"{name} took {best:.2f}s")
+
+            if name == 'asgi application' and output:
+                failures.append(f"heavy modules imported at startup: {output}")
+                self.stdout.write(self.style.ERROR(f"Heavy modules loaded by the ASGI app: {output}"))
+
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS("Startup within budget."))
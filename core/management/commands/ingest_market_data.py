@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from core.models import Asset
+from core.services.ingestion_service import AsyncIngestionEngine
+
+class Command(BaseCommand):
+    help = 'Fetches missing bars for many assets concurrently (rate-limited async ingestion)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to refresh (default: all active assets)')
+        parser.add_argument('--days', type=int, default=1, help='History to fetch for assets without data')
+        parser.add_argument('--multiplier', type=int, default=1)
+        parser.add_argument('--timespan', default='day', choices=['minute', 'hour', 'day', 'week'])
+
+    def handle(self, *args, **options):
+        assets = Asset.objects.filter(is_active=True)
+        if options['symbols']:
+            assets = Asset.objects.filter(symbol__in=options['symbols'])
+
+        engine = AsyncIngestionEngine()
+        self.stdout.write(f"Refreshing {assets.count()} assets ({engine.rate_limit} req/min, {engine.max_connections} connections)...")
+
+        written = engine.refresh(assets, days=options['days'], multiplier=options['multiplier'], timespan=options['timespan'])
+        for symbol, rows in sorted(written.items()):
+            self.stdout.write(f"{symbol}: {rows} new bars")
+        self.stdout.write(self.style.SUCCESS(f"Ingestion finished: {sum(written.values())} new bars."))
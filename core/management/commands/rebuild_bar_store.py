@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core.models import Asset
+from core.services.bar_store import BarStore
+
+class Command(BaseCommand):
+    help = 'Rebuilds the columnar BarStore segments from PriceHistory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to rebuild (default: all assets)')
+
+    def handle(self, *args, **options):
+        store = BarStore.default()
+        assets = Asset.objects.all()
+        if options['symbols']:
+            assets = assets.filter(symbol__in=options['symbols'])
+
+        for asset in assets:
+            store.rebuild(asset)
+            self.stdout.write(f"{asset.symbol}: {len(store.load(asset))} bars")
+
+        self.stdout.write(self.style.SUCCESS(f"BarStore rebuilt in {store.root}"))
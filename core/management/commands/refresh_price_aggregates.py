@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.services.aggregate_service import AGGREGATE_VIEWS, PriceAggregateService
+
+class Command(BaseCommand):
+    help = 'Materialises the TimescaleDB continuous aggregates over the full PriceHistory range (one-off backfill)'
+
+    def handle(self, *args, **options):
+        if not PriceAggregateService.is_available():
+            self.stdout.write(self.style.WARNING("TimescaleDB aggregates not installed on this database."))
+            return
+
+        # Lower levels first: each aggregate is built on the previous one
+        for timeframe, view in AGGREGATE_VIEWS.items():
+            self.stdout.write(f"Refreshing {view}...")
+            with connection.cursor() as cursor:
+                cursor.execute("CALL refresh_continuous_aggregate(%s, NULL, NULL)", [view])
+
+        self.stdout.write(self.style.SUCCESS("Continuous aggregates refreshed."))
@@ -0,0 +1,140 @@
+"""
+Turns core_pricehistory into a TimescaleDB hypertable with compression on old
+chunks, and creates the 5m/15m/1h/1d continuous aggregates read by
+core.services.aggregate_service.
+
+No-op on SQLite and on PostgreSQL servers without the timescaledb extension,
+so local/dev databases keep working with the plain table.
+
+Compression requires TimescaleDB >= 2.11: PriceHistoryWriter merges rows with
+INSERT ... ON CONFLICT DO NOTHING, which older versions reject on compressed
+chunks. On an older extension the hypertable and aggregates are created but
+compression is skipped (with a warning); upgrade the extension, then run
+ALTER TABLE core_pricehistory SET (timescaledb.compress ...) and
+add_compression_policy by hand.
+"""
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'core_pricehistory'
+MIN_COMPRESSION_VERSION = (2, 11)
+
+# (view, bucket, source, refresh start_offset, end_offset, schedule_interval)
+# Each level is built on the previous one (hierarchical continuous aggregates)
+AGGREGATES = [
+    ('core_pricehistory_5m', '5 minutes', TABLE, '1 day', '5 minutes', '5 minutes'),
+    ('core_pricehistory_15m', '15 minutes', 'core_pricehistory_5m', '2 days', '15 minutes', '15 minutes'),
+    ('core_pricehistory_1h', '1 hour', 'core_pricehistory_15m', '3 days', '1 hour', '1 hour'),
+    ('core_pricehistory_1d', '1 day', 'core_pricehistory_1h', '7 days', '1 day', '1 day'),
+]
+
+
+def timescale_available(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'")
+        return cursor.fetchone() is not None
+
+
+def extension_version(cursor):
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'timescaledb'")
+    version = cursor.fetchone()[0]
+    return tuple(int(part) for part in version.split('-')[0].split('.')[:2])
+
+
+def aggregate_sql(view, bucket, source):
+    time_col = 'datetime' if source == TABLE else 'bucket'
+    return f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+        WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+        SELECT asset_id,
+               time_bucket(INTERVAL '{bucket}', {time_col}) AS bucket,
+               first(open, {time_col}) AS open,
+               max(high) AS high,
+               min(low) AS low,
+               last(close, {time_col}) AS close,
+               sum(volume) AS volume
+        FROM {source}
+        GROUP BY asset_id, time_bucket(INTERVAL '{bucket}', {time_col})
+        WITH NO DATA
+    """
+
+
+def forwards(apps, schema_editor):
+    if not timescale_available(schema_editor):
+        logger.info("TimescaleDB not available, keeping core_pricehistory as a plain table.")
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
+
+        # Hypertables require every unique index to contain the time column
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [TABLE],
+        )
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(f'ALTER TABLE {TABLE} DROP CONSTRAINT "{row[0]}"')
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, datetime)")
+
+        cursor.execute(
+            f"SELECT create_hypertable('{TABLE}', 'datetime', "
+            "chunk_time_interval => INTERVAL '7 days', migrate_data => true, if_not_exists => true)"
+        )
+
+        # Compression: one segment per asset, ordered by time inside a chunk
+        version = extension_version(cursor)
+        if version >= MIN_COMPRESSION_VERSION:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} SET (timescaledb.compress, "
+                "timescaledb.compress_segmentby = 'asset_id', "
+                "timescaledb.compress_orderby = 'datetime DESC')"
+            )
+            cursor.execute(
+                f"SELECT add_compression_policy('{TABLE}', INTERVAL '30 days', if_not_exists => true)"
+            )
+        else:
+            logger.warning(
+                f"TimescaleDB {'.'.join(map(str, version))} is older than 2.11: compression skipped "
+                "(ON CONFLICT inserts into compressed chunks need 2.11 or later)."
+            )
+
+        for view, bucket, source, start_offset, end_offset, schedule in AGGREGATES:
+            cursor.execute(aggregate_sql(view, bucket, source))
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {view}_asset_bucket_idx ON {view} (asset_id, bucket DESC)"
+            )
+            cursor.execute(
+                f"SELECT add_continuous_aggregate_policy('{view}', "
+                f"start_offset => INTERVAL '{start_offset}', "
+                f"end_offset => INTERVAL '{end_offset}', "
+                f"schedule_interval => INTERVAL '{schedule}', if_not_exists => true)"
+            )
+
+
+def backwards(apps, schema_editor):
+    # The hypertable itself is kept: converting back would copy the whole table.
+    if not timescale_available(schema_editor):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for view, *_ in reversed(AGGREGATES):
+            cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
+        cursor.execute(f"SELECT remove_compression_policy('{TABLE}', if_exists => true)")
+
+
+class Migration(migrations.Migration):
+    # Continuous aggregates cannot be created inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_badge_challenge_userprofile_level_userprofile_xp_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
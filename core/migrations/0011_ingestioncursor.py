@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_pricehistory_timescaledb'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('multiplier', models.PositiveIntegerField(default=1)),
+                ('timespan', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day'), ('week', 'Week')], default='day', max_length=10)),
+                ('last_bar_at', models.DateTimeField(blank=True, help_text='Datetime of the last stored bar', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingestion_cursors', to='core.asset')),
+            ],
+            options={
+                'unique_together': {('asset', 'multiplier', 'timespan')},
+            },
+        ),
+    ]
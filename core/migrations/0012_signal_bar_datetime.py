@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_ingestioncursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signal',
+            name='bar_datetime',
+            field=models.DateTimeField(blank=True, help_text='Last bar the prediction was computed on', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='signal',
+            index=models.Index(fields=['asset', 'bar_datetime'], name='core_signal_asset_i_2fc4a1_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_signal_bar_datetime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signal',
+            name='timeframe',
+            field=models.CharField(blank=True, default='', help_text='Resampled timeframe (e.g. 1h), empty for the base interval', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='signal',
+            index=models.Index(fields=['asset', 'timeframe', 'generated_at'], name='core_signal_asset_i_6faf2f_idx'),
+        ),
+    ]
@@ -110,6 +110,29 @@ class PriceHistory(models.Model):
     def __str__(self):
         return f"{self.asset.symbol} @ {self.datetime}"
 
+class IngestionCursor(models.Model):
+    """
+    High-water mark of the market data collector for one asset and bar size,
+    so each run only requests the bars after the last stored one.
+    """
+    class Timespan(models.TextChoices):
+        MINUTE = 'minute', _('Minute')
+        HOUR = 'hour', _('Hour')
+        DAY = 'day', _('Day')
+        WEEK = 'week', _('Week')
+
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='ingestion_cursors')
+    multiplier = models.PositiveIntegerField(default=1)
+    timespan = models.CharField(max_length=10, choices=Timespan.choices, default=Timespan.DAY)
+    last_bar_at = models.DateTimeField(null=True, blank=True, help_text="Datetime of the last stored bar")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('asset', 'multiplier', 'timespan')
+
+    def __str__(self):
+        return f"{self.asset.symbol} {self.multiplier}/{self.timespan} @ {self.last_bar_at}"
+
 class Signal(models.Model):
     class SignalType(models.TextChoices):
         BUY = 'BUY', _('Buy')
@@ -124,8 +147,16 @@ class Signal(models.Model):
     
     technical_indicators = models.JSONField(default=dict, help_text="RSI, MACD values at time of signal")
     model_version = models.CharField(max_length=50, default="v1")
+    bar_datetime = models.DateTimeField(null=True, blank=True, help_text="Last bar the prediction was computed on")
+    timeframe = models.CharField(max_length=10, blank=True, default='', help_text="Resampled timeframe (e.g. 1h), empty for the base interval")
     
     is_processed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['asset', 'bar_datetime']),
+            models.Index(fields=['asset', 'timeframe', 'generated_at']),
+        ]
     
     def __str__(self):
         return f"{self.asset.symbol} {self.signal_type} ({self.confidence})"
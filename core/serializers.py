@@ -64,8 +64,8 @@ class TradeSerializer(serializers.ModelSerializer):
 class SignalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Signal
-        fields = ['id', 'asset', 'generated_at', 'signal_type', 'confidence', 'predicted_price', 'technical_indicators']
-        read_only_fields = ['id', 'generated_at']
+        fields = ['id', 'asset', 'generated_at', 'signal_type', 'confidence', 'predicted_price', 'technical_indicators', 'model_version', 'bar_datetime', 'timeframe']
+        read_only_fields = ['id', 'generated_at', 'model_version', 'bar_datetime', 'timeframe']
 
 class UserWalletSerializer(serializers.ModelSerializer):
     class Meta:
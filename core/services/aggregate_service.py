@@ -0,0 +1,77 @@
+import logging
+from django.db import connection
+from core.services.bar_store import COLUMNS
+from core.services.resampler import BarResampler, TIMEFRAMES
+
+logger = logging.getLogger(__name__)
+
+# Continuous aggregates created by core/migrations/0010_pricehistory_timescaledb.py
+AGGREGATE_VIEWS = {
+    '5m': 'core_pricehistory_5m',
+    '15m': 'core_pricehistory_15m',
+    '1h': 'core_pricehistory_1h',
+    '1d': 'core_pricehistory_1d',
+}
+
+
+class PriceAggregateService:
+    """
+    Higher-timeframe OHLCV bars for an asset.
+    Reads the TimescaleDB continuous aggregates when they exist (chunk-pruned,
+    pre-materialised), otherwise derives them with the in-process BarResampler.
+    """
+    _available = None
+
+    @classmethod
+    def is_available(cls):
+        """True when the continuous aggregates exist in the current database."""
+        if cls._available is None:
+            cls._available = False
+            if connection.vendor == 'postgresql':
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT to_regclass(%s)", [AGGREGATE_VIEWS['1d']])
+                        cls._available = cursor.fetchone()[0] is not None
+                except Exception as e:
+                    logger.warning(f"Could not detect TimescaleDB aggregates: {e}")
+        return cls._available
+
+    @staticmethod
+    def fetch(asset, timeframe, start=None, end=None):
+        """
+        Returns a DataFrame of float64 open/high/low/close/volume indexed by the
+        (UTC) bucket start for `timeframe` in TIMEFRAMES.
+        """
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe {timeframe}. Use one of {', '.join(TIMEFRAMES)}")
+
+        if timeframe in AGGREGATE_VIEWS and PriceAggregateService.is_available():
+            return PriceAggregateService._fetch_timescale(asset, timeframe, start, end)
+        return BarResampler.default().load_frame(asset, timeframe, start=start, end=end)
+
+    @staticmethod
+    def _fetch_timescale(asset, timeframe, start, end):
+        import numpy as np
+        import pandas as pd
+
+        sql = (
+            f"SELECT bucket, open::float8, high::float8, low::float8, close::float8, volume::float8 "
+            f"FROM {AGGREGATE_VIEWS[timeframe]} WHERE asset_id = %s"
+        )
+        params = [asset.id]
+        if start is not None:
+            sql += " AND bucket >= %s"
+            params.append(start)
+        if end is not None:
+            sql += " AND bucket <= %s"
+            params.append(end)
+        sql += " ORDER BY bucket"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        index = pd.DatetimeIndex([r[0] for r in rows], name='datetime')
+        index = index.tz_convert('UTC') if index.tz is not None else index.tz_localize('UTC')
+        values = np.array([r[1:] for r in rows], dtype=np.float64).reshape(len(rows), len(COLUMNS))
+        return pd.DataFrame(values, index=index, columns=list(COLUMNS))
@@ -1,9 +1,12 @@
-from core.models import Asset, Signal, PriceHistory
+from core.models import Asset, Signal
+from core.services.bar_store import BarStore
 from core.services.market_data_service import MarketDataService
 from core.services.news_service import NewsService
-import pandas as pd
-import numpy as np
 import logging
+from core.lazy import lazy_import
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +29,8 @@ class AIService:
         md_service = MarketDataService()
         # md_service.fetch_and_store_data(symbol, days=2) # Ensure we have recent data
         
-        # 2. Load Data from DB
-        qs = PriceHistory.objects.filter(asset=asset).order_by('datetime')
-        if not qs.exists():
-            return None
-            
-        df = pd.DataFrame(list(qs.values('datetime', 'close', 'high', 'low', 'volume')))
-        df.set_index('datetime', inplace=True)
+        # 2. Load Data from the BarStore (float64 columns)
+        df = BarStore.default().load_frame(asset, columns=['close', 'high', 'low', 'volume'])
         
         if len(df) < 50:
             return None # Not enough data
@@ -0,0 +1,398 @@
+import os
+import re
+import json
+import logging
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from core.lazy import lazy_import
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: process-level locking only
+    fcntl = None
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _dt_to_ns(dt):
+    """Converts a (possibly naive, assumed UTC) datetime to epoch nanoseconds."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+
+
+def _index_to_ns(index):
+    """Converts a pandas DatetimeIndex (naive = UTC) to an int64 ns array."""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_convert(None)
+    return np.asarray(index.values, dtype='datetime64[ns]').view(np.int64)
+
+
+class Bars:
+    """
+    OHLCV columns of one asset, each a contiguous float64 array.
+    `datetime` holds epoch nanoseconds (UTC) as int64.
+    """
+    __slots__ = ('symbol', 'datetime') + COLUMNS
+
+    def __init__(self, symbol, datetime, open, high, low, close, volume):
+        self.symbol = symbol
+        self.datetime = datetime
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self):
+        return len(self.datetime)
+
+    def to_frame(self, columns=None):
+        """Builds a DataFrame on top of the arrays (no copy of the columns)."""
+        import pandas as pd
+
+        index = pd.DatetimeIndex(self.datetime.view('datetime64[ns]'), name='datetime').tz_localize('UTC')
+        data = {col: getattr(self, col) for col in (columns or COLUMNS)}
+        return pd.DataFrame(data, index=index, copy=False)
+
+
+class BarStore:
+    """
+    Columnar on-disk copy of PriceHistory, one segment per asset.
+
+    Layout: <BAR_STORE_DIR>/<SYMBOL>/{datetime,open,high,low,close,volume}<files>.bin + meta.json
+    Each .bin file is an append-only stream of fixed-width 8-byte records, row i
+    of the segment being record i of every column file. meta.json is written last
+    and holds the committed row count, so readers never see a half-written append.
+    A rebuild writes a new set of files (meta['files'] = ".g<generation>") and
+    switches to it with the single atomic replace of meta.json: readers see
+    either the old columns or the new ones, never a mix.
+
+    PriceHistory stays the source of truth; writers call write_frame()/sync()
+    after inserting rows. Readers memory-map the files read-only: every Celery
+    worker and web process shares the same page-cache copy of the history.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, root=None):
+        root = root or getattr(settings, 'BAR_STORE_DIR', None) or Path(settings.BASE_DIR) / 'data' / 'bars'
+        self.root = Path(root)
+        self._thread_lock = threading.RLock()
+        # symbol -> ((generation, rows), arrays): avoids re-mapping unchanged segments
+        self._maps = {}
+
+    @classmethod
+    def default(cls):
+        """Process-wide store rooted at settings.BAR_STORE_DIR."""
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    # ------------------------------------------------------------------
+    # Paths & metadata
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _symbol(asset):
+        return asset if isinstance(asset, str) else asset.symbol
+
+    def segment_dir(self, asset):
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', self._symbol(asset))
+        return self.root / safe
+
+    def _column_path(self, asset, column, meta=None):
+        suffix = meta.get('files', '') if meta else ''
+        return self.segment_dir(asset) / f"{column}{suffix}.bin"
+
+    def _read_meta(self, asset, include_stale=False):
+        try:
+            with open(self.segment_dir(asset) / 'meta.json') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get('stale') and not include_stale:
+            return None
+        return meta
+
+    def _write_meta(self, asset, meta):
+        path = self.segment_dir(asset) / 'meta.json'
+        tmp = path.with_suffix('.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def exists(self, asset):
+        return self._read_meta(asset) is not None
+
+    def meta(self, asset):
+        """Segment metadata: rows, first/last epoch ns, rebuild generation and column checksums (None if missing)."""
+        return self._read_meta(asset)
+
+    def data_version(self, asset):
+        """
+        Digest of the committed bars (row count, last bar, CRC32 of every column),
+        for caches of results computed from them: rebuilding the same rows gives
+        the same version, any new or edited bar another one. None if the segment
+        is missing or stale.
+        """
+        meta = self._read_meta(asset)
+        if meta is None:
+            return None
+        crc = meta.get('crc') or self._checksums(asset, meta)
+        return f"{meta['rows']}:{meta['last']}:" + "".join(f"{crc[name]:08x}" for name in ('datetime',) + COLUMNS)
+
+    def _checksums(self, asset, meta):
+        """CRC32 of the committed rows of every column (segments written before 'crc' was kept in meta)."""
+        arrays = self._map_segment(asset, meta)
+        return {name: zlib.crc32(values.tobytes()) for name, values in arrays.items()}
+
+    def last_timestamp(self, asset):
+        """Epoch ns of the last stored bar, or None if the segment is missing/empty."""
+        meta = self._read_meta(asset)
+        if not meta or not meta['rows']:
+            return None
+        return meta['last']
+
+    @contextmanager
+    def _locked(self, asset):
+        """Serialises writers of one segment across threads and processes."""
+        seg = self.segment_dir(asset)
+        seg.mkdir(parents=True, exist_ok=True)
+        with self._thread_lock:
+            with open(seg / '.lock', 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def load(self, asset, start=None, end=None):
+        """
+        Returns Bars for `asset` (Asset or symbol), optionally restricted to
+        start <= datetime <= end. Builds the segment from the DB on first use.
+        """
+        symbol = self._symbol(asset)
+        meta = self._read_meta(asset)
+        if meta is None:
+            if isinstance(asset, str):
+                from core.models import Asset
+
+                asset = Asset.objects.filter(symbol=asset).first()
+                if asset is None:
+                    # Symbole inconnu : rien à construire, aucun segment créé sur disque
+                    return Bars(symbol, **self._empty_arrays())
+            self.rebuild(asset)
+
+        for attempt in range(3):
+            meta = self._read_meta(asset) or {'rows': 0}
+            try:
+                arrays = self._map_segment(asset, meta)
+                break
+            except (FileNotFoundError, ValueError):
+                # Reconstruction concurrente : les fichiers de cette meta viennent d'être remplacés
+                if attempt == 2:
+                    raise
+
+        if start is not None or end is not None:
+            ts = arrays['datetime']
+            lo = np.searchsorted(ts, _dt_to_ns(start), 'left') if start is not None else 0
+            hi = np.searchsorted(ts, _dt_to_ns(end), 'right') if end is not None else len(ts)
+            arrays = {k: v[lo:hi] for k, v in arrays.items()}
+
+        return Bars(symbol, **arrays)
+
+    def _map_segment(self, asset, meta):
+        """Read-only memory maps of the committed rows of every column."""
+        symbol = self._symbol(asset)
+        key = (meta.get('generation', 0), meta.get('files', ''), meta['rows'])
+        cached = self._maps.get(symbol)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        arrays = {'datetime': self._read_column(asset, 'datetime', np.int64, meta['rows'], meta)}
+        for col in COLUMNS:
+            arrays[col] = self._read_column(asset, col, np.float64, meta['rows'], meta)
+        self._maps[symbol] = (key, arrays)
+        return arrays
+
+    @staticmethod
+    def _empty_arrays():
+        arrays = {'datetime': np.empty(0, dtype=np.int64)}
+        arrays.update({col: np.empty(0, dtype=np.float64) for col in COLUMNS})
+        return arrays
+
+    def _read_column(self, asset, column, dtype, rows, meta=None):
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        path = self._column_path(asset, column, meta)
+        if os.path.getsize(path) < rows * np.dtype(dtype).itemsize:
+            raise ValueError(f"BarStore: {path.name} is shorter than the {rows} committed rows")
+        mm = np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+        return mm.view(np.ndarray)
+
+    def load_frame(self, asset, start=None, end=None, columns=None):
+        """Same as load() but returns a DataFrame indexed by UTC datetime."""
+        return self.load(asset, start=start, end=end).to_frame(columns)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def write_frame(self, asset, df):
+        """
+        Mirrors rows just inserted into PriceHistory. `df` is indexed by
+        datetime and has open/high/low/close[/volume] columns.
+        Appends when the rows are newer than the segment, rebuilds from the DB otherwise.
+        """
+        if df is None or df.empty:
+            return
+        ts = _index_to_ns(df.index)
+        with self._locked(asset):
+            meta = self._read_meta(asset)
+            if meta is None:
+                self._rebuild_locked(asset)
+                return
+
+            last = meta['last'] if meta['rows'] else None
+            new = ts > last if last is not None else np.ones(len(ts), dtype=bool)
+            older = ts[~new]
+            if older.size:
+                stored = self._read_column(asset, 'datetime', np.int64, meta['rows'], meta)
+                pos = np.searchsorted(stored, older)
+                pos[pos == len(stored)] = 0
+                if not np.array_equal(stored[pos], older):
+                    # Backfill before the end of the segment: keep ordering by rebuilding
+                    self._rebuild_locked(asset)
+                    return
+
+            if not new.any():
+                return
+            order = np.argsort(ts[new], kind='stable')
+            new_ts = ts[new][order]
+            keep = np.ones(len(new_ts), dtype=bool)
+            keep[1:] = new_ts[1:] != new_ts[:-1]
+            columns = {'datetime': new_ts[keep]}
+            for col in COLUMNS:
+                values = df[col].to_numpy(dtype=np.float64) if col in df else np.zeros(len(ts))
+                columns[col] = values[new][order][keep]
+            self._append_locked(asset, meta, columns)
+
+    def sync(self, asset, since=None):
+        """
+        Pulls PriceHistory rows newer than the segment into it.
+        `since` is the earliest datetime written; if it is not after the last
+        stored bar the segment is rebuilt instead.
+        """
+        from core.models import Asset, PriceHistory
+
+        if isinstance(asset, str):
+            asset = Asset.objects.get(symbol=asset)
+
+        with self._locked(asset):
+            meta = self._read_meta(asset)
+            last = meta['last'] if meta and meta['rows'] else None
+            if meta is None or (since is not None and last is not None and _dt_to_ns(since) <= last):
+                self._rebuild_locked(asset)
+                return
+
+            qs = PriceHistory.objects.filter(asset=asset)
+            if last is not None:
+                qs = qs.filter(datetime__gt=datetime.fromtimestamp(last / 1e9, tz=timezone.utc))
+            columns = self._columns_from_queryset(qs)
+            if len(columns['datetime']):
+                self._append_locked(asset, meta, columns)
+
+    def rebuild(self, asset):
+        """Rewrites the whole segment from PriceHistory."""
+        with self._locked(asset):
+            self._rebuild_locked(asset)
+
+    def drop(self, asset):
+        """Invalidates a segment; the next load() rebuilds it from the DB."""
+        meta = self._read_meta(asset)
+        if meta is not None:
+            # Keep the generation so mapped readers notice the rebuild
+            self._write_meta(asset, {'stale': True, 'generation': meta.get('generation', 0),
+                                     'files': meta.get('files', '')})
+
+    def _rebuild_locked(self, asset):
+        from core.models import Asset, PriceHistory
+
+        if isinstance(asset, str):
+            try:
+                asset = Asset.objects.get(symbol=asset)
+            except Asset.DoesNotExist:
+                self._write_meta(asset, {'rows': 0, 'first': None, 'last': None})
+                return
+
+        columns = self._columns_from_queryset(PriceHistory.objects.filter(asset=asset))
+        previous = self._read_meta(asset, include_stale=True) or {}
+        ts = columns['datetime']
+        generation = previous.get('generation', 0) + 1
+        meta = {
+            'rows': int(len(ts)),
+            'first': int(ts[0]) if len(ts) else None,
+            'last': int(ts[-1]) if len(ts) else None,
+            'generation': generation,
+            'files': f".g{generation}",
+            'crc': {name: zlib.crc32(values.tobytes()) for name, values in columns.items()},
+        }
+        # New generation files, then one atomic meta replace switches readers to them
+        for name, values in columns.items():
+            values.tofile(self._column_path(asset, name, meta))
+        self._write_meta(asset, meta)
+
+        # Processes that still map the previous generation keep its inodes until they reload
+        if previous.get('files', '') != meta['files']:
+            for name in ('datetime',) + COLUMNS:
+                self._column_path(asset, name, previous).unlink(missing_ok=True)
+        logger.info(f"BarStore: rebuilt {asset.symbol} ({meta['rows']} bars)")
+
+    def _append_locked(self, asset, meta, columns):
+        rows = meta['rows']
+        crc = meta.get('crc') or self._checksums(asset, meta)
+        for name, values in columns.items():
+            path = self._column_path(asset, name, meta)
+            mode = 'r+b' if path.exists() else 'wb'
+            with open(path, mode) as f:
+                # Drop bytes from an interrupted append before writing
+                f.seek(rows * 8)
+                f.truncate()
+                f.write(values.tobytes())
+
+        ts = columns['datetime']
+        self._write_meta(asset, {
+            'rows': rows + len(ts),
+            'first': meta['first'] if meta['rows'] else int(ts[0]),
+            'last': int(ts[-1]),
+            'generation': meta.get('generation', 0),
+            'files': meta.get('files', ''),
+            # CRC32 chaîné : même valeur que sur les colonnes complètes
+            'crc': {name: zlib.crc32(values.tobytes(), crc[name]) for name, values in columns.items()},
+        })
+
+    @staticmethod
+    def _columns_from_queryset(qs):
+        rows = list(qs.order_by('datetime').values_list('datetime', *COLUMNS))
+        n = len(rows)
+        columns = {'datetime': np.fromiter((_dt_to_ns(r[0]) for r in rows), dtype=np.int64, count=n)}
+        for i, col in enumerate(COLUMNS, start=1):
+            columns[col] = np.fromiter((float(r[i]) for r in rows), dtype=np.float64, count=n)
+        return columns
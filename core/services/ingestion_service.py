@@ -0,0 +1,334 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from core.lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+logger = logging.getLogger(__name__)
+
+POLYGON_AGGS_URL = "https://api.polygon.io/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start}/{end}"
+POLYGON_GROUPED_URL = "https://api.polygon.io/v2/aggs/grouped/locale/{locale}/market/{market}/{date}"
+
+# Grouped-daily market per asset type: (locale, market, timezone of the daily bar open).
+# Stock daily bars open at midnight New York time, crypto/forex at midnight UTC.
+GROUPED_MARKETS = {
+    'STOCK': ('us', 'stocks', 'America/New_York'),
+    'CRYPTO': ('global', 'crypto', 'UTC'),
+    'FOREX': ('global', 'fx', 'UTC'),
+}
+
+# Duration of one Polygon bar per timespan (seconds)
+TIMESPAN_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400, 'week': 604800}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def polygon_ticker(asset):
+    """Maps an Asset to its Polygon ticker (X: crypto, C: forex prefixes)."""
+    from core.models import Asset
+
+    symbol = asset.symbol
+    if ':' in symbol:
+        return symbol
+    if asset.asset_type == Asset.AssetType.CRYPTO:
+        return f"X:{symbol}"
+    if asset.asset_type == Asset.AssetType.FOREX:
+        return f"C:{symbol}"
+    return symbol
+
+
+def last_bar_at(df):
+    """Aware UTC datetime of the last bar of a frame (naive indexes are UTC)."""
+    last = df.index.max()
+    return (last.tz_localize('UTC') if last.tzinfo is None else last.tz_convert('UTC')).to_pydatetime()
+
+
+@dataclass
+class FetchRequest:
+    symbol: str
+    ticker: str
+    start_ms: int
+    end_ms: int
+    multiplier: int = 1
+    timespan: str = 'day'
+    asset_type: str = ''
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all coroutines of one provider:
+    at most `rate` requests per `per` seconds, bursts up to `rate`.
+    """
+    def __init__(self, rate, per=60.0):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+
+
+class AsyncIngestionEngine:
+    """
+    Fetches bars for many symbols concurrently over one pooled keep-alive
+    httpx client. Throughput is bounded by the provider rate limit
+    (settings.MARKET_DATA_RATE_LIMITS, requests/minute) rather than by serial
+    round trips. refresh() is the entry point: it writes everything fetched in
+    one batch and advances the IngestionCursors with it.
+    """
+    def __init__(self, provider='polygon', api_key=None, max_connections=None, rate_limit=None,
+                 max_retries=4, timeout=None, transport=None):
+        self.provider = provider
+        self.api_key = api_key or os.getenv("POLYGON_API_KEY")
+        if not self.api_key:
+            raise ValueError("Polygon API Key missing")
+        self.max_connections = max_connections or settings.MARKET_DATA_MAX_CONNECTIONS
+        self.rate_limit = rate_limit or settings.MARKET_DATA_RATE_LIMITS.get(provider, 5)
+        self.max_retries = max_retries
+        self.timeout = timeout or settings.MARKET_DATA_HTTP_TIMEOUT
+        # httpx transport of the pooled client (httpx.MockTransport in tests)
+        self.transport = transport
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+    @staticmethod
+    def plan(assets, days=1, multiplier=1, timespan='day'):
+        """
+        Builds one FetchRequest per asset covering only the gap after its
+        IngestionCursor (or the last `days` for assets without history).
+        Assets whose next bar has not opened yet are skipped.
+        """
+        from django.db.models import Max
+        from core.models import IngestionCursor, PriceHistory
+
+        now = timezone.now()
+        span = timedelta(seconds=TIMESPAN_SECONDS[timespan] * multiplier)
+        end_ms = int(now.timestamp() * 1000)
+        requests = []
+        for asset in assets:
+            cursor, _ = IngestionCursor.objects.get_or_create(asset=asset, multiplier=multiplier, timespan=timespan)
+            last = cursor.last_bar_at
+            if last is None:
+                last = PriceHistory.objects.filter(asset=asset).aggregate(last=Max('datetime'))['last']
+
+            if last is not None:
+                if now - last < span:
+                    continue
+                start_ms = int(last.timestamp() * 1000) + 1
+            else:
+                start_ms = int((now - timedelta(days=days)).timestamp() * 1000)
+
+            requests.append(FetchRequest(
+                asset.symbol, polygon_ticker(asset), start_ms, end_ms, multiplier, timespan, asset.asset_type
+            ))
+        return requests
+
+    @staticmethod
+    def plan_grouped(requests):
+        """
+        Splits daily requests between grouped-daily calls and per-ticker calls.
+        A grouped call returns one day for a whole market, so it is used when a
+        market needs fewer distinct days than it has tickers to refresh.
+        Returns ({(locale, market, tz): [(date, [requests])]}, remaining requests).
+        """
+        import pandas as pd
+
+        by_market = {}
+        remaining = []
+        for req in requests:
+            market = GROUPED_MARKETS.get(req.asset_type)
+            if req.timespan != 'day' or req.multiplier != 1 or market is None:
+                remaining.append(req)
+            else:
+                by_market.setdefault(market, []).append(req)
+
+        grouped = {}
+        for market, reqs in by_market.items():
+            tz = market[2]
+            start = min(r.start_ms for r in reqs)
+            end = max(r.end_ms for r in reqs)
+            days = pd.date_range(
+                pd.Timestamp(start, unit='ms', tz='UTC').tz_convert(tz).normalize(),
+                pd.Timestamp(end, unit='ms', tz='UTC').tz_convert(tz).normalize(),
+                freq='D',
+            )
+            if market[1] == 'stocks':
+                days = days[days.dayofweek < 5]
+            if len(days) >= len(reqs):
+                remaining.extend(reqs)
+                continue
+            grouped[market] = [
+                (day.strftime('%Y-%m-%d'), [r for r in reqs if r.start_ms < (day + pd.Timedelta(days=1)).value // 10**6])
+                for day in days
+            ]
+        return grouped, remaining
+
+    # ------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------
+    async def _get(self, client, limiter, url, params):
+        """GET with rate limiting and exponential backoff on 429/5xx/network errors."""
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                resp = await client.get(url, params=params)
+                if resp.status_code not in RETRY_STATUSES:
+                    resp.raise_for_status()
+                    return resp.json()
+                retry_after = resp.headers.get('Retry-After')
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else None
+                error = f"HTTP {resp.status_code}"
+            except httpx.TransportError as e:
+                delay = None
+                error = str(e)
+
+            if attempt == self.max_retries:
+                raise RuntimeError(f"{url} failed after {attempt + 1} attempts: {error}")
+            delay = delay if delay is not None else min(60.0, 2 ** attempt) + random.uniform(0, 1)
+            logger.warning(f"{error} on {url}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def fetch(self, client, limiter, req):
+        """Returns the bars of one request as a DataFrame (UTC index), following next_url pages."""
+        import pandas as pd
+
+        url = POLYGON_AGGS_URL.format(
+            ticker=req.ticker, multiplier=req.multiplier, timespan=req.timespan,
+            start=req.start_ms, end=req.end_ms
+        )
+        params = {"adjusted": "true", "sort": "asc", "limit": 50000, "apiKey": self.api_key}
+        results = []
+        while url:
+            data = await self._get(client, limiter, url, params)
+            if data.get('status') not in ('OK', 'DELAYED'):
+                logger.error(f"Polygon error for {req.ticker}: {data}")
+                return None
+            results.extend(data.get('results', []))
+            url = data.get('next_url')
+            params = {"apiKey": self.api_key}
+
+        if not results:
+            return None
+        df = pd.DataFrame(results).rename(columns={'t': 'timestamp', 'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume'})
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+        return df.set_index('datetime')[['open', 'high', 'low', 'close', 'volume']]
+
+    async def fetch_grouped(self, client, limiter, market, date, requests):
+        """
+        One grouped-daily call for a whole market. Returns {symbol: DataFrame}
+        for the requested tickers whose bar falls inside their own gap.
+        """
+        import pandas as pd
+
+        locale, name, tz = market
+        url = POLYGON_GROUPED_URL.format(locale=locale, market=name, date=date)
+        data = await self._get(client, limiter, url, {"adjusted": "true", "apiKey": self.api_key})
+        if data.get('status') not in ('OK', 'DELAYED'):
+            logger.error(f"Polygon grouped error for {name} {date}: {data}")
+            return {}
+
+        by_ticker = {r.get('T'): r for r in data.get('results') or []}
+        # Grouped bars carry the close time; align on the bar open like the per-ticker endpoint
+        bar_open = pd.Timestamp(date, tz=tz).tz_convert('UTC')
+        bar_ms = bar_open.value // 10**6
+        frames = {}
+        for req in requests:
+            bar = by_ticker.get(req.ticker)
+            if bar is None or not (req.start_ms <= bar_ms <= req.end_ms):
+                continue
+            frames[req.symbol] = pd.DataFrame(
+                {'open': [bar['o']], 'high': [bar['h']], 'low': [bar['l']], 'close': [bar['c']], 'volume': [bar.get('v', 0)]},
+                index=pd.DatetimeIndex([bar_open], name='datetime'),
+            )
+        return frames
+
+    async def collect(self, requests):
+        """
+        Fetches all requests without writing them. Daily bars of markets with
+        many tickers go through grouped-daily calls (one call per market and
+        day instead of one per ticker). Returns {symbol: DataFrame}.
+        """
+        import pandas as pd
+
+        grouped, remaining = self.plan_grouped(requests)
+        limiter = RateLimiter(self.rate_limit)
+        semaphore = asyncio.Semaphore(self.max_connections)
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        parts = {}
+
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout, transport=self.transport) as client:
+            async def ticker_worker(req):
+                async with semaphore:
+                    try:
+                        df = await self.fetch(client, limiter, req)
+                    except Exception as e:
+                        logger.error(f"Ingestion failed for {req.symbol}: {e}")
+                        return
+                if df is not None and not df.empty:
+                    parts.setdefault(req.symbol, []).append(df)
+
+            async def grouped_worker(market, date, reqs):
+                async with semaphore:
+                    try:
+                        frames = await self.fetch_grouped(client, limiter, market, date, reqs)
+                    except Exception as e:
+                        logger.error(f"Grouped ingestion failed for {market[1]} {date}: {e}")
+                        return
+                for symbol, df in frames.items():
+                    parts.setdefault(symbol, []).append(df)
+
+            await asyncio.gather(
+                *(ticker_worker(req) for req in remaining),
+                *(grouped_worker(market, date, reqs)
+                  for market, days in grouped.items() for date, reqs in days if reqs),
+            )
+
+        return {symbol: pd.concat(dfs).sort_index() for symbol, dfs in parts.items()}
+
+    def refresh(self, assets, days=1, multiplier=1, timespan='day'):
+        """
+        Batch refresh of a set of assets: plans the gaps, fetches everything
+        concurrently, then writes all rows in a single bulk insert and advances
+        the cursors together. Returns {symbol: new rows inserted}.
+        """
+        from core.models import IngestionCursor
+        from core.services.price_writer import PriceHistoryWriter
+
+        assets = {asset.symbol: asset for asset in assets}
+        requests = self.plan(assets.values(), days, multiplier, timespan)
+        if not requests:
+            return {}
+
+        frames = asyncio.run(self.collect(requests))
+        frames = {assets[symbol]: df[df['volume'] > 0] for symbol, df in frames.items()}
+        written = PriceHistoryWriter.write_many(frames)
+
+        last_bars = {asset.id: last_bar_at(df) for asset, df in frames.items() if not df.empty}
+        cursors = list(IngestionCursor.objects.filter(
+            asset_id__in=last_bars, multiplier=multiplier, timespan=timespan
+        ))
+        now = timezone.now()
+        for cursor in cursors:
+            cursor.last_bar_at = last_bars[cursor.asset_id]
+            cursor.updated_at = now
+        IngestionCursor.objects.bulk_update(cursors, ['last_bar_at', 'updated_at'])
+        return written
@@ -1,10 +1,13 @@
 import os
-import requests
-import pandas as pd
 import logging
 from datetime import datetime, timedelta
 from django.conf import settings
-from core.models import Asset, PriceHistory
+from core.models import Asset
+from core.services.price_writer import PriceHistoryWriter
+from core.lazy import lazy_import
+
+requests = lazy_import("requests")
+pd = lazy_import("pandas")
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +17,7 @@ class MarketDataService:
         self.alpaca_key = os.getenv("ALPACA_API_KEY")
         self.alpaca_secret = os.getenv("ALPACA_SECRET_KEY")
         self.alpaca_base_url = os.getenv("ALPACA_BASE_URL", "https://paper-api.alpaca.markets")
+        self.session = requests.Session()
 
     def fetch_and_store_data(self, symbol: str, days: int = 1):
         """
@@ -55,7 +59,7 @@ class MarketDataService:
         params = {"adjusted": "true", "sort": "asc", "limit": 50000, "apiKey": self.polygon_key}
         
         try:
-            resp = requests.get(url, params=params)
+            resp = self.session.get(url, params=params, timeout=settings.MARKET_DATA_HTTP_TIMEOUT)
             data = resp.json()
             if data.get('status') != 'OK' or 'results' not in data:
                 return None
@@ -96,22 +100,4 @@ class MarketDataService:
             return None
 
     def _save_to_db(self, asset, df):
-        # Clean data
-        df = df[~df.index.duplicated(keep='first')]
-        df = df.dropna()
-        
-        batch = []
-        for index, row in df.iterrows():
-            batch.append(
-                PriceHistory(
-                    asset=asset,
-                    datetime=index,
-                    open=row['open'],
-                    high=row['high'],
-                    low=row['low'],
-                    close=row['close'],
-                    volume=row.get('volume', 0)
-                )
-            )
-        PriceHistory.objects.bulk_create(batch, batch_size=2000, ignore_conflicts=True)
-        logger.info(f"Saved {len(batch)} records for {asset.symbol}")
+        PriceHistoryWriter.write(asset, df)
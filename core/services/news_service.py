@@ -1,7 +1,9 @@
 import os
-import requests
 import logging
 from datetime import datetime, timedelta
+from core.lazy import lazy_import
+
+requests = lazy_import("requests")
 
 logger = logging.getLogger(__name__)
 
@@ -0,0 +1,154 @@
+import io
+import logging
+from django.db import connection, transaction
+from core.models import PriceHistory
+from core.services.bar_store import BarStore
+
+logger = logging.getLogger(__name__)
+
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+
+class PriceHistoryWriter:
+    """
+    Single write path from OHLCV DataFrames (indexed by datetime) to PriceHistory.
+    Several assets are written in one bulk insert, then the BarStore segments
+    and price alerts are updated per asset.
+
+    On PostgreSQL the columns are streamed with COPY into a temporary staging
+    table and merged with INSERT ... ON CONFLICT DO NOTHING; other databases
+    use bulk_create. Rows are never materialised one by one through pandas.
+    """
+
+    @staticmethod
+    def prepare(df):
+        """Drops duplicate timestamps and incomplete rows, fills a missing volume column."""
+        df = df[~df.index.duplicated(keep='first')]
+        if 'volume' not in df:
+            df = df.assign(volume=0.0)
+        return df[OHLCV].astype('float64').dropna()
+
+    @staticmethod
+    def write(asset, df):
+        return PriceHistoryWriter.write_many({asset: df}).get(asset.symbol, 0)
+
+    @staticmethod
+    def write_many(frames, batch_size=5000):
+        """
+        frames: {Asset: DataFrame}. Returns {symbol: rows inserted}.
+        Rows already stored (same asset/datetime) are skipped and not counted.
+        """
+        frames = {asset: PriceHistoryWriter.prepare(df) for asset, df in frames.items() if df is not None}
+        frames = {asset: df for asset, df in frames.items() if not df.empty}
+        if not frames:
+            return {}
+
+        if connection.vendor == 'postgresql':
+            inserted = PriceHistoryWriter._copy(frames)
+        else:
+            inserted = PriceHistoryWriter._bulk_create(frames, batch_size)
+        logger.info(f"Saved {sum(inserted.values())} new bars for {len(frames)} assets")
+
+        PriceHistoryWriter._after_write(frames)
+        return {asset.symbol: inserted.get(asset.id, 0) for asset in frames}
+
+    @staticmethod
+    def _bulk_create(frames, batch_size):
+        """
+        bulk_create does not report which rows ignore_conflicts skipped: the
+        timestamps already stored are filtered out first, so the objects
+        created are the inserted rows. Returns {asset_id: rows inserted}.
+        """
+        import numpy as np
+        import pandas as pd
+
+        objs, inserted = [], {}
+        for asset, df in frames.items():
+            index = df.index.tz_localize('UTC') if df.index.tz is None else df.index.tz_convert('UTC')
+            existing = PriceHistory.objects.filter(
+                asset=asset, datetime__gte=index.min().to_pydatetime(), datetime__lte=index.max().to_pydatetime()
+            ).values_list('datetime', flat=True)
+            stored = pd.DatetimeIndex(list(existing), tz='UTC').as_unit('us').asi8
+            keep = ~np.isin(index.as_unit('us').asi8, stored)
+            new = df[keep]
+            inserted[asset.id] = len(new)
+            objs.extend(
+                PriceHistory(asset=asset, datetime=dt, open=o, high=h, low=l, close=c, volume=v)
+                for dt, o, h, l, c, v in zip(
+                    index[keep].to_pydatetime(),
+                    new['open'].to_numpy(), new['high'].to_numpy(), new['low'].to_numpy(),
+                    new['close'].to_numpy(), new['volume'].to_numpy(),
+                )
+            )
+        # ignore_conflicts reste pour une écriture concurrente entre la lecture et l'insertion
+        PriceHistory.objects.bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
+        return inserted
+
+    @staticmethod
+    def _csv_buffer(frames):
+        """CSV of (asset_id, epoch_us, open, high, low, close, volume) built column-wise."""
+        import numpy as np
+        import pandas as pd
+
+        parts = []
+        for asset, df in frames.items():
+            index = df.index.tz_localize('UTC') if df.index.tz is None else df.index.tz_convert('UTC')
+            parts.append(pd.DataFrame({
+                'asset_id': np.full(len(df), asset.id, dtype=np.int64),
+                'ts': index.as_unit('us').asi8,
+                **{col: df[col].to_numpy() for col in OHLCV},
+            }))
+        buffer = io.StringIO()
+        pd.concat(parts, ignore_index=True).to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    def _copy(frames):
+        """
+        COPY into a staging table, then merge while skipping existing (asset, datetime) rows.
+        Returns {asset_id: rows inserted}, counted from the rows the INSERT returns.
+        """
+        table = PriceHistory._meta.db_table
+        buffer = PriceHistoryWriter._csv_buffer(frames)
+        copy_sql = "COPY price_staging (asset_id, ts, open, high, low, close, volume) FROM STDIN WITH (FORMAT csv)"
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Dans une transaction englobante, la table d'un appel précédent existe encore jusqu'au COMMIT
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS price_staging (asset_id bigint, ts bigint, open float8, "
+                "high float8, low float8, close float8, volume float8) ON COMMIT DROP"
+            )
+            cursor.execute("TRUNCATE price_staging")
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                # psycopg2
+                raw.copy_expert(copy_sql, buffer)
+            else:
+                # psycopg 3
+                with raw.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            cursor.execute(
+                f"WITH inserted AS (INSERT INTO {table} (asset_id, datetime, open, high, low, close, volume) "
+                "SELECT asset_id, TIMESTAMPTZ 'epoch' + ts * INTERVAL '1 microsecond', open, high, low, close, volume "
+                "FROM price_staging ON CONFLICT (asset_id, datetime) DO NOTHING RETURNING asset_id) "
+                "SELECT asset_id, count(*) FROM inserted GROUP BY asset_id"
+            )
+            return dict(cursor.fetchall())
+
+    @staticmethod
+    def _after_write(frames):
+        from core.signals import check_market_alerts
+        from ai_prediction.cache import PredictionCache
+
+        store = BarStore.default()
+        for asset, df in frames.items():
+            try:
+                store.write_frame(asset, df)
+            except Exception as e:
+                logger.error(f"BarStore update failed for {asset.symbol}: {e}")
+            PredictionCache.invalidate(asset)
+            try:
+                check_market_alerts(asset, df['close'].iloc[-1])
+            except Exception as e:
+                logger.error(f"Alert check failed for {asset.symbol}: {e}")
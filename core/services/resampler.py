@@ -0,0 +1,125 @@
+import logging
+import threading
+
+from core.lazy import lazy_import
+from core.services.bar_store import BarStore, Bars, COLUMNS, _dt_to_ns
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Bucket width in seconds. Buckets are aligned on the UTC epoch (1d = UTC midnight).
+TIMEFRAMES = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400,
+}
+
+
+def resample_arrays(ts, open, high, low, close, volume, step_ns):
+    """
+    Vectorised OHLCV aggregation of time-sorted arrays into buckets of `step_ns`.
+    Returns a dict with the same keys as Bars (datetime = bucket start).
+    """
+    if len(ts) == 0:
+        empty = {'datetime': np.empty(0, dtype=np.int64)}
+        empty.update({col: np.empty(0, dtype=np.float64) for col in COLUMNS})
+        return empty
+
+    bucket = ts - np.mod(ts, step_ns)
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+    return {
+        'datetime': bucket[starts],
+        'open': open[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[ends],
+        'volume': np.add.reduceat(volume, starts),
+    }
+
+
+class BarResampler:
+    """
+    Derives higher timeframes from the bars stored in the BarStore.
+
+    Results are cached per (symbol, timeframe). When new base bars are appended
+    only the trailing (possibly partial) bucket and the buckets after it are
+    recomputed; a segment rebuild (new generation) recomputes everything.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, store=None):
+        self.store = store or BarStore.default()
+        self._lock = threading.Lock()
+        # (symbol, timeframe) -> (generation, base_rows, arrays)
+        self._cache = {}
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    def load(self, asset, timeframe, start=None, end=None):
+        """Returns Bars of `timeframe` (see TIMEFRAMES) for `asset`."""
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe {timeframe}. Use one of {', '.join(TIMEFRAMES)}")
+
+        base = self.store.load(asset)
+        meta = self.store.meta(asset) or {}
+        generation = meta.get('generation', 0)
+        symbol = base.symbol
+        key = (symbol, timeframe)
+        step_ns = TIMEFRAMES[timeframe] * 10**9
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == generation and cached[1] == len(base):
+                arrays = cached[2]
+            elif cached and cached[0] == generation and cached[1] < len(base) and len(cached[2]['datetime']):
+                arrays = self._extend(cached[2], base, step_ns)
+            else:
+                arrays = resample_arrays(
+                    base.datetime, base.open, base.high, base.low, base.close, base.volume, step_ns
+                )
+            self._cache[key] = (generation, len(base), arrays)
+
+        if start is not None or end is not None:
+            ts = arrays['datetime']
+            lo = np.searchsorted(ts, _dt_to_ns(start), 'left') if start is not None else 0
+            hi = np.searchsorted(ts, _dt_to_ns(end), 'right') if end is not None else len(ts)
+            arrays = {k: v[lo:hi] for k, v in arrays.items()}
+
+        return Bars(symbol, **arrays)
+
+    def load_frame(self, asset, timeframe, start=None, end=None, columns=None):
+        return self.load(asset, timeframe, start=start, end=end).to_frame(columns)
+
+    def invalidate(self, asset=None):
+        """Drops cached timeframes of one asset (or all of them)."""
+        with self._lock:
+            if asset is None:
+                self._cache.clear()
+                return
+            symbol = BarStore._symbol(asset)
+            for key in [k for k in self._cache if k[0] == symbol]:
+                del self._cache[key]
+
+    @staticmethod
+    def _extend(arrays, base, step_ns):
+        """Recomputes the last cached bucket onwards from the new base bars."""
+        last_bucket = arrays['datetime'][-1]
+        i = int(np.searchsorted(base.datetime, last_bucket, 'left'))
+        tail = resample_arrays(
+            base.datetime[i:], base.open[i:], base.high[i:], base.low[i:],
+            base.close[i:], base.volume[i:], step_ns
+        )
+        return {k: np.concatenate((arrays[k][:-1], tail[k])) for k in arrays}
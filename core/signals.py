@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Trade, WalletTransaction, Signal, UserPreference, BrokerAccount, PriceHistory
 from .tasks import execute_trade_task
@@ -75,12 +75,20 @@ def notify_new_signal(sender, instance, created, **kwargs):
         logger.info(f"📡 Signal envoyé au WebSocket pour {instance.asset.symbol}")
 
         # --- AUTO-TRADING LOGIC ---
+        # Seuls les signaux de l'intervalle de base déclenchent des trades : analyze_market_trends
+        # crée aussi un signal par timeframe rééchantillonné pour le même actif.
+        if instance.timeframe:
+            return
+
         # Get users with auto-trade enabled for this confidence level
         auto_trade_prefs = UserPreference.objects.filter(
             auto_trade=True, 
             min_confidence__lte=instance.confidence
         )
 
+        # predicted_price reste un float sur les instances créées par le service de prédiction
+        price = Decimal(str(instance.predicted_price or instance.technical_indicators.get('current_price', 0)))
+
         for pref in auto_trade_prefs:
             user = pref.user
             # Get an active broker account for this user
@@ -96,10 +104,10 @@ def notify_new_signal(sender, instance, created, **kwargs):
                 asset=instance.asset,
                 signal=instance,
                 side=instance.signal_type, # BUY/SELL match
-                entry_price=instance.predicted_price or instance.asset.last_price or Decimal('0'),
+                entry_price=price,
                 size=pref.max_risk_per_trade,
-                stop_loss=(instance.predicted_price or instance.asset.last_price or Decimal('0')) * Decimal('0.95'), # Simple SL
-                take_profit=(instance.predicted_price or instance.asset.last_price or Decimal('0')) * Decimal('1.10'), # Simple TP
+                stop_loss=price * Decimal('0.95'), # Simple SL
+                take_profit=price * Decimal('1.10'), # Simple TP
                 confidence_score=instance.confidence,
                 status=Trade.Status.PENDING,
                 strategy="AI-Bot Auto-Trade"
@@ -128,6 +136,33 @@ def check_price_alerts(sender, instance, created, **kwargs):
     if created:
         check_market_alerts(instance.asset, instance.close)
 
+@receiver(post_save, sender=PriceHistory)
+def sync_bar_store(sender, instance, created, **kwargs):
+    """
+    Garde le segment BarStore aligné sur les écritures unitaires de PriceHistory
+    (les bulk_create des collecteurs appellent BarStore directement).
+    """
+    from core.services.bar_store import BarStore
+    from ai_prediction.cache import PredictionCache
+    try:
+        if created:
+            BarStore.default().sync(instance.asset, since=instance.datetime)
+        else:
+            BarStore.default().drop(instance.asset)
+    except Exception as e:
+        logger.warning(f"BarStore sync failed for {instance.asset.symbol}: {e}")
+    PredictionCache.invalidate(instance.asset)
+
+@receiver(post_delete, sender=PriceHistory)
+def invalidate_bar_store(sender, instance, **kwargs):
+    from core.services.bar_store import BarStore
+    from ai_prediction.cache import PredictionCache
+    try:
+        BarStore.default().drop(instance.asset)
+    except Exception as e:
+        logger.warning(f"BarStore invalidation failed: {e}")
+    PredictionCache.invalidate(instance.asset)
+
 def check_market_alerts(asset, current_price):
     from core.models import MarketAlert, Notification
     from decimal import Decimal
@@ -1,21 +1,30 @@
 from celery import shared_task
 from datetime import datetime, timedelta
-from data_collector import MarketDataCollector
+from core.services.ingestion_service import TIMESPAN_SECONDS
 import logging
 
 logger = logging.getLogger(__name__)
 
 @shared_task(queue='data_collection')
-def collect_market_data(symbol="AAPL", days=1):
+def collect_market_data(symbol="AAPL", days=1, multiplier=1, timespan="day"):
     """
     Tâche Celery pour collecter les données de marché quotidiennes.
+    Mode incrémental : un IngestionCursor mémorise le dernier bar stocké par
+    actif/timespan et seule la période manquante est demandée (avec pagination
+    next_url). `days` ne sert qu'à l'amorçage d'un actif sans historique.
+    Les nouvelles bougies sont ajoutées (append-only) au segment BarStore de
+    l'actif, que les workers de prédiction/backtest lisent en mémoire partagée.
     """
     logger.info(f"🚀 Démarrage de la tâche de collecte pour {symbol}")
     
     try:
-        from .models import Asset
+        from django.db.models import Max
+        from django.utils import timezone
+        from data_collector import MarketDataCollector
+        from .models import Asset, IngestionCursor, PriceHistory
         # Choix du collecteur
         use_alpaca = False
+        asset = None
         try:
             asset = Asset.objects.get(symbol=symbol)
             if asset.asset_type == Asset.AssetType.STOCK:
@@ -31,22 +40,49 @@ def collect_market_data(symbol="AAPL", days=1):
              logger.info(f"🇺🇸 Using Alpaca Data for {symbol}")
         else:
              collector = MarketDataCollector()
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Formatage dates
-        start_str = start_date.strftime("%Y-%m-%d")
-        end_str = end_date.strftime("%Y-%m-%d")
-        
+
+        # High-water mark (initialisé depuis la base au premier passage)
+        cursor = None
+        if asset:
+            cursor, _ = IngestionCursor.objects.get_or_create(asset=asset, multiplier=multiplier, timespan=timespan)
+            if cursor.last_bar_at is None:
+                cursor.last_bar_at = PriceHistory.objects.filter(asset=asset).aggregate(last=Max('datetime'))['last']
+
+        now = timezone.now()
         # 1. Fetch
-        logger.info(f"Fetching data from {start_str} to {end_str}")
-        df = collector.fetch_historical_data(symbol, 1, "day", start_str, end_str)
+        if cursor and cursor.last_bar_at and hasattr(collector, 'fetch_since'):
+            if now - cursor.last_bar_at < timedelta(seconds=TIMESPAN_SECONDS[timespan] * multiplier):
+                logger.info(f"⏭️ {symbol} à jour (dernier bar {cursor.last_bar_at}), aucune requête.")
+                return f"Collected 0 records for {symbol}"
+            logger.info(f"Fetching {symbol} since {cursor.last_bar_at}")
+            df = collector.fetch_since(symbol, multiplier, timespan, cursor.last_bar_at, now)
+        else:
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days)
+            
+            # Formatage dates
+            start_str = start_date.strftime("%Y-%m-%d")
+            end_str = end_date.strftime("%Y-%m-%d")
+            
+            logger.info(f"Fetching data from {start_str} to {end_str}")
+            df = collector.fetch_historical_data(symbol, multiplier, timespan, start_str, end_str)
         
         # 2. Clean
         df = collector.clean_data(df)
         
         # 3. Save
         collector.save_to_db(df, symbol)
+
+        # 4. Avancer le high-water mark
+        if df is not None and not df.empty:
+            last_bar = df.index.max()
+            last_bar = last_bar.tz_localize('UTC') if last_bar.tzinfo is None else last_bar.tz_convert('UTC')
+            IngestionCursor.objects.update_or_create(
+                asset=asset or Asset.objects.get(symbol=symbol),
+                multiplier=multiplier,
+                timespan=timespan,
+                defaults={'last_bar_at': last_bar.to_pydatetime()}
+            )
         
         logger.info(f"✅ Tâche terminée avec succès pour {symbol}")
         return f"Collected {len(df) if df is not None else 0} records for {symbol}"
@@ -56,6 +92,34 @@ def collect_market_data(symbol="AAPL", days=1):
         logger.error(f"❌ Erreur dans la tâche de collecte : {e}")
         return f"Error: {e}"
 
+@shared_task(queue='data_collection')
+def refresh_universe(symbols=None, days=1, multiplier=1, timespan="day"):
+    """
+    Collecte groupée pour une liste de symboles (tous les actifs actifs par défaut).
+    Une seule tâche par lot : les barres journalières passent par les endpoints
+    grouped-daily de Polygon (un appel par marché et par jour), le reste par le
+    moteur asynchrone, puis toutes les lignes sont écrites en un seul bulk insert.
+    Retourne {symbol: nombre de nouvelles barres insérées}.
+    """
+    from .models import Asset
+    from core.services.ingestion_service import AsyncIngestionEngine
+
+    assets = Asset.objects.filter(is_active=True)
+    if symbols is not None:
+        assets = Asset.objects.filter(symbol__in=symbols)
+    # Aucun fournisseur pour les actifs synthétiques : predict_fresh_symbols les traite comme toujours frais
+    assets = list(assets.exclude(asset_type=Asset.AssetType.SYNTHETIC))
+    logger.info(f"🚀 Refresh groupé de {len(assets)} actifs")
+
+    try:
+        written = AsyncIngestionEngine().refresh(assets, days=days, multiplier=multiplier, timespan=timespan)
+    except Exception as e:
+        logger.error(f"❌ Erreur dans le refresh groupé : {e}")
+        return {}
+
+    logger.info(f"✅ Refresh groupé terminé : {sum(written.values())} barres pour {len(written)} actifs")
+    return written
+
 @shared_task(queue='trading')
 def execute_trade_task(trade_id):
     """
@@ -72,25 +136,33 @@ def execute_trade_task(trade_id):
         logger.warning(f"⚠️ Trade {trade_id} execution failed or not pending.")
 
 @shared_task(queue='strategy')
-def analyze_market_trends():
+def analyze_market_trends(timeframes=None):
     """
     Periodic task to analyze all active assets using the new AI Prediction Service.
+    `timeframes` (e.g. ["1h", "1d"]) adds predictions on bars resampled from the
+    stored history; defaults to settings.AI_TIMEFRAMES.
     """
+    from django.conf import settings
     from .models import Asset
     from ai_prediction.services import PredictionService
     
     logger.info("🧠 Starting AI Market Analysis...")
     active_assets = Asset.objects.filter(is_active=True)
+    if timeframes is None:
+        timeframes = settings.AI_TIMEFRAMES
     
+    symbols = list(active_assets.values_list('symbol', flat=True))
     results = []
-    for asset in active_assets:
+    for timeframe in [None, *timeframes]:
+        # One batched pass per timeframe (one forward pass per model)
         try:
-            signal = PredictionService.run_prediction(asset.symbol)
-            if signal:
-                logger.info(f"AI signal generated for {asset.symbol}: {signal.signal_type} ({signal.confidence*100:.1f}%)")
-                results.append(asset.symbol)
+            signals = PredictionService.run_batch(symbols, timeframe=timeframe)
         except Exception as e:
-            logger.error(f"Error in AI prediction for {asset.symbol}: {e}")
+            logger.error(f"Error in AI prediction ({timeframe or 'base'}): {e}")
+            continue
+        for symbol, signal in sorted(signals.items()):
+            logger.info(f"AI signal generated for {symbol} ({timeframe or 'base'}): {signal.signal_type} ({signal.confidence*100:.1f}%)")
+            results.append(f"{symbol}@{timeframe}" if timeframe else symbol)
             
     return f"AI Analyzed {len(active_assets)} assets. Signals updated for: {', '.join(results)}"
 
@@ -98,54 +170,97 @@ def analyze_market_trends():
 def run_system_update():
     """
     Master task to fetch fresh data for all assets and then run AI predictions.
+    Each batch of symbols is a chain refresh_universe -> predict_fresh_symbols,
+    so predictions only run once their bars are stored, and only for symbols
+    that actually received a new bar (synthetic assets, which no provider
+    serves, are always predicted).
     If Auto-Trade is enabled, it automatically takes positions.
     """
-    from .models import Asset, UserPreference, Trade
-    from .tasks import collect_market_data
-    from ai_prediction.services import PredictionService
-    from django.contrib.auth.models import User
+    from celery import chain
+    from django.conf import settings
+    from .models import Asset
     
     logger.info("🔄 Starting System-Wide Data Update & AI Prediction...")
-    active_assets = Asset.objects.filter(is_active=True)
+    symbols = list(Asset.objects.filter(is_active=True).values_list('symbol', flat=True))
     
+    batch_size = settings.INGESTION_BATCH_SIZE
+    for i in range(0, len(symbols), batch_size):
+        chain(
+            refresh_universe.s(symbols[i:i + batch_size], days=1),
+            predict_fresh_symbols.s(symbols[i:i + batch_size]),
+        ).apply_async()
+            
+    return f"Update & Auto-Trade triggered for {len(symbols)} assets."
+
+@shared_task(queue='strategy')
+def predict_fresh_symbols(written, symbols=None):
+    """
+    Second step of the update pipeline: `written` is the {symbol: bars inserted}
+    result of refresh_universe (re-fetched bars already stored are not counted).
+    Symbols without a new bar are skipped, the others get a prediction (and an
+    auto-trade when enabled). The SYNTHETIC assets of the batch `symbols` are
+    not refreshed by the providers and are always considered fresh.
+    """
+    from .models import Asset, UserPreference
+    from ai_prediction.services import PredictionService
+    from django.contrib.auth.models import User
+
+    fresh = {symbol for symbol, rows in (written or {}).items() if rows}
+    if symbols:
+        fresh.update(Asset.objects.filter(
+            symbol__in=symbols, asset_type=Asset.AssetType.SYNTHETIC
+        ).values_list('symbol', flat=True))
+    fresh = sorted(fresh)
+    if not fresh:
+        logger.info("⏭️ No new bars, predictions skipped.")
+        return []
+
     # Global Demo User for now
     user = User.objects.first()
     prefs, _ = UserPreference.objects.get_or_create(user=user)
+
+    try:
+        signals = PredictionService.run_batch(fresh)
+    except Exception as e:
+        logger.error(f"Post-update prediction failed for {', '.join(fresh)}: {e}")
+        return []
+
+    if prefs.auto_trade:
+        for symbol, signal in signals.items():
+            try:
+                auto_trade(user, prefs, signal)
+            except Exception as e:
+                logger.error(f"Auto-trade failed for {symbol}: {e}")
+    return sorted(signals)
+
+def auto_trade(user, prefs, signal):
+    """Opens an AI_AUTO_V1 position for a high-confidence base-interval signal if none is open on the asset."""
+    from .models import Trade
+
+    asset = signal.asset
+    if signal.timeframe or signal.confidence < prefs.min_confidence:
+        return None
+
+    logger.info(f"🤖 AUTO-TRADE: HIGH CONFIDENCE ({signal.confidence*100:.1f}%) for {asset.symbol}")
     
-    for asset in active_assets:
-        # 1. Collect fresh data (last 1 day)
-        collect_market_data.delay(asset.symbol, days=1)
-        
-        # 2. Run Prediction
-        try:
-            signal = PredictionService.run_prediction(asset.symbol)
-            
-            # 3. Auto-Trading Logic
-            if prefs.auto_trade and signal:
-                if signal.confidence >= prefs.min_confidence:
-                    logger.info(f"🤖 AUTO-TRADE: HIGH CONFIDENCE ({signal.confidence*100:.1f}%) for {asset.symbol}")
-                    
-                    # Prevent duplicate trades if one is already open for this asset
-                    existing_trade = Trade.objects.filter(user=user, asset=asset, status=Trade.Status.OPEN).exists()
-                    if not existing_trade:
-                        Trade.objects.create(
-                            user=user,
-                            asset=asset,
-                            signal=signal,
-                            side=signal.signal_type,
-                            entry_price=signal.technical_indicators.get('current_price', 0),
-                            size=1.0,
-                            stop_loss=float(signal.technical_indicators.get('current_price', 0)) * 0.95,
-                            take_profit=float(signal.technical_indicators.get('current_price', 0)) * 1.10,
-                            confidence_score=signal.confidence,
-                            status=Trade.Status.OPEN,
-                            strategy="AI_AUTO_V1"
-                        )
-                        logger.info(f"🚀 AUTO-TRADE: Position OPENED for {asset.symbol}")
-                    else:
-                        logger.info(f"⏭️ AUTO-TRADE: Position already open for {asset.symbol}, skipping.")
-                        
-        except Exception as e:
-            logger.error(f"Post-update prediction failed for {asset.symbol}: {e}")
-            
-    return f"Update & Auto-Trade triggered for {active_assets.count()} assets."
+    # Prevent duplicate trades if one is already open for this asset
+    existing_trade = Trade.objects.filter(user=user, asset=asset, status=Trade.Status.OPEN).exists()
+    if existing_trade:
+        logger.info(f"⏭️ AUTO-TRADE: Position already open for {asset.symbol}, skipping.")
+        return None
+
+    trade = Trade.objects.create(
+        user=user,
+        asset=asset,
+        signal=signal,
+        side=signal.signal_type,
+        entry_price=signal.technical_indicators.get('current_price', 0),
+        size=1.0,
+        stop_loss=float(signal.technical_indicators.get('current_price', 0)) * 0.95,
+        take_profit=float(signal.technical_indicators.get('current_price', 0)) * 1.10,
+        confidence_score=signal.confidence,
+        status=Trade.Status.OPEN,
+        strategy="AI_AUTO_V1"
+    )
+    logger.info(f"🚀 AUTO-TRADE: Position OPENED for {asset.symbol}")
+    return trade
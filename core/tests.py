@@ -1,3 +1,381 @@
-from django.test import TestCase
+import asyncio
+import os
+import shutil
+import tempfile
+import warnings
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from ai_prediction.cache import PredictionCache
+from core.models import Asset, IngestionCursor, PriceHistory, Signal
+from core.services.bar_store import BarStore
+from core.services.ingestion_service import AsyncIngestionEngine, FetchRequest
+from core.services.price_writer import PriceHistoryWriter
+
+
+def make_frame(n=100, seed=0, start='2024-01-01', freq='h'):
+    """Random-walk OHLCV bars on a naive (UTC) index, as the collectors return them."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        'open': close,
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.uniform(1, 100, n),
+    }, index=pd.date_range(start, periods=n, freq=freq, name='datetime'))
+
+
+def create_bars(asset, frame):
+    """Bulk-inserts `frame` into PriceHistory, like the collectors do."""
+    PriceHistory.objects.bulk_create(
+        PriceHistory(asset=asset, datetime=dt.tz_localize('UTC').to_pydatetime(),
+                     open=row.open, high=row.high, low=row.low, close=row.close, volume=row.volume)
+        for dt, row in frame.iterrows()
+    )
+
+
+class BarStoreTestCase(TestCase):
+    """Process-wide BarStore rooted in a temporary directory."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = BarStore(Path(tmp.name) / 'bars')
+        patcher = mock.patch.object(BarStore, '_default', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.asset = Asset.objects.create(symbol='TEST', name='Test', asset_type=Asset.AssetType.STOCK)
+
+
+class BarStoreTests(BarStoreTestCase):
+    def test_load_matches_price_history(self):
+        frame = make_frame()
+        create_bars(self.asset, frame)
+        bars = self.store.load(self.asset)
+        self.assertEqual(len(bars), len(frame))
+        np.testing.assert_allclose(bars.close, frame['close'].to_numpy())
+        np.testing.assert_array_equal(bars.datetime, frame.index.as_unit('ns').asi8)
+
+    def test_write_frame_appends_new_bars(self):
+        first, second = make_frame(n=50), make_frame(n=10, start='2024-03-01')
+        create_bars(self.asset, first)
+        self.store.write_frame(self.asset, first)
+        create_bars(self.asset, second)
+        self.store.write_frame(self.asset, second)
+
+        bars = self.store.load(self.asset)
+        self.assertEqual(len(bars), 60)
+        self.assertTrue(np.all(np.diff(bars.datetime) > 0))
+        np.testing.assert_allclose(bars.close[-10:], second['close'].to_numpy())
+
+    def test_mapped_columns_are_read_only(self):
+        create_bars(self.asset, make_frame(n=10))
+        bars = self.store.load(self.asset)
+        with self.assertRaises(ValueError):
+            bars.close[0] = 0.0
+
+    def test_append_keeps_the_generation(self):
+        create_bars(self.asset, make_frame(n=50))
+        self.store.load(self.asset)
+        meta = self.store._read_meta(self.asset)
+        frame = make_frame(n=10, start='2024-03-01')
+        create_bars(self.asset, frame)
+        self.store.write_frame(self.asset, frame)
+
+        after = self.store._read_meta(self.asset)
+        self.assertEqual(after['rows'], 60)
+        self.assertEqual(after['generation'], meta['generation'])
+
+    def test_rebuild_switches_files_atomically(self):
+        create_bars(self.asset, make_frame(n=50))
+        old = self.store.load(self.asset)
+        old_close = np.array(old.close)
+        generation = self.store._read_meta(self.asset)['generation']
+
+        old_files = self.store._read_meta(self.asset)['files']
+
+        self.store.rebuild(self.asset)
+        meta = self.store._read_meta(self.asset)
+        self.assertEqual(meta['generation'], generation + 1)
+        self.assertNotEqual(meta['files'], old_files)
+        names = {path.name for path in self.store.segment_dir(self.asset).glob('*.bin')}
+        self.assertEqual(names, {f"{column}{meta['files']}.bin"
+                                 for column in ('datetime', 'open', 'high', 'low', 'close', 'volume')})
+        # Les tableaux déjà mappés restent lisibles après la suppression de l'ancienne génération
+        np.testing.assert_array_equal(old.close, old_close)
+        np.testing.assert_array_equal(self.store.load(self.asset).close, old_close)
+
+    def test_short_column_is_rejected(self):
+        create_bars(self.asset, make_frame(n=50))
+        self.store.load(self.asset)
+        meta = self.store._read_meta(self.asset)
+        with open(self.store._column_path(self.asset, 'close', meta), 'r+b') as f:
+            f.truncate(8 * 10)
+        self.store._maps.clear()
+        with self.assertRaises(ValueError):
+            self.store.load(self.asset)
+
+    def test_unknown_symbol_does_not_touch_disk(self):
+        bars = self.store.load('NOPE')
+        self.assertEqual(len(bars), 0)
+        self.assertFalse(self.store.segment_dir('NOPE').exists())
+        self.assertFalse(self.store.root.exists())
+
+    def test_drop_forces_a_rebuild(self):
+        create_bars(self.asset, make_frame(n=20))
+        self.assertEqual(len(self.store.load(self.asset)), 20)
+        PriceHistory.objects.filter(asset=self.asset).order_by('datetime').first().delete()  # post_delete -> drop()
+        self.assertEqual(len(self.store.load(self.asset)), 19)
+
+    def test_data_version_follows_the_content(self):
+        # Prix à 2 décimales : relus à l'identique depuis les DecimalField
+        first, second = make_frame(n=50).round(2), make_frame(n=10, start='2024-03-01').round(2)
+        create_bars(self.asset, first)
+        self.store.load(self.asset)
+        before = self.store.data_version(self.asset)
+        create_bars(self.asset, second)
+        self.store.write_frame(self.asset, second)
+        appended = self.store.data_version(self.asset)
+        self.assertNotEqual(appended, before)
+
+        # Segment effacé puis reconstruit depuis la base : mêmes barres, même version
+        shutil.rmtree(self.store.segment_dir(self.asset))
+        self.store.load(self.asset)
+        self.assertEqual(self.store.data_version(self.asset), appended)
+
+        # Barre corrigée sans changer le nombre de lignes ni la dernière date
+        PriceHistory.objects.filter(asset=self.asset, datetime__lt='2024-01-02').update(close=1)
+        self.store.rebuild(self.asset)
+        self.assertNotEqual(self.store.data_version(self.asset), appended)
+
+
+class PriceHistoryWriterTests(BarStoreTestCase):
+    def test_write_many_mirrors_into_the_bar_store(self):
+        other = Asset.objects.create(symbol='OTHER', name='Other', asset_type=Asset.AssetType.STOCK)
+        PriceHistoryWriter.write_many({self.asset: make_frame(n=30), other: make_frame(n=20, seed=1)})
+        for asset, rows in ((self.asset, 30), (other, 20)):
+            self.assertEqual(PriceHistory.objects.filter(asset=asset).count(), rows)
+            self.assertEqual(len(self.store.load(asset)), rows)
+
+    def test_returns_inserted_rows(self):
+        frame = make_frame(n=30)
+        self.assertEqual(PriceHistoryWriter.write_many({self.asset: frame}), {'TEST': 30})
+        self.assertEqual(PriceHistoryWriter.write_many({self.asset: frame}), {'TEST': 0})
+
+        overlap = make_frame(n=30, start='2024-01-02', seed=1)  # 6 barres déjà stockées, 24 nouvelles
+        self.assertEqual(PriceHistoryWriter.write(self.asset, overlap), 24)
+        self.assertEqual(PriceHistory.objects.filter(asset=self.asset).count(), 54)
+        self.assertEqual(len(self.store.load(self.asset)), 54)
+
+    def test_aware_and_naive_indexes_are_the_same_bars(self):
+        frame = make_frame(n=10)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)  # datetime naïve passée à l'ORM
+            PriceHistoryWriter.write(self.asset, frame)
+        self.assertEqual(PriceHistoryWriter.write(self.asset, frame.tz_localize('UTC')), 0)
+
+    def test_prepare_drops_duplicates_and_incomplete_rows(self):
+        frame = make_frame(n=5)
+        frame = pd.concat([frame, frame.iloc[:1]]).drop(columns='volume')
+        frame.iloc[2, frame.columns.get_loc('close')] = np.nan
+        prepared = PriceHistoryWriter.prepare(frame)
+        self.assertEqual(len(prepared), 4)
+        self.assertTrue((prepared['volume'] == 0).all())
+
+    def test_write_invalidates_cached_predictions(self):
+        cache.clear()
+        PriceHistoryWriter.write(self.asset, make_frame(n=10))
+        signal = Signal.objects.create(asset=self.asset, signal_type=Signal.SignalType.BUY, confidence=0.8,
+                                       model_version='m1')
+        bar_ns = self.store.last_timestamp(self.asset)
+        PredictionCache.set(signal, None, bar_ns)
+        self.assertEqual(PredictionCache.get(self.asset, None, bar_ns, 'm1'), signal)
+
+        PriceHistoryWriter.write(self.asset, make_frame(n=10, start='2023-01-01'))  # backfill
+        self.assertIsNone(PredictionCache.get(self.asset, None, bar_ns, 'm1'))
+
+
+class PredictionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.asset = Asset.objects.create(symbol='TEST', name='Test', asset_type=Asset.AssetType.STOCK)
+        self.signal = Signal.objects.create(asset=self.asset, signal_type=Signal.SignalType.SELL,
+                                            confidence=0.7, model_version='m1')
+        PredictionCache.set(self.signal, '1h', 1000)
+
+    def test_hit_needs_the_same_bar_timeframe_and_model(self):
+        self.assertEqual(PredictionCache.get(self.asset, '1h', 1000, 'm1'), self.signal)
+        self.assertIsNone(PredictionCache.get(self.asset, '1h', 2000, 'm1'))
+        self.assertIsNone(PredictionCache.get(self.asset, None, 1000, 'm1'))
+        self.assertIsNone(PredictionCache.get(self.asset, '1h', 1000, 'm2'))
+        self.assertIsNone(PredictionCache.get(self.asset, '1h', None, 'm1'))
+
+    def test_invalidate(self):
+        PredictionCache.invalidate(self.asset)
+        self.assertIsNone(PredictionCache.get(self.asset, '1h', 1000, 'm1'))
+
+
+class IngestionTests(BarStoreTestCase):
+    def refresh(self, frame):
+        engine = AsyncIngestionEngine(api_key='test')
+        with mock.patch.object(AsyncIngestionEngine, 'collect', new=mock.AsyncMock(return_value={'TEST': frame})):
+            return engine.refresh([self.asset], days=5, timespan='hour')
+
+    def test_refresh_writes_bars_and_advances_the_cursor(self):
+        start = (timezone.now() - pd.Timedelta(hours=30)).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        frame = make_frame(n=24, start=start).tz_localize('UTC')  # collect() renvoie des index UTC
+        self.assertEqual(self.refresh(frame), {'TEST': 24})
+        self.assertEqual(PriceHistory.objects.filter(asset=self.asset).count(), 24)
+        self.assertEqual(len(self.store.load(self.asset)), 24)
+        cursor = IngestionCursor.objects.get(asset=self.asset, timespan='hour')
+        self.assertEqual(cursor.last_bar_at, frame.index[-1].to_pydatetime())
+
+        # Barres déjà stockées renvoyées par le fournisseur : rien de nouveau
+        self.assertEqual(self.refresh(frame.iloc[-3:]), {'TEST': 0})
+
+    def test_naive_frames_give_an_aware_cursor(self):
+        start = (timezone.now() - pd.Timedelta(hours=30)).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        frame = make_frame(n=24, start=start)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            self.refresh(frame)
+        cursor = IngestionCursor.objects.get(asset=self.asset, timespan='hour')
+        self.assertEqual(cursor.last_bar_at, frame.index[-1].tz_localize('UTC').to_pydatetime())
+
+    def test_command_goes_through_refresh(self):
+        start = (timezone.now() - pd.Timedelta(hours=30)).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        frame = make_frame(n=24, start=start).tz_localize('UTC')
+        out = StringIO()
+        with mock.patch.dict(os.environ, {'POLYGON_API_KEY': 'test'}), \
+                mock.patch.object(AsyncIngestionEngine, 'collect', new=mock.AsyncMock(return_value={'TEST': frame})):
+            call_command('ingest_market_data', 'TEST', timespan='hour', days=5, stdout=out)
+        self.assertIn('TEST: 24 new bars', out.getvalue())
+        self.assertEqual(PriceHistory.objects.filter(asset=self.asset).count(), 24)
+        self.assertEqual(IngestionCursor.objects.get(asset=self.asset, timespan='hour').last_bar_at,
+                         frame.index[-1].to_pydatetime())
+
+    def test_plan_requests_only_the_gap(self):
+        last = timezone.now() - pd.Timedelta(hours=30)
+        IngestionCursor.objects.create(asset=self.asset, timespan='hour', last_bar_at=last)
+        [request] = AsyncIngestionEngine.plan([self.asset], timespan='hour')
+        self.assertEqual(request.ticker, 'TEST')
+        self.assertEqual(request.start_ms, int(last.timestamp() * 1000) + 1)
+
+    def test_plan_skips_assets_whose_next_bar_is_not_open(self):
+        IngestionCursor.objects.create(asset=self.asset, timespan='hour', last_bar_at=timezone.now())
+        self.assertEqual(AsyncIngestionEngine.plan([self.asset], timespan='hour'), [])
+
+
+def ms(stamp):
+    return pd.Timestamp(stamp).value // 10**6
+
+
+class GroupedDailyTests(SimpleTestCase):
+    STOCKS = ('us', 'stocks', 'America/New_York')
+    END = ms('2024-03-07 12:00Z')
+
+    def daily(self, symbol, start, asset_type='STOCK', timespan='day'):
+        ticker = f"X:{symbol}" if asset_type == 'CRYPTO' else symbol
+        return FetchRequest(symbol, ticker, ms(start), self.END, 1, timespan, asset_type)
+
+    def requests(self):
+        # Mercredi (ouvert à 05:00 UTC) et jeudi à rafraîchir pour trois actions ; BBB a déjà la barre de mercredi
+        return [
+            self.daily('AAA', '2024-03-06 05:00Z'),
+            self.daily('BBB', '2024-03-06 06:00Z'),
+            self.daily('CCC', '2024-03-06 05:00Z'),
+            self.daily('BTCUSD', '2024-03-06 00:00Z', asset_type='CRYPTO'),
+            self.daily('HOURLY', '2024-03-06 04:00Z', timespan='hour'),
+        ]
+
+    def test_plan_groups_markets_with_fewer_days_than_tickers(self):
+        grouped, remaining = AsyncIngestionEngine.plan_grouped(self.requests())
+        self.assertEqual(list(grouped), [self.STOCKS])
+        self.assertEqual([(date, [r.symbol for r in reqs]) for date, reqs in grouped[self.STOCKS]],
+                         [('2024-03-06', ['AAA', 'BBB', 'CCC']), ('2024-03-07', ['AAA', 'BBB', 'CCC'])])
+        # Une seule crypto (1 ticker, 2 jours) et les barres horaires restent par ticker
+        self.assertEqual(sorted(r.symbol for r in remaining), ['BTCUSD', 'HOURLY'])
+
+    def test_plan_keeps_long_gaps_per_ticker(self):
+        requests = [self.daily('AAA', '2024-02-01 00:00Z'), *self.requests()[1:3]]
+        grouped, remaining = AsyncIngestionEngine.plan_grouped(requests)
+        self.assertEqual(grouped, {})
+        self.assertEqual(len(remaining), 3)
+
+    def test_plan_skips_weekends_for_stocks(self):
+        requests = [self.daily(symbol, '2024-03-08 06:00Z') for symbol in ('AAA', 'BBB', 'CCC')]
+        requests = [FetchRequest(r.symbol, r.ticker, r.start_ms, ms('2024-03-11 12:00Z'), 1, 'day', 'STOCK')
+                    for r in requests]
+        grouped, _ = AsyncIngestionEngine.plan_grouped(requests)
+        self.assertEqual([date for date, _ in grouped[self.STOCKS]], ['2024-03-08', '2024-03-11'])
+
+    def test_collect_splits_calls_between_endpoints(self):
+        calls = []
+
+        def bar(close, **extra):
+            return {'o': close, 'h': close + 1, 'l': close - 1, 'c': close, 'v': 10, **extra}
+
+        def handler(request):
+            calls.append(request.url.path)
+            if '/grouped/' in request.url.path:
+                date = request.url.path.rsplit('/', 1)[-1]
+                tickers = ('AAA', 'BBB', 'CCC', 'ZZZ') if date == '2024-03-06' else ('AAA',)
+                results = [bar(100.0 + k, T=ticker) for k, ticker in enumerate(tickers)]
+            else:
+                results = [bar(50.0, t=ms('2024-03-07 00:00Z'))]
+            return httpx.Response(200, json={'status': 'OK', 'results': results})
+
+        engine = AsyncIngestionEngine(api_key='test', rate_limit=100, transport=httpx.MockTransport(handler))
+        frames = asyncio.run(engine.collect(self.requests()))
+
+        grouped = sorted(path for path in calls if '/grouped/' in path)
+        self.assertEqual(grouped, ['/v2/aggs/grouped/locale/us/market/stocks/2024-03-06',
+                                   '/v2/aggs/grouped/locale/us/market/stocks/2024-03-07'])
+        self.assertEqual(sorted(path.split('/')[4] for path in calls if '/ticker/' in path), ['HOURLY', 'X:BTCUSD'])
+
+        # Barres groupées alignées sur l'ouverture (minuit New York), hors du trou de BBB écartées, ZZZ ignoré
+        self.assertEqual(sorted(frames), ['AAA', 'BTCUSD', 'CCC', 'HOURLY'])
+        self.assertEqual(list(frames['AAA'].index), [pd.Timestamp('2024-03-06 05:00Z'), pd.Timestamp('2024-03-07 05:00Z')])
+        self.assertEqual(list(frames['AAA']['close']), [100.0, 100.0])
+        self.assertEqual(list(frames['CCC']['close']), [102.0])
+
+
+class PredictFreshSymbolsTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('trader')
+        for symbol, asset_type in (('AAA', Asset.AssetType.STOCK), ('BBB', Asset.AssetType.STOCK),
+                                   ('R_100', Asset.AssetType.SYNTHETIC)):
+            Asset.objects.create(symbol=symbol, name=symbol, asset_type=asset_type)
+
+    def predict(self, written, symbols=None):
+        from core.tasks import predict_fresh_symbols
+
+        with mock.patch('ai_prediction.services.PredictionService.run_batch',
+                        side_effect=lambda symbols: {symbol: None for symbol in symbols}) as run_batch:
+            result = predict_fresh_symbols(written, symbols)
+        return result, run_batch
+
+    def test_only_symbols_with_new_bars(self):
+        result, run_batch = self.predict({'AAA': 0, 'BBB': 3})
+        self.assertEqual(result, ['BBB'])
+        run_batch.assert_called_once_with(['BBB'])
+
+    def test_synthetic_assets_are_always_fresh(self):
+        result, _ = self.predict({'AAA': 0, 'BBB': 0}, ['AAA', 'BBB', 'R_100'])
+        self.assertEqual(result, ['R_100'])
+
+    def test_nothing_new(self):
+        result, run_batch = self.predict({'AAA': 0})
+        self.assertEqual(result, [])
+        run_batch.assert_not_called()
@@ -62,6 +62,40 @@ class PriceHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['asset']
 
+    @action(detail=False, methods=['get'])
+    def aggregates(self, request):
+        """
+        OHLCV bars resampled to a higher timeframe (5m, 15m, 30m, 1h, 4h, 1d).
+        URL: /api/v1/prices/aggregates/?asset={id}&timeframe=1h&start=...&end=...
+        """
+        from django.utils.dateparse import parse_datetime
+        from .services.aggregate_service import PriceAggregateService
+
+        try:
+            asset = Asset.objects.get(pk=request.query_params.get('asset'))
+        except (Asset.DoesNotExist, ValueError):
+            return Response({"error": "Valid 'asset' id is required"}, status=400)
+
+        timeframe = request.query_params.get('timeframe', '1d')
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        try:
+            df = PriceAggregateService.fetch(
+                asset, timeframe,
+                start=parse_datetime(start) if start else None,
+                end=parse_datetime(end) if end else None,
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        return Response([
+            {
+                "datetime": ts.isoformat(),
+                "open": o, "high": h, "low": l, "close": c, "volume": v
+            }
+            for ts, o, h, l, c, v in zip(df.index, df['open'], df['high'], df['low'], df['close'], df['volume'])
+        ])
+
 class TradeViewSet(viewsets.ModelViewSet):
     """
     API endpoint to view and manage Trades.
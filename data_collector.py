@@ -1,7 +1,7 @@
 import os
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 # Chargement des variables d'environnement
@@ -12,6 +12,9 @@ class MarketDataCollector:
         self.api_provider = api_provider
         self.api_key = os.getenv("POLYGON_API_KEY")
         self.base_url = "https://api.polygon.io/v2/aggs/ticker"
+        # Session partagée : connexions keep-alive réutilisées entre les pages/symboles
+        self.session = requests.Session()
+        self.timeout = 30
         
         if not self.api_key:
             raise ValueError("ERREUR : La clé API Polygon n'est pas configurée dans le fichier .env")
@@ -35,19 +38,27 @@ class MarketDataCollector:
         }
 
         try:
-            response = requests.get(url, params=params)
-            data = response.json()
+            results = []
+            while url:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                data = response.json()
 
-            if data['status'] not in ['OK', 'DELAYED']:
-                print(f"[ERROR] Erreur API : {data}")
-                return None
+                if data['status'] not in ['OK', 'DELAYED']:
+                    print(f"[ERROR] Erreur API : {data}")
+                    return None
+
+                results.extend(data.get('results', []))
+
+                # Pagination : Polygon renvoie next_url quand la plage dépasse `limit`
+                url = data.get('next_url')
+                params = {"apiKey": self.api_key}
 
-            if 'results' not in data:
+            if not results:
                 print("[WARN] Aucune donnée trouvée pour cette période.")
                 return None
 
             # Création du DataFrame
-            df = pd.DataFrame(data['results'])
+            df = pd.DataFrame(results)
             
             # Renommer les colonnes pour standardiser (Open, High, Low, Close, Volume)
             # Polygon renvoie : v (volume), o (open), c (close), h (high), l (low), t (timestamp), n (transactions)
@@ -73,6 +84,19 @@ class MarketDataCollector:
             print(f"[ERROR] Erreur critique lors de la requête : {e}")
             return None
 
+    def fetch_since(self, ticker, multiplier, timespan, since, until=None):
+        """
+        Récupère uniquement les bougies postérieures à `since` (datetime UTC du
+        dernier bar stocké). Polygon accepte des timestamps en millisecondes
+        pour from/to, ce qui évite de re-télécharger la journée déjà stockée.
+        """
+        until = until or datetime.now(timezone.utc)
+        from_ms = int(since.timestamp() * 1000) + 1
+        to_ms = int(until.timestamp() * 1000)
+        if from_ms > to_ms:
+            return None
+        return self.fetch_historical_data(ticker, multiplier, timespan, from_ms, to_ms)
+
     def clean_data(self, df):
         """
         Nettoyage des données pour garantir la fiabilité des tests.
@@ -98,7 +122,7 @@ class MarketDataCollector:
         """
         Sauvegarde les données dans la base de données Django (TimescaleDB).
         """
-        from core.models import Asset, PriceHistory
+        from core.models import Asset
         
         if df is None or df.empty:
             print("[ERROR] Pas de données à sauvegarder.")
@@ -114,41 +138,12 @@ class MarketDataCollector:
         if created:
             print(f"[NEW] Nouvel actif créé : {asset}")
 
-        # 2. Préparer les objets PriceHistory
-        price_history_batch = []
-        for index, row in df.iterrows():
-            # Utiliser update_or_create est lent pour les gros volumes, 
-            # ici on utilise bulk_create avec ignore_conflicts=True pour la performance
-            price_history_batch.append(
-                PriceHistory(
-                    asset=asset,
-                    datetime=index, # L'index est le datetime
-                    open=row['open'],
-                    high=row['high'],
-                    low=row['low'],
-                    close=row['close'],
-                    volume=row['volume']
-                )
-            )
-
-        # 3. Insertion en masse (Batch size 5000)
+        # 2. Écriture vectorisée (COPY sur PostgreSQL, bulk_create sinon),
+        #    puis mise à jour du BarStore et des alertes
         try:
-            PriceHistory.objects.bulk_create(
-                price_history_batch, 
-                batch_size=5000, 
-                ignore_conflicts=True # Ignore les doublons (unique_together)
-            )
+            from core.services.price_writer import PriceHistoryWriter
+            PriceHistoryWriter.write(asset, df)
             print("[OK] Sauvegarde en base de données terminée.")
-            
-            # 4. Trigger Alerts Check
-            try:
-                from core.signals import check_market_alerts
-                last_price = df['close'].iloc[-1]
-                check_market_alerts(asset, last_price)
-                print(f"[ALERTS] Checked for {asset.symbol} at {last_price}")
-            except Exception as e:
-                print(f"[ALERTS ERROR] {e}")
-
         except Exception as e:
             print(f"[ERROR] Erreur lors de la sauvegarde DB : {e}")
 
@@ -5,9 +5,6 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from sklearn.preprocessing import MinMaxScaler
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
 
 # Setup Django
 sys.path.append(os.getcwd())
@@ -35,45 +32,27 @@ def train_for_symbol(symbol_api, symbol_display):
     scaler = MinMaxScaler(feature_range=(0, 1))
     scaled_data = scaler.fit_transform(data)
     
-    # Create sequences
+    # Create sequences (strided views, no per-window copies)
+    from ai_prediction.windowing import sliding_windows
     look_back = 20
-    X, y = [], []
-    for i in range(look_back, len(scaled_data)):
-        X.append(scaled_data[i-look_back:i, 0])
-        y.append(scaled_data[i, 0])
-    
-    X, y = np.array(X), np.array(y)
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
+    X, y = sliding_windows(scaled_data, look_back)
     
     # 3. Build Model
-    model = Sequential([
-        LSTM(units=50, return_sequences=True, input_shape=(X.shape[1], 1)),
-        Dropout(0.2),
-        LSTM(units=50, return_sequences=False),
-        Dropout(0.2),
-        Dense(units=25),
-        Dense(units=1)
-    ])
-    
-    model.compile(optimizer='adam', loss='mean_squared_error')
+    from ai_prediction.training import build_lstm, save_trained_model, register_model
+    model = build_lstm(look_back)
     
     # 4. Train
     print(f"Starting training on {len(X)} samples...")
     model.fit(X, y, batch_size=32, epochs=10, verbose=1)
     
-    # 5. Save
-    os.makedirs('models', exist_ok=True)
-    model_path = f"models/{symbol_display}_lstm.keras"
-    model.save(model_path)
-    
-    # Also save the scaler params so we can use them for prediction
-    # In a real app we'd save the scaler object with joblib, but for simplicity:
-    import joblib
-    joblib.dump(scaler, f"models/{symbol_display}_scaler.save")
+    # 5. Save (.keras + scaler + NumPy export) and register the new version
+    model_path = save_trained_model(symbol_display, model, scaler)['keras']
+    register_model(symbol_display, model_path, trained_until=df.index[-1].tz_localize('UTC').to_pydatetime())
     
     print(f"Model saved to {model_path}")
 
 if __name__ == "__main__":
-    # Train for some main assets
+    # Train for some main assets (from Polygon).
+    # To retrain from the local BarStore in parallel: python manage.py train_models
     train_for_symbol("AAPL", "AAPL")
     train_for_symbol("X:BTCUSD", "BTCUSD")